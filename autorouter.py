@@ -0,0 +1,254 @@
+import heapq
+import math
+from circuit_utils import GRID_SIZE, point_key, build_node_map
+from components import Pin
+
+# 佔用點陣的格點狀態
+FREE = 0
+BLOCKED = 1   # 元件本體、其他腳位、電線端點/轉角
+WIRE_H = 2    # 水平電線經過 (只能垂直穿越)
+WIRE_V = 3    # 垂直電線經過 (只能水平穿越)
+
+DIRS = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+TURN_COST = 3
+
+def _on_grid(v):
+    return abs(v / GRID_SIZE - round(v / GRID_SIZE)) < 1e-6
+
+def terminal_access(comp, tx, ty):
+    """
+    腳位的格點接入點。腳位不在格點上時 (例如 CMOS 的 D/S)，
+    沿遠離元件中心的方向拉一段短線到格點。回傳 (接入點, 短線點列)
+    """
+    if _on_grid(tx) and _on_grid(ty):
+        return (round(tx), round(ty)), []
+    rx, ry = tx - comp.x, ty - comp.y
+    def outward(v, rel):
+        if _on_grid(v): return round(v)
+        q = v / GRID_SIZE
+        return int((math.ceil(q) if rel > 0 else math.floor(q)) * GRID_SIZE)
+    if abs(ry) >= abs(rx):
+        gy = outward(ty, ry)
+        gx = round(tx) if _on_grid(tx) else int(round(tx / GRID_SIZE) * GRID_SIZE)
+        pts = [(tx, ty), (tx, gy)]
+    else:
+        gx = outward(tx, rx)
+        gy = round(ty) if _on_grid(ty) else int(round(ty / GRID_SIZE) * GRID_SIZE)
+        pts = [(tx, ty), (gx, ty)]
+    if point_key(pts[-1]) != point_key((gx, gy)): pts.append((gx, gy))
+    return (gx, gy), pts
+
+class RoutingGrid:
+    """繞線視窗內的佔用點陣 (bytearray，每格一個 byte)"""
+
+    def __init__(self, components, wires, x1, y1, x2, y2):
+        self.gx0 = int(math.floor(x1 / GRID_SIZE))
+        self.gy0 = int(math.floor(y1 / GRID_SIZE))
+        self.w = int(math.ceil(x2 / GRID_SIZE)) - self.gx0 + 1
+        self.h = int(math.ceil(y2 / GRID_SIZE)) - self.gy0 + 1
+        self.occ = bytearray(self.w * self.h)
+        for comp in components: self.block_component(comp)
+        for wire in wires: self.mark_segment(wire.start_p, wire.end_p)
+
+    def cell(self, x, y):
+        """邏輯座標 -> 格點 index (視窗外回傳 None)"""
+        cx = int(round(x / GRID_SIZE)) - self.gx0
+        cy = int(round(y / GRID_SIZE)) - self.gy0
+        if 0 <= cx < self.w and 0 <= cy < self.h: return cy * self.w + cx
+        return None
+
+    def point(self, idx):
+        cy, cx = divmod(idx, self.w)
+        return ((cx + self.gx0) * GRID_SIZE, (cy + self.gy0) * GRID_SIZE)
+
+    def block_component(self, comp):
+        hw, hh = comp.hitbox_size[0] / 2, comp.hitbox_size[1] / 2
+        if comp.rotation % 180 == 90: hw, hh = hh, hw
+        # 內縮 5 單位: 剛好落在外框上的腳位格點保持可用
+        hw, hh = hw - 5, hh - 5
+        gx1 = int(math.ceil((comp.x - hw) / GRID_SIZE)) - self.gx0
+        gx2 = int(math.floor((comp.x + hw) / GRID_SIZE)) - self.gx0
+        gy1 = int(math.ceil((comp.y - hh) / GRID_SIZE)) - self.gy0
+        gy2 = int(math.floor((comp.y + hh) / GRID_SIZE)) - self.gy0
+        if gx2 < 0 or gy2 < 0 or gx1 >= self.w or gy1 >= self.h: return
+        for cy in range(max(gy1, 0), min(gy2, self.h - 1) + 1):
+            row = cy * self.w
+            for cx in range(max(gx1, 0), min(gx2, self.w - 1) + 1):
+                self.occ[row + cx] = BLOCKED
+        for term, tx, ty in comp.get_abs_terminals():
+            # 不在格點上的腳位封鎖其接入點，其他網路不能經過 (繞該腳位時才開放)
+            idx = self.cell(*terminal_access(comp, tx, ty)[0])
+            if idx is not None: self.occ[idx] = BLOCKED
+
+    def mark_segment(self, p1, p2):
+        (x1, y1), (x2, y2) = p1, p2
+        if y1 == y2 and _on_grid(y1):
+            lo, hi = sorted((x1, x2))
+            for gx in range(int(math.ceil(lo / GRID_SIZE)), int(math.floor(hi / GRID_SIZE)) + 1):
+                self._mark(self.cell(gx * GRID_SIZE, y1), WIRE_H)
+        elif x1 == x2 and _on_grid(x1):
+            lo, hi = sorted((y1, y2))
+            for gy in range(int(math.ceil(lo / GRID_SIZE)), int(math.floor(hi / GRID_SIZE)) + 1):
+                self._mark(self.cell(x1, gy * GRID_SIZE), WIRE_V)
+        elif x1 != x2 and y1 != y2:
+            # 斜線: 只封鎖剛好落在線上的格點
+            steps = int(max(abs(x2 - x1), abs(y2 - y1)) / GRID_SIZE) + 1
+            for i in range(steps + 1):
+                x = x1 + (x2 - x1) * i / steps
+                y = y1 + (y2 - y1) * i / steps
+                if _on_grid(x) and _on_grid(y): self._mark(self.cell(x, y), BLOCKED)
+        for x, y in (p1, p2):
+            if _on_grid(x) and _on_grid(y): self._mark(self.cell(x, y), BLOCKED)
+
+    def _mark(self, idx, state):
+        if idx is None: return
+        cur = self.occ[idx]
+        if cur == FREE: self.occ[idx] = state
+        elif cur != state: self.occ[idx] = BLOCKED
+
+    def astar(self, sources, target):
+        """多起點 A* (起點為已繞好的整棵樹)；回傳格點 index 路徑或 None"""
+        occ, w, h = self.occ, self.w, self.h
+        ty, tx = divmod(target, w)
+        def heur(idx):
+            # 曼哈頓距離，兩軸都有偏移時至少要轉一次彎
+            cy, cx = divmod(idx, w)
+            dx, dy = abs(cx - tx), abs(cy - ty)
+            return dx + dy + (TURN_COST if dx and dy else 0)
+        best = {}
+        came = {}
+        heap = []
+        for s in sources:
+            state = (s, -1)
+            best[state] = 0
+            hs = heur(s)
+            heapq.heappush(heap, (hs, hs, 0, s, -1))
+        while heap:
+            # 同 f 值時先展開離目標較近者 (h 小)，大幅減少開放網格上的展開數
+            f, hf, g, idx, d = heapq.heappop(heap)
+            if idx == target:
+                path = [idx]
+                state = (idx, d)
+                while state in came:
+                    state = came[state]
+                    path.append(state[0])
+                path.reverse()
+                return path
+            if g > best.get((idx, d), g): continue
+            cy, cx = divmod(idx, w)
+            crossing = occ[idx] in (WIRE_H, WIRE_V) and d != -1
+            for nd, (dx, dy) in enumerate(DIRS):
+                if crossing and nd != d: continue
+                if d != -1 and nd == (d + 2) % 4: continue
+                nx, ny = cx + dx, cy + dy
+                if not (0 <= nx < w and 0 <= ny < h): continue
+                nidx = ny * w + nx
+                state = occ[nidx]
+                if nidx != target:
+                    if state == BLOCKED: continue
+                    if state == WIRE_H and dy == 0: continue
+                    if state == WIRE_V and dx == 0: continue
+                ng = g + 1 + (TURN_COST if d != -1 and nd != d else 0)
+                key = (nidx, nd)
+                if ng < best.get(key, float("inf")):
+                    best[key] = ng
+                    came[key] = (idx, d)
+                    hn = heur(nidx)
+                    heapq.heappush(heap, (ng + hn, hn, ng, nidx, nd))
+        return None
+
+    def commit_path(self, pts):
+        """把剛繞好的線段登記為佔用 (供同批次後續網路避開)"""
+        for p1, p2 in zip(pts, pts[1:]): self.mark_segment(p1, p2)
+
+def _corners(grid, path):
+    """格點路徑 -> 轉角點列"""
+    pts = [grid.point(i) for i in path]
+    out = [pts[0]]
+    for prev, cur, nxt in zip(pts, pts[1:], pts[2:]):
+        if (cur[0] - prev[0], cur[1] - prev[1]) != (nxt[0] - cur[0], nxt[1] - cur[1]): out.append(cur)
+    if len(pts) > 1: out.append(pts[-1])
+    return out
+
+def _window(points, margin):
+    xs = [p[0] for p in points]; ys = [p[1] for p in points]
+    m = margin * GRID_SIZE
+    return min(xs) - m, min(ys) - m, max(xs) + m, max(ys) + m
+
+def route_net(components, wires, pins, margin=10, grid=None):
+    """
+    以正交電線連接一組腳位 pins = [(comp, tx, ty), ...]
+    回傳線段 [(p1, p2), ...]；無法完成時回傳 None
+    """
+    access = [terminal_access(comp, tx, ty) for comp, tx, ty in pins]
+    if len(access) < 2: return []
+    if grid is None:
+        grid = RoutingGrid(components, wires, *_window([a for a, stub in access], margin))
+    cells = []
+    for (pt, stub) in access:
+        idx = grid.cell(*pt)
+        if idx is None: return None
+        grid.occ[idx] = FREE
+        cells.append(idx)
+
+    segments = []
+    for pt, stub in access:
+        segments.extend(zip(stub, stub[1:]))
+    tree = {cells[0]}
+    remaining = cells[1:]
+    while remaining:
+        # 先接離目前樹最近的腳位
+        def gap(c):
+            cy, cx = divmod(c, grid.w)
+            return min(abs(cx - t % grid.w) + abs(cy - t // grid.w) for t in tree)
+        remaining.sort(key=gap)
+        target = remaining.pop(0)
+        if target in tree: continue
+        path = grid.astar(tree, target)
+        if path is None: return None
+        pts = _corners(grid, path)
+        segments.extend(zip(pts, pts[1:]))
+        # 穿越其他網路電線的格點不能當之後分支的起點 (在那裡轉彎會形成 T 接點而短路)
+        tree.update(i for i in path if grid.occ[i] == FREE)
+        grid.commit_path(pts)
+    return segments
+
+def unrouted_named_nets(components, wires):
+    """
+    以 Pin 名稱 / 自訂網路名稱分組，但實體上尚未連通的網路。
+    回傳 {net_name: [(comp, tx, ty), ...]}，每個實體群組取一個代表腳位
+    """
+    terminals = []
+    labels = []
+    for comp in components:
+        for term, tx, ty in comp.get_abs_terminals():
+            terminals.append(((tx, ty), "", ""))
+            label = comp.name if isinstance(comp, Pin) else term.custom_net_name.strip()
+            labels.append((label, comp, tx, ty))
+    groups = build_node_map(terminals, [(w.start_p, w.end_p) for w in wires])
+    nets = {}
+    for label, comp, tx, ty in labels:
+        if not label: continue
+        reps = nets.setdefault(label, {})
+        reps.setdefault(groups[point_key((tx, ty))], (comp, tx, ty))
+    return {name: list(reps.values()) for name, reps in nets.items() if len(reps) > 1}
+
+def route_nets(components, wires, nets, margin=10):
+    """
+    批次繞線 {net_name: pins}，共用一張佔用點陣。
+    回傳 ({net_name: segments}, [失敗的 net_name])
+    """
+    all_pts = [terminal_access(c, tx, ty)[0] for pins in nets.values() for c, tx, ty in pins]
+    if not all_pts: return {}, []
+    grid = RoutingGrid(components, wires, *_window(all_pts, margin))
+    # 先把所有待繞腳位封鎖，輪到該網路時才開放
+    for pins in nets.values():
+        for c, tx, ty in pins:
+            idx = grid.cell(*terminal_access(c, tx, ty)[0])
+            if idx is not None: grid.occ[idx] = BLOCKED
+    routed, failed = {}, []
+    for name, pins in nets.items():
+        segments = route_net(components, wires, pins, grid=grid)
+        if segments is None: failed.append(name)
+        else: routed[name] = segments
+    return routed, failed
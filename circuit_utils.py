@@ -1,4 +1,5 @@
 import math
+import re
 
 GRID_SIZE = 20
 
@@ -6,10 +7,69 @@ def snap(value):
     """將座標吸附到網格上 (邏輯座標)"""
     return round(value / GRID_SIZE) * GRID_SIZE
 
+_BUS_RE = re.compile(r"^(.*?)(<(\d+):(\d+)>)$")
+
+def split_bus(name):
+    """'D<0:63>' -> ('D', '<0:63>')；非匯流排名稱 -> (name, '')"""
+    m = _BUS_RE.match(name)
+    return (m.group(1), m.group(2)) if m else (name, "")
+
+def bus_width(name):
+    m = _BUS_RE.match(name)
+    return abs(int(m.group(4)) - int(m.group(3))) + 1 if m else 1
+
+def bus_bit(name, i):
+    """第 i 個位元的名稱，依範圍方向: D<0:63> -> D<i>，D<7:0> -> D<7-i>"""
+    m = _BUS_RE.match(name)
+    if not m: return name
+    lo, hi = int(m.group(3)), int(m.group(4))
+    return f"{m.group(1)}<{lo + i if hi >= lo else lo - i}>"
+
+_SPICE_SCALE = {"t": 1e12, "g": 1e9, "meg": 1e6, "x": 1e6, "k": 1e3, "mil": 25.4e-6,
+                "m": 1e-3, "u": 1e-6, "n": 1e-9, "p": 1e-12, "f": 1e-15, "a": 1e-18}
+_SPICE_NUM_RE = re.compile(r"^([-+]?(?:\d+\.?\d*|\.\d+)(?:e[-+]?\d+)?)(meg|mil|[tgxkmunpfa])?[a-z]*$", re.I)
+
+def spice_number(text):
+    """'1k' -> 1000.0, '0.18u' -> 1.8e-07, '10Meg' -> 1e7 (尾端單位字母忽略)；格式錯誤丟出 ValueError"""
+    m = _SPICE_NUM_RE.match(text.strip())
+    if not m: raise ValueError(f"invalid SPICE number: {text!r}")
+    scale = _SPICE_SCALE[m.group(2).lower()] if m.group(2) else 1.0
+    return float(m.group(1)) * scale
+
+def netlist_header(settings):
+    """依全域設定產生 .OPTIONS / .TEMP / .LIB 標頭行"""
+    lines = ["* Generated by Python Circuit CAD"]
+    if settings["options"]: lines.append(f".OPTIONS {settings['options']}")
+    if settings["temp"]: lines.append(f".TEMP {settings['temp']}")
+    if settings["lib_path"]:
+        lines.append(".PROTECT")
+        lines.append(f".LIB '{settings['lib_path']}' {settings['corner']}")
+        lines.append(".UNPROTECT")
+    lines.append("")
+    return lines
+
+def sim_lines(sim_settings):
+    """分析指令區塊 (含 .END)"""
+    lines = ["\n* --- Simulation Settings ---"]
+    for cmd, settings in sim_settings.items():
+        if settings["active"]:
+            lines.append(f"{cmd} {settings['params']}")
+    lines.append(".END")
+    return lines
+
 def dist(p1, p2):
     """計算兩點距離"""
     return math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
 
+def clean_coord(value):
+    """消除旋轉後的浮點誤差，整數座標維持 int"""
+    value = round(value, 3)
+    return int(value) if value == int(value) else value
+
+def point_key(p):
+    """座標索引鍵 (四捨五入去除浮點誤差)，用於端點/腳位的精確比對"""
+    return (round(p[0], 3), round(p[1], 3))
+
 def rotate_point(x, y, angle_deg):
     rad = math.radians(angle_deg)
     cos_a = math.cos(rad)
@@ -59,4 +119,139 @@ def get_closest_point_on_segment(px, py, x1, y1, x2, y2):
     if u > 1: u = 1
     cx = x1 + u * lx
     cy = y1 + u * ly
-    return (cx, cy)
\ No newline at end of file
+    return (cx, cy)
+
+def seg_key(p1, p2):
+    """線段索引鍵 (與方向無關)"""
+    return tuple(sorted((point_key(p1), point_key(p2))))
+
+def _line_frame(p1, p2):
+    """線段所在直線: (方向 key, 單位向量, 法向偏移)，方向統一朝 +x (或 +y)"""
+    dx, dy = p2[0] - p1[0], p2[1] - p1[1]
+    if dx < 0 or (dx == 0 and dy < 0): dx, dy = -dx, -dy
+    length = math.hypot(dx, dy)
+    ux, uy = dx / length, dy / length
+    dir_key = (round(ux, 6), round(uy, 6))
+    return dir_key, (ux, uy)
+
+def _offset(u, p):
+    return round(u[0] * p[1] - u[1] * p[0], 3)
+
+def normalize_segments(segments, junctions=()):
+    """
+    電線正規化 (邏輯座標):
+    1. 移除零長度線段
+    2. 合併共線且重疊/相接的線段
+    3. 在交會點 (其他線段的端點、元件腳位) 將線段切開
+    之後所有連接都落在線段端點上，連線判斷只需比對端點。
+    回傳 [(p1, p2), ...]
+    """
+    # 依所在直線分組: (方向, 偏移) -> [(t1, p1, t2, p2)]
+    lines = {}
+    units = {}
+    for p1, p2 in segments:
+        if point_key(p1) == point_key(p2): continue
+        dir_key, u = _line_frame(p1, p2)
+        units.setdefault(dir_key, u)
+        u = units[dir_key]
+        t1 = u[0] * p1[0] + u[1] * p1[1]
+        t2 = u[0] * p2[0] + u[1] * p2[1]
+        if t1 > t2: t1, p1, t2, p2 = t2, p2, t1, p1
+        lines.setdefault((dir_key, _offset(u, p1)), []).append((t1, p1, t2, p2))
+
+    # 合併 (同一直線上依 t 排序後掃描)
+    merged = {}
+    eps = 1e-3
+    for line, spans in lines.items():
+        spans.sort(key=lambda s: s[0])
+        out = []
+        for t1, p1, t2, p2 in spans:
+            if out and t1 <= out[-1][2] + eps:
+                if t2 > out[-1][2]: out[-1] = (out[-1][0], out[-1][1], t2, p2)
+            else:
+                out.append((t1, p1, t2, p2))
+        merged[line] = out
+
+    # 交會點: 所有線段端點 + 腳位，依各方向投影建索引 (偏移 -> [(t, p)])
+    points = {}
+    for spans in merged.values():
+        for t1, p1, t2, p2 in spans:
+            points[point_key(p1)] = p1
+            points[point_key(p2)] = p2
+    for p in junctions:
+        points.setdefault(point_key(p), p)
+    on_line = {}
+    for dir_key, u in units.items():
+        index = {}
+        for p in points.values():
+            index.setdefault(_offset(u, p), []).append((u[0] * p[0] + u[1] * p[1], p))
+        on_line[dir_key] = index
+
+    result = []
+    for (dir_key, off), spans in merged.items():
+        index = on_line[dir_key]
+        # 偏移量四捨五入可能落在相鄰的 key
+        cands = index.get(off, []) + index.get(round(off - 0.001, 3), []) + index.get(round(off + 0.001, 3), [])
+        cands.sort(key=lambda c: c[0])
+        for t1, p1, t2, p2 in spans:
+            prev = p1
+            for t, p in cands:
+                if t1 + eps < t < t2 - eps and point_key(p) != point_key(prev):
+                    result.append((prev, p))
+                    prev = p
+            result.append((prev, p2))
+    return result
+
+def build_node_map(terminals, segments, tolerance=15.0):
+    """
+    由端點相等關係求出網路名稱 (電線需先經 normalize_segments)
+    terminals: [((x, y), pin_name, custom_name), ...] 依元件順序
+    segments: [(p1, p2), ...]
+    回傳 {point_key: net_name}，命名優先順序: Pin > 自訂名稱 > N_k
+    """
+    parent = {}
+    def find(k):
+        parent.setdefault(k, k)
+        root = k
+        while parent[root] != root: root = parent[root]
+        while parent[k] != root: parent[k], k = root, parent[k]
+        return root
+    def union(a, b):
+        ra, rb = find(a), find(b)
+        if ra != rb: parent[rb] = ra
+
+    for p1, p2 in segments:
+        union(point_key(p1), point_key(p2))
+
+    # 腳位相距小於 tolerance 視為短接 (以網格分桶，只比對鄰近桶)
+    keys = [point_key(pt) for pt, pin_name, custom in terminals]
+    buckets = {}
+    for (pt, pin_name, custom), key in zip(terminals, keys):
+        find(key)
+        cell = (int(pt[0] // tolerance), int(pt[1] // tolerance))
+        for gx in (cell[0] - 1, cell[0], cell[0] + 1):
+            for gy in (cell[1] - 1, cell[1], cell[1] + 1):
+                for other_pt, other_key in buckets.get((gx, gy), ()):
+                    if dist(pt, other_pt) < tolerance: union(key, other_key)
+        buckets.setdefault(cell, []).append((pt, key))
+
+    roots = [find(key) for key in keys]
+    names = {}
+    pin_names = {}
+    custom_names = {}
+    for (pt, pin_name, custom), root in zip(terminals, roots):
+        if pin_name: pin_names.setdefault(root, pin_name)
+        elif custom.strip() != "": custom_names.setdefault(root, custom)
+    net_counter = 1
+    for root in roots:
+        if root in names: continue
+        if root in pin_names: names[root] = pin_names[root]
+        elif root in custom_names: names[root] = custom_names[root]
+        else:
+            names[root] = f"N_{net_counter}"
+            net_counter += 1
+    node_map = {}
+    for key in list(parent):
+        root = find(key)
+        if root in names: node_map[key] = names[root]
+    return node_map
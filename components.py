@@ -1,6 +1,8 @@
+import copy
 import tkinter as tk
 from tkinter import ttk, simpledialog
-from circuit_utils import snap, transform_coords
+from circuit_utils import snap, transform_coords, bus_width
+from symbol_lib import default_library
 
 class Terminal:
     def __init__(self, name, x, y):
@@ -12,7 +14,7 @@ class Terminal:
 class Component:
     _counts = {}
 
-    def __init__(self, canvas, x, y, prefix):
+    def __init__(self, canvas, x, y, prefix, name=None):
         self.canvas = canvas
         self.x = snap(x)
         self.y = snap(y)
@@ -21,16 +23,24 @@ class Component:
         self.id = id(self)
         self.tags = f"comp_{self.id}"
         
-        if prefix not in Component._counts:
-            Component._counts[prefix] = 0
-        Component._counts[prefix] += 1
-        self.name = f"{prefix}{Component._counts[prefix]}"
+        if name is None: # 指定名稱時 (例如背景快照) 不動到自動編號
+            key = prefix.lower()
+            Component._counts[key] = Component._counts.get(key, 0) + 1
+            name = f"{prefix}{Component._counts[key]}"
+        self.name = name
         
         self.value = "1k"
         self.shape_lines = []
         self.terminals = [] 
         self.hitbox_size = (40, 40)
         self.source_params = {} 
+        self.revision = 0 # 屬性/位置變動時遞增，netlist 行快取據此判斷是否需重新產生
+
+    @staticmethod
+    def reserve(prefix, number):
+        """prefix + number 已被使用 (例如貼上時編出的 R12)；之後自動編號從更大的數字開始"""
+        key = prefix.lower()
+        Component._counts[key] = max(Component._counts.get(key, 0), number)
 
     def setup_terminals(self): pass
 
@@ -54,6 +64,11 @@ class Component:
         screen_x = (self.x * scale) + pan_x
         screen_y = (self.y * scale) + pan_y
         
+        if bus_width(self.name) > 1:
+            # 陣列實例 (例如 M_N1<0:63>): 以疊影外框表示，仍只是一個物件
+            d = 4 * scale
+            self.canvas.create_rectangle(screen_x - hw + d, screen_y - hh - d, screen_x + hw + d, screen_y + hh - d,
+                                         outline="gray", dash=(2, 2), tags=self.tags)
         self.canvas.create_rectangle(screen_x - hw, screen_y - hh, screen_x + hw, screen_y + hh, 
                                      fill="white", outline="", tags=self.tags)
 
@@ -105,6 +120,7 @@ class Component:
             defaults.append(term.custom_net_name)
         self.open_property_dialog(labels, defaults, self.apply_properties)
     def apply_properties(self, values):
+        self.revision += 1
         if values[0]: self.name = values[0]
         if values[1]: self.value = values[1]
         for i, term in enumerate(self.terminals):
@@ -171,6 +187,7 @@ class SourceMixin:
             for i, term in enumerate(self.terminals): term.custom_net_name = term_entries[i].get()
             stype = type_var.get(); self.source_type = stype
             for key, entry in current_entries.items(): self.params[stype][key] = entry.get()
+            self.revision += 1
             self.update_display_value(); self.update_visuals(); dialog.destroy()
         tk.Button(dialog, text="OK", command=on_ok, bg="lightblue", width=10).grid(row=20, column=0, columnspan=2, pady=10)
         dialog.transient(self.canvas.winfo_toplevel()); dialog.grab_set(); self.canvas.wait_window(dialog)
@@ -178,8 +195,8 @@ class SourceMixin:
 # --- 具體元件 (需修改 draw_extra 支援偏移) ---
 
 class VoltageSource(Component, SourceMixin):
-    def __init__(self, canvas, x, y):
-        super().__init__(canvas, x, y, "V")
+    def __init__(self, canvas, x, y, name=None):
+        super().__init__(canvas, x, y, "V", name)
         self.hitbox_size = (40, 40)
         self.shape_lines = [] 
         self.setup_terminals()
@@ -199,8 +216,8 @@ class VoltageSource(Component, SourceMixin):
         self.canvas.create_text(cx, cy+(8*scale), text="-", tags=self.tags, font=("Arial", fs, "bold"))
 
 class CurrentSource(Component, SourceMixin):
-    def __init__(self, canvas, x, y):
-        super().__init__(canvas, x, y, "I")
+    def __init__(self, canvas, x, y, name=None):
+        super().__init__(canvas, x, y, "I", name)
         self.hitbox_size = (40, 40)
         self.shape_lines = []
         self.setup_terminals()
@@ -221,8 +238,8 @@ class CurrentSource(Component, SourceMixin):
 
 # Pin, Resistor, Inductor, Capacitor, CMOS 
 class Pin(Component):
-    def __init__(self, canvas, x, y):
-        super().__init__(canvas, x, y, "PIN")
+    def __init__(self, canvas, x, y, name=None):
+        super().__init__(canvas, x, y, "PIN", name)
         self.shape_lines = [((-10, 0), (0, 0))]
         self.value = ""
         self.hitbox_size = (30, 30)
@@ -234,37 +251,38 @@ class Pin(Component):
     def edit_properties(self):
         self.open_property_dialog(["Net Name"], [self.name], self.apply_pin_props)
     def apply_pin_props(self, values):
+        self.revision += 1
         if values[0]: self.name = values[0]
 
 class Resistor(Component):
-    def __init__(self, canvas, x, y):
-        super().__init__(canvas, x, y, "R")
+    def __init__(self, canvas, x, y, name=None):
+        super().__init__(canvas, x, y, "R", name)
         self.shape_lines = [((-30, 0), (-20, 0)), ((-20, 0), (-15, -10)), ((-15, -10), (-5, 10)),((-5, 10), (5, -10)), ((5, -10), (15, 10)), ((15, 10), (20, 0)), ((20, 0), (30, 0))]
         self.hitbox_size = (70, 30)
         self.setup_terminals()
     def setup_terminals(self): self.terminals = [Terminal("n1", -30, 0), Terminal("n2", 30, 0)]
 
 class Inductor(Component):
-    def __init__(self, canvas, x, y):
-        super().__init__(canvas, x, y, "L")
+    def __init__(self, canvas, x, y, name=None):
+        super().__init__(canvas, x, y, "L", name)
         self.shape_lines = [((-30, 0), (-20, 0)), ((20, 0), (30, 0)),((-20, 0), (-20, -10)), ((-20, -10), (-10, -10)), ((-10, -10), (-10, 0)),((-10, 0), (-10, -10)), ((-10, -10), (0, -10)), ((0, -10), (0, 0)),((0, 0), (0, -10)), ((0, -10), (10, -10)), ((10, -10), (10, 0)),((10, 0), (10, -10)), ((10, -10), (20, -10)), ((20, -10), (20, 0))]
         self.hitbox_size = (70, 30)
         self.setup_terminals()
     def setup_terminals(self): self.terminals = [Terminal("n1", -30, 0), Terminal("n2", 30, 0)]
 
 class Capacitor(Component):
-    def __init__(self, canvas, x, y):
-        super().__init__(canvas, x, y, "C")
+    def __init__(self, canvas, x, y, name=None):
+        super().__init__(canvas, x, y, "C", name)
         self.shape_lines = [((-30, 0), (-5, 0)), ((5, 0), (30, 0)),((-5, -15), (-5, 15)), ((5, -15), (5, 15))]
         self.hitbox_size = (70, 40)
         self.setup_terminals()
     def setup_terminals(self): self.terminals = [Terminal("n1", -30, 0), Terminal("n2", 30, 0)]
 
 class CMOS(Component):
-    def __init__(self, canvas, x, y, p_type=False):
+    def __init__(self, canvas, x, y, p_type=False, name=None):
         self.p_type = p_type
         prefix = "M_P" if p_type else "M_N"
-        super().__init__(canvas, x, y, prefix)
+        super().__init__(canvas, x, y, prefix, name)
         self.model = "pch" if p_type else "nch"
         self.w = "1u"
         self.l = "0.18u"
@@ -293,9 +311,209 @@ class CMOS(Component):
             defaults.append(term.custom_net_name)
         self.open_property_dialog(labels, defaults, self.apply_cmos_props)
     def apply_cmos_props(self, values):
+        self.revision += 1
         if values[0]: self.name = values[0]
         if values[1]: self.model = values[1]
         if values[2]: self.w = values[2]
         if values[3]: self.l = values[3]
         for i, term in enumerate(self.terminals):
-            if i + 4 < len(values): term.custom_net_name = values[i+4]
\ No newline at end of file
+            if i + 4 < len(values): term.custom_net_name = values[i+4]
+
+class SubcktInstance(Component):
+    """子電路實例 (X 元件)：引用另一個分頁 (cell) 的 Pin 作為埠"""
+    _symbol_cache = {} # {ports tuple: (shape_lines, [(port, x, y)], hitbox)}
+
+    def __init__(self, canvas, x, y, cell="", ports=(), name=None):
+        super().__init__(canvas, x, y, "X", name)
+        self.cell = cell
+        self.value = cell
+        self.set_ports(ports)
+
+    @classmethod
+    def symbol(cls, ports):
+        """依埠數產生方框符號 (前半在左、後半在右)，同樣的埠組合共用一份幾何"""
+        if ports not in cls._symbol_cache:
+            n_left = (len(ports) + 1) // 2
+            rows = max(n_left, len(ports) - n_left, 1)
+            top = -20 * (rows // 2) - 20
+            bottom = 20 * (rows - 1 - rows // 2) + 20
+            shape = [((-30, top), (30, top)), ((30, top), (30, bottom)),
+                     ((30, bottom), (-30, bottom)), ((-30, bottom), (-30, top))]
+            terms = []
+            for i, port in enumerate(ports):
+                side = -1 if i < n_left else 1
+                row = i if i < n_left else i - n_left
+                y = 20 * row - 20 * (rows // 2)
+                shape.append(((side * 30, y), (side * 40, y)))
+                terms.append((port, side * 40, y))
+            cls._symbol_cache[ports] = (shape, terms, (60, bottom - top))
+        return cls._symbol_cache[ports]
+
+    def set_ports(self, ports):
+        old = {t.name: t.custom_net_name for t in self.terminals}
+        self.ports = list(ports)
+        shape, terms, hitbox = self.symbol(tuple(self.ports))
+        self.shape_lines = shape
+        self.hitbox_size = hitbox
+        self.terminals = [Terminal(name, x, y) for name, x, y in terms]
+        for term in self.terminals: term.custom_net_name = old.get(term.name, "")
+
+    def draw_extra(self, scale, pan_x, pan_y):
+        fs = max(6, int(6 * scale))
+        for term, lx, ly in self.get_abs_terminals():
+            # 埠名稱畫在方框內側
+            cx, cy = transform_coords([(term.rel_x * 0.55, term.rel_y)], self.x, self.y, self.rotation, self.mirror, scale=scale)[0]
+            self.canvas.create_text(cx + pan_x, cy + pan_y, text=term.name, tags=self.tags, font=("Arial", fs), fill="gray30")
+
+    def draw_text(self, scale, pan_x, pan_y):
+        screen_x = (self.x * scale) + pan_x
+        screen_y = (self.y * scale) + pan_y
+        offset_y = (self.hitbox_size[1] / 2 + 15) * scale
+        fs = max(8, int(8 * scale))
+        self.canvas.create_text(screen_x, screen_y + offset_y, text=f"{self.name}\n{self.cell}",
+                                tags=self.tags, font=("Arial", fs))
+
+    def edit_properties(self):
+        labels = ["Name", "Cell"]
+        defaults = [self.name, self.cell]
+        for term in self.terminals:
+            labels.append(f"Node ({term.name})")
+            defaults.append(term.custom_net_name)
+        self.open_property_dialog(labels, defaults, self.apply_properties)
+
+    def apply_properties(self, values):
+        super().apply_properties(values)
+        self.cell = self.value
+
+class LibraryComponent(Component):
+    """符號庫 (symbol_lib) 定義的元件；繪圖與端點直接取用符號預先轉換好的方向幾何"""
+
+    def __init__(self, canvas, x, y, symbol, name=None):
+        self.symbol = symbol
+        super().__init__(canvas, x, y, symbol.prefix, name)
+        self.hitbox_size = symbol.hitbox
+        self.params = dict(symbol.params)
+        self.setup_terminals()
+        self.update_display_value()
+
+    def setup_terminals(self): self.terminals = [Terminal(name, x, y) for name, x, y in self.symbol.terminals]
+
+    def update_display_value(self):
+        self.value = self.symbol.label_text(self.params)
+
+    def get_abs_terminals(self):
+        pts = self.symbol.orient(self.rotation, self.mirror)["terms"]
+        return [(term, self.x + px, self.y + py) for term, (px, py) in zip(self.terminals, pts)]
+
+    def draw_extra(self, scale, pan_x, pan_y):
+        geo = self.symbol.orient(self.rotation, self.mirror)
+        ox, oy = self.x * scale + pan_x, self.y * scale + pan_y
+        lw = max(1, int(2 * scale))
+        for x1, y1, x2, y2 in geo["lines"]:
+            self.canvas.create_line(ox + x1 * scale, oy + y1 * scale, ox + x2 * scale, oy + y2 * scale,
+                                    tags=self.tags, width=lw, fill="black")
+        for cx, cy, r in geo["circles"]:
+            cx, cy, r = ox + cx * scale, oy + cy * scale, r * scale
+            self.canvas.create_oval(cx - r, cy - r, cx + r, cy + r, tags=self.tags, width=lw)
+
+    def edit_properties(self):
+        keys = list(self.params)
+        labels = ["Name"] + keys + [f"Node ({term.name})" for term in self.terminals]
+        defaults = [self.name] + [self.params[k] for k in keys] + [term.custom_net_name for term in self.terminals]
+        self.open_property_dialog(labels, defaults, lambda values: self.apply_library_props(keys, values))
+
+    def apply_library_props(self, keys, values):
+        self.revision += 1
+        if values[0]: self.name = values[0]
+        for key, val in zip(keys, values[1:]):
+            if val: self.params[key] = val
+        for term, val in zip(self.terminals, values[1 + len(keys):]): term.custom_net_name = val
+        self.update_display_value()
+
+class PlaceholderComponent(Component):
+    """
+    讀檔時無法建立的元件 (未知類型、符號庫中找不到或定義錯誤的符號)。
+    保留原始項目，存檔/複製時原樣寫回 (位置、方向與名稱以目前值為準)，補上符號後重新開檔即恢復；
+    沒有腳位，不參與連線，netlist 只輸出警告
+    """
+
+    def __init__(self, canvas, x, y, item, reason):
+        self.item = copy.deepcopy(item)
+        self.reason = reason
+        super().__init__(canvas, x, y, "", name=item.get("name", "?"))
+        self.value = item.get("value", "")
+        self.rotation = item.get("rotation", 0)
+        self.mirror = item.get("mirror", False)
+
+    def draw_extra(self, scale, pan_x, pan_y):
+        sx, sy = self.x * scale + pan_x, self.y * scale + pan_y
+        hw, hh = self.hitbox_size[0] / 2 * scale, self.hitbox_size[1] / 2 * scale
+        self.canvas.create_rectangle(sx - hw, sy - hh, sx + hw, sy + hh, outline="red", dash=(3, 3), tags=self.tags)
+        self.canvas.create_text(sx, sy, text="?", fill="red", font=("Arial", max(8, int(14 * scale))), tags=self.tags)
+
+    def to_dict(self):
+        item = copy.deepcopy(self.item)
+        item.update({"x": self.x, "y": self.y, "rotation": self.rotation, "mirror": self.mirror,
+                     "name": self.name, "value": self.value})
+        return item
+
+COMPONENT_CLASSES = {
+    "Resistor": Resistor, "Inductor": Inductor, "Capacitor": Capacitor,
+    "CMOS": CMOS, "Pin": Pin,
+    "VoltageSource": VoltageSource, "CurrentSource": CurrentSource,
+    "SubcktInstance": SubcktInstance, "LibraryComponent": LibraryComponent
+}
+
+def component_to_dict(comp):
+    """可序列化的元件內容 (存檔、剪貼簿)；巢狀 dict/list 都是複本"""
+    if isinstance(comp, PlaceholderComponent): return comp.to_dict()
+    item = {
+        "type": type(comp).__name__, "x": comp.x, "y": comp.y,
+        "rotation": comp.rotation, "mirror": comp.mirror,
+        "name": comp.name, "value": comp.value,
+        "terminals": [t.custom_net_name for t in comp.terminals]
+    }
+    if isinstance(comp, CMOS): item.update({"model": comp.model, "w": comp.w, "l": comp.l, "p_type": comp.p_type})
+    elif isinstance(comp, (VoltageSource, CurrentSource)):
+        item.update({"source_type": comp.source_type, "params": {k: dict(v) for k, v in comp.params.items()}})
+    elif isinstance(comp, SubcktInstance): item.update({"cell": comp.cell, "ports": list(comp.ports)})
+    elif isinstance(comp, LibraryComponent): item.update({"symbol": comp.symbol.name, "params": dict(comp.params)})
+    return item
+
+def component_from_dict(canvas, item, counted=True):
+    """
+    由 get_schematic_data() 的元件項目建立元件 (不繪製)；未知類型或符號庫中找不到/定義錯誤的符號
+    建成 PlaceholderComponent (保留原始內容，存檔時不會遺失)。
+    counted=False 時不遞增自動編號 (背景快照用，canvas 可為 None)
+    """
+    cls = COMPONENT_CLASSES.get(item["type"])
+    if cls is None: return PlaceholderComponent(canvas, item["x"], item["y"], item, f"unknown component type {item['type']}")
+    name = None if counted else item["name"]
+    if cls is CMOS:
+        comp = cls(canvas, item["x"], item["y"], item.get("p_type", False), name=name)
+        comp.model = item.get("model", "nch")
+        comp.w = item.get("w", "1u")
+        comp.l = item.get("l", "0.18u")
+    elif cls is SubcktInstance:
+        comp = cls(canvas, item["x"], item["y"], item.get("cell", ""), item.get("ports", []), name=name)
+    elif cls is LibraryComponent:
+        try: symbol = default_library().get(item.get("symbol", ""))
+        except KeyError: return PlaceholderComponent(canvas, item["x"], item["y"], item, f"symbol {item.get('symbol')} not found")
+        except ValueError as e: return PlaceholderComponent(canvas, item["x"], item["y"], item, str(e))
+        comp = cls(canvas, item["x"], item["y"], symbol, name=name)
+    else:
+        comp = cls(canvas, item["x"], item["y"], name=name)
+    comp.name = item["name"]
+    comp.value = item["value"]
+    comp.rotation = item.get("rotation", 0)
+    comp.mirror = item.get("mirror", False)
+    for i, t_name in enumerate(item.get("terminals", [])):
+        if i < len(comp.terminals): comp.terminals[i].custom_net_name = t_name
+    if isinstance(comp, (VoltageSource, CurrentSource)):
+        comp.source_type = item.get("source_type", "DC")
+        comp.params = {k: dict(v) for k, v in item.get("params", {}).items()} # 同一項目可建多個 (陣列貼上)
+        comp.update_display_value()
+    elif isinstance(comp, LibraryComponent):
+        comp.params.update(item.get("params", {}))
+        comp.update_display_value()
+    return comp
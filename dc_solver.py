@@ -0,0 +1,157 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import spsolve
+
+GROUND_NAMES = {"0", "GND", "GND!"}
+GMIN = 1e-12          # 每個節點對地的最小電導，避免浮接節點使矩陣奇異
+MAX_STEP = 0.5        # Newton 每次迭代的節點電壓變化上限 (V)
+
+# 平方律 MOS 模型參數 (VTO 為絕對值，PMOS 於內部取負號方向)
+MOS_PARAMS = {
+    "n": {"kp": 200e-6, "vto": 0.5, "lam": 0.05},
+    "p": {"kp": 80e-6, "vto": 0.5, "lam": 0.05},
+}
+
+class DCResult:
+    def __init__(self, voltages, currents, converged, iterations):
+        self.voltages = voltages      # {net: V}
+        self.currents = currents      # {元件名稱: A} (電壓源為流入 + 端的支路電流，MOS 為汲極電流)
+        self.converged = converged
+        self.iterations = iterations
+
+    def voltage(self, net):
+        """節點電壓；接地為 0，不在電路中回傳 None"""
+        if net.upper() in GROUND_NAMES: return 0.0
+        return self.voltages.get(net)
+
+class MNASystem:
+    """
+    稀疏修正節點分析 (MNA)。元件:
+      ("R", name, (n1, n2), ohms)       ("V", name, (np, nn), volts)
+      ("I", name, (np, nn), amps)       ("M", name, (d, g, s, b), ("n"/"p", W, L))
+    index 0 為接地，節點 1..n，其後為每個電壓源的支路電流
+    """
+
+    def __init__(self, elements):
+        self.nodes = {}
+        for kind, name, nets, val in elements:
+            for net in nets:
+                if net.upper() not in GROUND_NAMES and net not in self.nodes:
+                    self.nodes[net] = len(self.nodes) + 1
+        n = len(self.nodes)
+        rows, cols, vals = [], [], []
+        b_idx, b_val = [], []
+        vsrc = [e for e in elements if e[0] == "V"]
+        self.size = n + 1 + len(vsrc)
+        self.vsrc_names = [e[1] for e in vsrc]
+        mos = []
+        def stamp(r, c, v):
+            rows.append(r); cols.append(c); vals.append(v)
+        branch = n + 1
+        for kind, name, nets, val in elements:
+            idx = [self.index(net) for net in nets]
+            if kind == "R":
+                g = 1.0 / val
+                a, c = idx
+                stamp(a, a, g); stamp(c, c, g); stamp(a, c, -g); stamp(c, a, -g)
+            elif kind == "V":
+                a, c = idx
+                stamp(a, branch, 1.0); stamp(c, branch, -1.0)
+                stamp(branch, a, 1.0); stamp(branch, c, -1.0)
+                b_idx.append(branch); b_val.append(val)
+                branch += 1
+            elif kind == "I":
+                # SPICE 慣例: 電流由 + 端經電源流向 - 端
+                a, c = idx
+                b_idx.extend((a, c)); b_val.extend((-val, val))
+            elif kind == "M":
+                mos.append((name, idx, val))
+        diag = np.arange(1, n + 1)
+        rows.extend(diag); cols.extend(diag); vals.extend([GMIN] * n)
+        self.G = sp.coo_matrix((vals, (rows, cols)), shape=(self.size, self.size)).tocsr()
+        self.b = np.zeros(self.size)
+        np.add.at(self.b, np.asarray(b_idx, dtype=int), np.asarray(b_val, dtype=float))
+
+        # MOS 以向量化方式計算 (每次 Newton 迭代整批更新)
+        self.mos_names = [m[0] for m in mos]
+        self.md = np.array([m[1][0] for m in mos], dtype=int)
+        self.mg = np.array([m[1][1] for m in mos], dtype=int)
+        self.ms = np.array([m[1][2] for m in mos], dtype=int)
+        self.sgn = np.array([1.0 if m[2][0] == "n" else -1.0 for m in mos])
+        params = [MOS_PARAMS[m[2][0]] for m in mos]
+        self.beta = np.array([p["kp"] * m[2][1] / m[2][2] for p, m in zip(params, mos)])
+        self.vt = np.array([p["vto"] for p in params])
+        self.lam = np.array([p["lam"] for p in params])
+
+    def index(self, net):
+        return 0 if net.upper() in GROUND_NAMES else self.nodes[net]
+
+    def mos_eval(self, x):
+        """
+        回傳 (有效汲極 index, 有效源極 index, 流出汲極的電流, gm, gds)。
+        Vds < 0 時汲/源對調；以實際電壓表示的導數與 N/P 型無關
+        """
+        sgn = self.sgn
+        swap = sgn * (x[self.md] - x[self.ms]) < 0
+        de = np.where(swap, self.ms, self.md)
+        se = np.where(swap, self.md, self.ms)
+        vgs = sgn * (x[self.mg] - x[se])
+        vds = sgn * (x[de] - x[se])
+        vov = vgs - self.vt
+        on = vov > 0
+        sat = vds >= vov
+        clm = 1.0 + self.lam * vds
+        beta = self.beta
+        id_sat = 0.5 * beta * vov**2 * clm
+        id_lin = beta * (vov * vds - 0.5 * vds**2) * clm
+        ids = np.where(on, np.where(sat, id_sat, id_lin), 0.0)
+        gm = np.where(on, np.where(sat, beta * vov * clm, beta * vds * clm), 0.0)
+        gds = np.where(on, np.where(sat, 0.5 * beta * vov**2 * self.lam,
+                                    beta * (vov - vds) * clm + beta * (vov * vds - 0.5 * vds**2) * self.lam), 0.0)
+        return de, se, sgn * ids, gm, gds
+
+    def mos_stamps(self, x):
+        """以目前解 x 線性化 MOS: 回傳 (電導矩陣增量, 右手邊增量)"""
+        de, se, i0, gm, gds = self.mos_eval(x)
+        g = self.mg
+        gs = gm + gds
+        rows = np.concatenate([de, de, de, se, se, se])
+        cols = np.concatenate([g, de, se, g, de, se])
+        vals = np.concatenate([gm, gds, -gs, -gm, -gds, gs])
+        G = sp.coo_matrix((vals, (rows, cols)), shape=(self.size, self.size)).tocsr()
+        ieq = i0 - (gm * x[g] + gds * x[de] - gs * x[se])
+        b = np.zeros(self.size)
+        np.add.at(b, de, -ieq)
+        np.add.at(b, se, ieq)
+        return G, b
+
+    def solve(self, max_iter=100, abstol=1e-6):
+        x = np.zeros(self.size)
+        if not len(self.mos_names):
+            x[1:] = spsolve(self.G[1:, 1:].tocsc(), self.b[1:])
+            return x, True, 1
+        for it in range(1, max_iter + 1):
+            Gm, bm = self.mos_stamps(x)
+            A = (self.G + Gm)[1:, 1:].tocsc()
+            new = np.zeros(self.size)
+            new[1:] = spsolve(A, (self.b + bm)[1:])
+            delta = new - x
+            n = len(self.nodes)
+            # 只限制節點電壓的步幅；支路電流直接採用
+            delta[1:n + 1] = np.clip(delta[1:n + 1], -MAX_STEP, MAX_STEP)
+            x = x + delta
+            if np.max(np.abs(delta[1:n + 1]), initial=0.0) < abstol: return x, True, it
+        return x, False, max_iter
+
+def solve_op(elements, max_iter=100):
+    """DC 工作點；回傳 DCResult"""
+    system = MNASystem(elements)
+    x, converged, iterations = system.solve(max_iter)
+    voltages = {net: float(x[i]) for net, i in system.nodes.items()}
+    n = len(system.nodes)
+    currents = {name: float(x[n + 1 + k]) for k, name in enumerate(system.vsrc_names)}
+    if system.mos_names:
+        de, _, ids, _, _ = system.mos_eval(x)
+        ids = np.where(de == system.md, ids, -ids) # 換算成流入實際汲極的電流
+        currents.update(zip(system.mos_names, ids.tolist()))
+    return DCResult(voltages, currents, converged, iterations)
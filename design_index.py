@@ -0,0 +1,170 @@
+import heapq
+from bisect import bisect_left, insort
+from collections import Counter
+from difflib import SequenceMatcher
+from itertools import islice
+
+COMMON_GRAM = 5000 # 出現在這麼多名稱以上的 trigram 幾乎不具鑑別力，模糊搜尋時略過
+
+def _grams(text):
+    text = f"^{text}$"
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class NameIndex:
+    """
+    名稱索引: 元件名稱、Pin 名稱與腳位自訂網路名稱 -> 位置。
+    依元件增量更新；字首查詢用排序串列 (bisect)，模糊查詢用 trigram 倒排索引
+    """
+
+    def __init__(self):
+        self.by_uid = {}   # {uid: [(小寫名稱, 名稱, 類型, (x, y))]}
+        self.sorted = []   # [(小寫名稱, uid)]
+        self.entries = {}  # {小寫名稱: {uid: [(名稱, 類型, (x, y))]}}
+        self.grams = {}    # {trigram: {小寫名稱}}
+
+    def set(self, uid, entries):
+        """entries: [(名稱, 類型 "inst"/"pin"/"net", (x, y))]"""
+        self.remove(uid)
+        rows = [(name.lower(), name, kind, pt) for name, kind, pt in entries if name]
+        if not rows: return
+        self.by_uid[uid] = rows
+        for low, name, kind, pt in rows:
+            users = self.entries.setdefault(low, {})
+            if not users:
+                for g in _grams(low): self.grams.setdefault(g, set()).add(low)
+            if uid not in users: insort(self.sorted, (low, uid))
+            users.setdefault(uid, []).append((name, kind, pt))
+
+    def remove(self, uid):
+        for low in {row[0] for row in self.by_uid.pop(uid, ())}:
+            del self.sorted[bisect_left(self.sorted, (low, uid))]
+            users = self.entries[low]
+            del users[uid]
+            if users: continue
+            del self.entries[low]
+            for g in _grams(low):
+                names = self.grams[g]
+                names.discard(low)
+                if not names: del self.grams[g]
+
+    def _hits(self, low):
+        return ((name, kind, pt, uid) for uid, rows in self.entries[low].items() for name, kind, pt in rows)
+
+    def prefix(self, query, limit=50):
+        low = query.lower()
+        out = []
+        i = bisect_left(self.sorted, (low,))
+        while i < len(self.sorted) and len(out) < limit:
+            low_name, uid = self.sorted[i]
+            if not low_name.startswith(low): break
+            out.extend((name, kind, pt, uid) for name, kind, pt in self.entries[low_name][uid])
+            i += 1
+        return out[:limit]
+
+    def fuzzy(self, query, limit=50):
+        """依共同 trigram 數排序 (拼錯、少打字元仍找得到)；只看有鑑別力的 trigram"""
+        low = query.lower()
+        postings = sorted((self.grams.get(g, ()) for g in _grams(low)), key=len)
+        useful = [p for p in postings if len(p) <= COMMON_GRAM] or postings[:1]
+        score = Counter()
+        for names in useful: score.update(names)
+        top = heapq.nsmallest(4 * limit, score, key=lambda n: (-score[n], abs(len(n) - len(low)), n))
+        # 候選不多，再以字串相似度細排 (同樣 trigram 數時較像的排前面)
+        best = sorted(top, key=lambda n: (-score[n] - SequenceMatcher(None, low, n).ratio(), n))[:limit]
+        return list(islice((h for name in best for h in self._hits(name)), limit))
+
+    def search(self, query, limit=50):
+        """字首符合的排前面，不足時補模糊結果"""
+        if not query: return []
+        out = self.prefix(query, limit)
+        if len(out) < limit:
+            seen = {(h[0], h[3]) for h in out}
+            out += [h for h in self.fuzzy(query, limit) if (h[0], h[3]) not in seen][:limit - len(out)]
+        return out
+
+class BoundsIndex:
+    """
+    整體範圍的增量維護: 每邊一個 heap，刪除/移動時不重建，
+    查詢時才丟掉堆頂已過期的項目 (lazy deletion)，攤銷 O(log n)
+    """
+
+    def __init__(self):
+        self.boxes = {}   # {key: (x1, y1, x2, y2)}
+        self.heaps = ([], [], [], []) # min x1, min y1, max x2 (取負), max y2 (取負)
+
+    def set(self, key, box):
+        x1, y1, x2, y2 = box
+        box = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+        if self.boxes.get(key) == box: return
+        self.boxes[key] = box
+        for heap, v in zip(self.heaps, (box[0], box[1], -box[2], -box[3])): heapq.heappush(heap, (v, key, box))
+        if len(self.heaps[0]) > 4 * len(self.boxes) + 64: self._compact()
+
+    def remove(self, key):
+        self.boxes.pop(key, None)
+
+    def bounds(self):
+        """(x1, y1, x2, y2)；空白時回傳 None"""
+        out = []
+        for heap in self.heaps:
+            while heap and self.boxes.get(heap[0][1]) != heap[0][2]: heapq.heappop(heap)
+            if not heap: return None
+            out.append(heap[0][0])
+        return out[0], out[1], -out[2], -out[3]
+
+    def _compact(self):
+        """過期項目 (移動/刪除留下的) 太多時重建 heap，限制記憶體"""
+        self.heaps = ([], [], [], [])
+        for key, box in self.boxes.items():
+            for heap, v in zip(self.heaps, (box[0], box[1], -box[2], -box[3])): heap.append((v, key, box))
+        for heap in self.heaps: heapq.heapify(heap)
+
+    def union(self, keys):
+        """指定物件 (如選取) 的合併範圍"""
+        boxes = [self.boxes[k] for k in keys if k in self.boxes]
+        if not boxes: return None
+        return (min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+class SpatialIndex:
+    """
+    均勻網格分桶的範圍查詢: 物件登記在其外框涵蓋的格子，查詢只看框內的格子。
+    電線正規化用它找出變動範圍附近的電線與腳位
+    """
+
+    def __init__(self, cell=100):
+        self.cell = cell
+        self.boxes = {}    # {key: (x1, y1, x2, y2)}
+        self.buckets = {}  # {(gx, gy): {key}}
+
+    def _cells(self, box):
+        x1, y1, x2, y2 = box
+        for gx in range(int(x1 // self.cell), int(x2 // self.cell) + 1):
+            for gy in range(int(y1 // self.cell), int(y2 // self.cell) + 1):
+                yield gx, gy
+
+    def set(self, key, box):
+        x1, y1, x2, y2 = box
+        box = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+        if self.boxes.get(key) == box: return
+        self.remove(key)
+        self.boxes[key] = box
+        for c in self._cells(box): self.buckets.setdefault(c, set()).add(key)
+
+    def remove(self, key):
+        box = self.boxes.pop(key, None)
+        if box is None: return
+        for c in self._cells(box):
+            keys = self.buckets[c]
+            keys.discard(key)
+            if not keys: del self.buckets[c]
+
+    def query(self, box, pad=0.5):
+        """外框與 box (各邊外擴 pad) 相交或相接的 key"""
+        x1, y1, x2, y2 = box
+        x1, y1, x2, y2 = min(x1, x2) - pad, min(y1, y2) - pad, max(x1, x2) + pad, max(y1, y2) + pad
+        out = set()
+        for c in self._cells((x1, y1, x2, y2)):
+            for key in self.buckets.get(c, ()):
+                b = self.boxes[key]
+                if b[0] <= x2 and b[2] >= x1 and b[1] <= y2 and b[3] >= y1: out.add(key)
+        return out
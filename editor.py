@@ -2,19 +2,40 @@ import tkinter as tk
 from tkinter import messagebox, filedialog, ttk
 import json
 import os
+import re
+import threading
 
 # 引入元件與工具
-from components import Resistor, Inductor, Capacitor, CMOS, Pin, VoltageSource, CurrentSource
-from circuit_utils import snap, dist, is_point_on_segment, get_closest_point_on_segment
+from components import (Component, Resistor, Inductor, Capacitor, CMOS, Pin, VoltageSource, CurrentSource,
+                        SubcktInstance, LibraryComponent, PlaceholderComponent, component_from_dict,
+                        component_to_dict)
+from symbol_lib import default_library
+from autorouter import route_net, route_nets, unrouted_named_nets
+from sweep import expand_sweep, render_alter_deck, write_decks
+from sim_runner import default_runner
+from dc_solver import solve_op
+from params import ParamTable
+from erc import CompInfo, ErcWorker
+from net_index import NetIndex
+from minimap import MinimapRaster, Minimap
+from design_index import NameIndex, BoundsIndex, SpatialIndex
+from netlister import NetlistMixin, ExportJob, LiveNetlist
+from schematic_export import export_data
+from schematic_diff import diff_schematics
+from circuit_utils import (snap, dist, clean_coord, point_key, seg_key, rotate_point, get_closest_point_on_segment,
+                           normalize_segments)
+
+NAME_NUM_RE = re.compile(r"^(.*?)(\d*)(<\d+:\d+>)?$") # 名稱 = 字首 + 編號 + 匯流排字尾
 
 class Wire:
-    def __init__(self, canvas, p1, p2, scale=1.0, pan_x=0, pan_y=0):
+    def __init__(self, canvas, p1, p2, scale=1.0, pan_x=0, pan_y=0, drawn=True):
         self.canvas = canvas
         self.start_p = p1 # 邏輯座標 (Logical Coordinate)
         self.end_p = p2   # 邏輯座標
         self.id = id(self)
         self.tags = f"wire_{self.id}"
-        self.draw(scale, pan_x, pan_y)
+        self.items = ()
+        if drawn: self.draw(scale, pan_x, pan_y) # 隱藏分頁只建模型
 
     def draw(self, scale, pan_x, pan_y):
         self.canvas.delete(self.tags)
@@ -27,23 +48,44 @@ class Wire:
         lw = max(2, int(2 * scale))
         hit_w = max(10, int(10 * scale))
         
-        self.canvas.create_line(sx1, sy1, sx2, sy2, fill="blue", width=lw, tags=self.tags)
+        line = self.canvas.create_line(sx1, sy1, sx2, sy2, fill="blue", width=lw, tags=self.tags)
         # 隱形加粗線 (Hitbox)
-        self.canvas.create_line(sx1, sy1, sx2, sy2, width=hit_w, tags=(self.tags, "wire_hitbox"), stipple="gray25", fill="")
+        hit = self.canvas.create_line(sx1, sy1, sx2, sy2, width=hit_w, tags=(self.tags, "wire_hitbox"), stipple="gray25", fill="")
+        self.items = (line, hit)
+
+    def preview(self, sx1, sy1, sx2, sy2):
+        """拖曳中只改既有 canvas item 的座標 (螢幕座標)，不重建"""
+        for item in self.items:
+            self.canvas.coords(item, sx1, sy1, sx2, sy2)
 
-class SchematicEditor(tk.Frame):
-    def __init__(self, parent, on_new_file_callback=None):
+    def set_end(self, end, pt):
+        if end == 0: self.start_p = pt
+        else: self.end_p = pt
+
+class SchematicEditor(NetlistMixin, tk.Frame):
+    def __init__(self, parent, on_new_file_callback=None, on_probe_callback=None, on_open_callback=None):
         super().__init__(parent)
         self.mode = "SELECT"
         self.components = []
         self.wires = []
-        self.selected_item = None
+        self.wire_ends = {} # {point_key: {(wire, 0/1), ...}} 腳位/端點 -> 電線端點
+        self.registry = {}    # {canvas tag: (物件, "comp"/"wire")}
+        self.item_lookup = {} # {canvas item id: (物件, 類型)}，由 registry 解析後快取
+        self.lookup_ids = {}  # {物件 tag: [已快取的 item id]}，重畫/刪除時據此清掉舊 id
+        self.hover = None
+        self.selection = {} # {item: "comp" / "wire"}，共用 canvas tag "selected"
         self.temp_wire_start = None
+        self.route_picks = [] # ROUTE 模式下點選的腳位 [(comp, tx, ty)]
         self.drag_data = {}
+        self.last_mouse = None # 滑鼠最後位置 (邏輯座標)，貼上位置
         self.del_style = tk.StringVar(value="CLICK")
         
         # 接收來自 Main 的 callback，用於建立新分頁
         self.on_new_file_callback = on_new_file_callback
+        # 探測網路時呼叫 on_probe_callback(editor, net_name)，由 Main 交給波形分頁
+        self.on_probe_callback = on_probe_callback
+        # 開啟多個檔案時呼叫 on_open_callback(paths, editor)，由 Main 背景解析並各開一個分頁
+        self.on_open_callback = on_open_callback
         
         # 視圖控制
         self.zoom_scale = 1.0
@@ -53,7 +95,8 @@ class SchematicEditor(tk.Frame):
         # 全域設定
         self.global_settings = {
             "lib_path": "", "corner": "TT", "temp": "25",
-            "def_n_model": "nch", "def_p_model": "pch", "options": "POST"
+            "def_n_model": "nch", "def_p_model": "pch", "options": "POST",
+            "sim_cmd": "hspice -i {deck} -o {out}", "max_jobs": "2", "cache_mb": "500"
         }
         
         # 模擬指令設定
@@ -65,6 +108,43 @@ class SchematicEditor(tk.Frame):
             ".TF":   {"active": False, "params": "V(out) VIN", "hint": "out_var src"},
             ".NOISE":{"active": False, "params": "V(out) VIN 10", "hint": "out_var src interval"}
         }
+
+        # Corner / 溫度 / 電源掃描設定 (空白欄位沿用全域設定)
+        self.sweep_settings = {"corners": "", "temps": "", "supplies": "", "mode": "ALTER", "workers": "4"}
+
+        # 設計參數 (.PARAM)，元件數值可引用
+        self.params = ParamTable()
+        self.job_window = None
+        self.last_job = None
+        self.op_result = None # 內建 DC 工作點結果 (DCResult)，標示在腳位旁
+        self.op_points = []   # [(x, y, 電壓)]: 解出當時各腳位的電壓，重繪時不必重算連線
+
+        # 背景 ERC: 編輯時記錄變動的元件，閒置後整批送到 ErcWorker
+        self.erc = None           # ErcWorker，第一次檢查時才建立
+        self.erc_dirty = set()    # 待重新檢查的元件
+        self.erc_wires = set()    # 待送出的變動電線 (只送差異，不送整份線段列)
+        self.erc_scheduled = False
+        self.erc_pending = 0      # 已送出尚未取回的變動數
+        self.findings = {}        # {key: Finding}
+
+        self.net_index = NetIndex() # 第一次查詢時建立，之後隨編輯增量更新
+        self.revision = 0           # 電路或設定每次變動都遞增
+        self.line_cache = {}        # {(元件 tag, 實例名稱): (元件 revision, 節點, netlist 行)}
+        self.netlist_window = None  # 即時 netlist 視窗 (Toplevel, Text, LiveNetlist)
+        self.netlist_dirty = set()  # 視窗開著時，上次更新後變動的元件
+        self.netlist_shown = -1     # 視窗目前顯示的 revision
+        self.export_job = None      # 背景匯出 (ExportJob)
+        self.hl_net = None          # 目前高亮的網路
+        self.materialized = True    # 分頁隱藏時釋放所有 canvas item，只保留模型
+        self.render_queue = []      # 切回分頁時視窗外尚未重畫的物件 [(物件, 類型)]
+        self.render_job = None
+        self.overview = MinimapRaster() # 縮圖點陣，隨編輯增量更新
+        self.name_index = NameIndex()   # 尋找: 元件/Pin/網路名稱
+        self.bbox_index = BoundsIndex() # 整體範圍 (縮放至全圖)
+        self.spatial = SpatialIndex()   # 電線/元件外框的網格索引 (局部正規化)
+        self.norm_dirty = []            # 上次正規化後變動過的範圍 [(x1, y1, x2, y2)]
+        self.diff_items = None          # 與檔案比對的結果 [DiffItem]，畫成 overlay
+        self.diff_window = None
         
         self.setup_ui()
         
@@ -91,10 +171,11 @@ class SchematicEditor(tk.Frame):
             file_items.append(("New Schematic (Ctrl+T)", self.on_new_file_callback))
             
         file_items.extend([
-            ("Open Schematic", self.load_schematic_dialog),
+            ("Open Schematic(s)", self.load_schematic_dialog),
             ("Save Schematic", self.save_schematic_dialog),
             ("Save Netlist", self.save_netlist_dialog),
-            ("Save Both", self.save_both_dialog)
+            ("Save Both", self.save_both_dialog),
+            ("Export Image (SVG/PDF/PNG)", self.export_image_dialog)
         ])
         create_dropdown(toolbar, "File", file_items)
         
@@ -104,7 +185,44 @@ class SchematicEditor(tk.Frame):
         create_dropdown(toolbar, "Passives", [("Resistor", "R"), ("Inductor", "L"), ("Capacitor", "C")])
         create_dropdown(toolbar, "MOSFETs", [("NMOS", "NMOS"), ("PMOS", "PMOS")])
         create_dropdown(toolbar, "Sources", [("Voltage", "V"), ("Current", "I")])
+        # 符號庫選單在打開時才列出符號 (只讀檔名，不解析)
+        lib_mb = tk.Menubutton(toolbar, text="Library", relief=tk.RAISED, padx=5)
+        lib_menu = tk.Menu(lib_mb, tearoff=0, postcommand=lambda: self.fill_library_menu(lib_menu))
+        lib_mb.config(menu=lib_menu)
+        lib_mb.pack(side=tk.LEFT, padx=2)
+        create_dropdown(toolbar, "Subckt", [
+            ("Place Instance... (X)", self.place_instance_dialog),
+            ("Refresh Instances", self.refresh_instances)
+        ])
         tk.Button(toolbar, text="PIN", bg="#ffcccc", command=lambda: self.add_comp("PIN")).pack(side=tk.LEFT, padx=5)
+        create_dropdown(toolbar, "Route", [
+            ("Route Mode (A)", self.toggle_route_mode),
+            ("Route Picked Terminals (Enter)", self.route_picked),
+            ("Route Unconnected Named Nets", self.route_named_nets)
+        ])
+        create_dropdown(toolbar, "Run", [
+            ("Run Simulation", self.run_simulation),
+            ("Run Sweep (parallel)", self.run_sweep),
+            ("Job Queue", self.open_job_queue),
+            ("Probe Net (G)", self.toggle_probe_mode),
+            ("Highlight Net (H)", self.toggle_net_mode),
+            ("DC Operating Point", self.run_dc_op),
+            ("Clear OP Annotations", self.clear_op_annotations),
+            ("Clear Result Cache", self.clear_result_cache)
+        ])
+        create_dropdown(toolbar, "Edit", [
+            ("Copy (Ctrl+C)", self.copy_selection),
+            ("Cut (Ctrl+X)", self.cut_selection),
+            ("Paste (Ctrl+V)", self.paste),
+            ("Array Paste...", self.array_paste_dialog)
+        ])
+        create_dropdown(toolbar, "View", [
+            ("Find... (Ctrl+F)", self.find_dialog),
+            ("Zoom to Fit (F)", self.zoom_to_fit),
+            ("Zoom to Selection (F)", self.zoom_to_selection),
+            ("Compare with File...", self.compare_with_file),
+            ("Clear Diff Overlay", self.clear_diff_overlay)
+        ])
         
         tk.Label(toolbar, text="|", fg="gray").pack(side=tk.LEFT)
         self.mode_label = tk.Label(toolbar, text="Mode: SELECT", fg="blue", font=("Arial", 10, "bold"))
@@ -112,7 +230,12 @@ class SchematicEditor(tk.Frame):
 
         # 3. Function Buttons (Help Button is here)
         tk.Button(toolbar, text="Help(F1)", bg="lightblue", command=self.show_help).pack(side=tk.RIGHT, padx=5)
+        self.problems_btn = tk.Button(toolbar, text="Problems (0)", command=self.toggle_problems)
+        self.problems_btn.pack(side=tk.RIGHT, padx=5)
+        tk.Button(toolbar, text="Minimap", command=self.toggle_minimap).pack(side=tk.RIGHT, padx=2)
         tk.Button(toolbar, text="View Netlist", bg="yellow", command=self.export_netlist_window).pack(side=tk.RIGHT, padx=5)
+        tk.Button(toolbar, text="Sweep", bg="#ccffcc", command=self.open_sweep_settings).pack(side=tk.RIGHT, padx=2)
+        tk.Button(toolbar, text="Params", bg="#ccffcc", command=self.open_params_dialog).pack(side=tk.RIGHT, padx=2)
         tk.Button(toolbar, text="Sim Settings", bg="#ccffcc", command=self.open_sim_settings).pack(side=tk.RIGHT, padx=2)
         tk.Button(toolbar, text="Config", bg="#e0e0e0", command=self.open_global_settings).pack(side=tk.RIGHT, padx=2)
         
@@ -124,6 +247,32 @@ class SchematicEditor(tk.Frame):
         tk.Radiobutton(del_frame, text="Click", variable=self.del_style, value="CLICK", indicatoron=0).pack(side=tk.LEFT)
         tk.Radiobutton(del_frame, text="Box", variable=self.del_style, value="BOX", indicatoron=0).pack(side=tk.LEFT)
 
+        # Status bar (匯出時右側顯示 Cancel)
+        status_bar = tk.Frame(self)
+        status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.status_label = tk.Label(status_bar, text="", anchor="w", relief=tk.SUNKEN, font=("Arial", 9))
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.cancel_btn = tk.Button(status_bar, text="Cancel", font=("Arial", 8), command=self.cancel_export)
+
+        # Problems panel (ERC 結果，預設隱藏)
+        self.problems_panel = tk.Frame(self)
+        self.problems_tree = ttk.Treeview(self.problems_panel, columns=("severity", "message"), show="headings", height=6)
+        self.problems_tree.heading("severity", text="Severity")
+        self.problems_tree.heading("message", text="Message")
+        self.problems_tree.column("severity", width=80, stretch=False)
+        self.problems_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        sb = tk.Scrollbar(self.problems_panel, command=self.problems_tree.yview)
+        sb.pack(side=tk.RIGHT, fill=tk.Y)
+        self.problems_tree.config(yscrollcommand=sb.set)
+        self.problems_tree.tag_configure("error", foreground="red")
+        self.problems_tree.tag_configure("warning", foreground="#b36b00")
+        self.problems_tree.bind("<<TreeviewSelect>>", self.on_problem_select)
+        self.problems_rows = {} # {treeview iid: finding key}
+
+        # Minimap (畫布右側，點擊/拖曳跳到該處)
+        self.minimap = Minimap(self, self.overview, self.center_view)
+        self.minimap.pack(side=tk.RIGHT, anchor="n", padx=2, pady=2)
+
         # Canvas setup
         self.canvas = tk.Canvas(self, bg="white", width=800, height=600)
         self.canvas.pack(fill=tk.BOTH, expand=True)
@@ -136,6 +285,8 @@ class SchematicEditor(tk.Frame):
         self.canvas.bind("<ButtonRelease-1>", self.on_release)
         self.canvas.bind("<Double-Button-1>", self.on_double_click)
         self.canvas.bind("<Motion>", self.on_mouse_move)
+        self.canvas.bind("<Return>", lambda e: self.route_picked())
+        self.canvas.bind("<Configure>", lambda e: self.update_minimap_view())
         
         # Zoom Bindings
         self.canvas.bind("<MouseWheel>", self.on_mouse_wheel) 
@@ -146,28 +297,6 @@ class SchematicEditor(tk.Frame):
         self.canvas.bind("<ButtonPress-3>", self.start_pan)
         self.canvas.bind("<B3-Motion>", self.motion_pan)
 
-    # --- Help Function (修復與優化) ---
-    def show_help(self):
-        help_text = (
-            "【 Mouse Controls 】\n"
-            "• Left Click: Select / Place / Connect\n"
-            "• Right Drag: Pan View (平移視角)\n"
-            "• Scroll Wheel: Zoom In/Out (縮放)\n"
-            "• Double Click: Edit Component Properties\n\n"
-            "【 Keyboard Shortcuts 】\n"
-            "• W: Toggle Wire Mode (連線模式)\n"
-            "• R: Rotate Selection (旋轉)\n"
-            "• M: Mirror Selection (鏡像)\n"
-            "• Delete: Toggle Delete Mode (刪除模式)\n"
-            "• Ctrl+T: New Tab\n"
-            "• Ctrl+W: Close Tab\n\n"
-            "【 Features 】\n"
-            "• Box Delete: Switch to 'Box' in Del Mode to area delete.\n"
-            "• Branching: Click on existing wires to create branches.\n"
-            "• Global Config: Set .LIB, .TEMP and default models."
-        )
-        messagebox.showinfo("Circuit CAD Help", help_text)
-
     # --- 繪圖、縮放、平移 ---
     def draw_grid(self):
         self.canvas.delete("grid")
@@ -189,11 +318,22 @@ class SchematicEditor(tk.Frame):
         self.canvas.tag_lower("grid")
 
     def redraw_all(self):
+        if not self.materialized: return
+        self.cancel_render() # 全部重畫，不必再補畫
         self.draw_grid()
+        self.item_lookup = {}
+        self.lookup_ids = {}
+        self.set_hover(None)
         for comp in self.components:
             comp.update_visuals(self.zoom_scale, self.pan_x, self.pan_y)
         for wire in self.wires:
             wire.draw(self.zoom_scale, self.pan_x, self.pan_y)
+        for item, i_type in self.selection.items():
+            self.highlight_item(item, i_type)
+        self.draw_op_annotations()
+        self.draw_net_highlight()
+        self.draw_diff_overlay()
+        self.update_minimap_view()
 
     def start_pan(self, event):
         self.drag_data["pan_start_x"] = event.x
@@ -225,6 +365,7 @@ class SchematicEditor(tk.Frame):
 
     # --- 互動邏輯 ---
     def set_mode(self, mode):
+        self.set_hover(None)
         self.mode = mode
         self.mode_label.config(text=f"Mode: {mode}")
         if mode == "DELETE":
@@ -233,12 +374,24 @@ class SchematicEditor(tk.Frame):
         elif mode == "WIRE":
             self.mode_label.config(fg="green")
             self.canvas.config(cursor="crosshair")
+        elif mode == "ROUTE":
+            self.mode_label.config(fg="purple")
+            self.canvas.config(cursor="tcross")
+        elif mode == "PROBE":
+            self.mode_label.config(fg="#cc6600")
+            self.canvas.config(cursor="target")
+        elif mode == "NET":
+            self.mode_label.config(fg="#008080")
+            self.canvas.config(cursor="hand2")
         else:
             self.mode_label.config(fg="blue")
             self.canvas.config(cursor="")
         self.temp_wire_start = None
+        self.route_picks = []
         self.canvas.delete("preview_wire")
+        self.canvas.delete("route_pick")
         self.canvas.delete("selection_box")
+        self.clear_net_highlight()
         self.deselect_all()
         self.canvas.focus_set()
 
@@ -263,12 +416,22 @@ class SchematicEditor(tk.Frame):
             comp = CMOS(self.canvas, x, y, True)
             comp.model = self.global_settings["def_p_model"]
         elif c_type == "PIN": comp = Pin(self.canvas, x, y)
+        elif c_type in default_library():
+            try: comp = LibraryComponent(self.canvas, x, y, default_library().get(c_type))
+            except ValueError as e: messagebox.showerror("Symbol Library", str(e))
         
         if comp: 
-            self.components.append(comp)
-            comp.update_visuals(self.zoom_scale, self.pan_x, self.pan_y)
+            self.add_component(comp)
+            self.normalize_wires()
         self.canvas.focus_set()
 
+    def fill_library_menu(self, menu):
+        menu.delete(0, tk.END)
+        for name in default_library().names():
+            menu.add_command(label=name, command=lambda c=name: self.add_comp(c))
+        if menu.index(tk.END) is not None: menu.add_separator()
+        menu.add_command(label="Reload Library", command=default_library().reload)
+
     # --- 吸附邏輯 ---
     def get_best_snap_point(self, x, y, threshold=15):
         best_pt = None
@@ -300,17 +463,14 @@ class SchematicEditor(tk.Frame):
     # --- 滑鼠事件 ---
     def on_click(self, event):
         self.canvas.focus_set()
+        self.set_hover(None) # 提示框不可擋住點選
         lx = self.to_logical(event.x, True)
         ly = self.to_logical(event.y, False)
 
         if self.mode == "DELETE":
             if self.del_style.get() == "CLICK":
-                item_id = self.canvas.find_closest(event.x, event.y)
-                tags = self.canvas.gettags(item_id)
-                for comp in self.components:
-                    if comp.tags in tags: self.delete_target(comp, "comp"); return
-                for wire in self.wires:
-                    if wire.tags in tags: self.delete_target(wire, "wire"); return
+                item, i_type = self.find_target(event.x, event.y)
+                if item is not None: self.delete_target(item, i_type)
             elif self.del_style.get() == "BOX":
                 self.drag_data["box_start_x"] = event.x # 框選使用螢幕座標
                 self.drag_data["box_start_y"] = event.y
@@ -318,7 +478,22 @@ class SchematicEditor(tk.Frame):
 
         cx, cy = snap(lx), snap(ly)
         
-        if self.mode == "WIRE":
+        if self.mode == "ROUTE":
+            self.pick_route_terminal(lx, ly)
+
+        elif self.mode == "PROBE":
+            net = self.net_at(event.x, event.y)
+            if net is None: return
+            self.highlight_net(net)
+            self.status_label.config(text=f"Probe: {net}")
+            if self.on_probe_callback: self.on_probe_callback(self, net)
+
+        elif self.mode == "NET":
+            net = self.net_at(event.x, event.y)
+            if net is None: self.clear_net_highlight()
+            else: self.highlight_net(net)
+
+        elif self.mode == "WIRE":
             snap_pt = self.get_best_snap_point(lx, ly)
             target_pt = snap_pt if snap_pt else (cx, cy)
             
@@ -326,29 +501,92 @@ class SchematicEditor(tk.Frame):
                 self.temp_wire_start = target_pt
             else:
                 new_wire = Wire(self.canvas, self.temp_wire_start, target_pt, self.zoom_scale, self.pan_x, self.pan_y)
-                self.wires.append(new_wire)
+                self.add_wire(new_wire)
+                self.normalize_wires()
                 self.temp_wire_start = None 
                 self.canvas.delete("preview_wire")
 
         elif self.mode == "SELECT":
-            item_id = self.canvas.find_closest(event.x, event.y)
-            tags = self.canvas.gettags(item_id)
-            for comp in self.components:
-                if comp.tags in tags:
-                    self.select_item(comp, "comp")
-                    self.drag_data = {
-                        "x": event.x, "y": event.y,
-                        "start_x": event.x, "start_y": event.y,
-                        "comp_start_x": comp.x, "comp_start_y": comp.y,
-                        "comp": comp
-                    }
-                    return
-            for wire in self.wires:
-                if wire.tags in tags: self.select_item(wire, "wire"); return
-            self.deselect_all()
+            item, i_type = self.find_target(event.x, event.y)
+            shift = bool(event.state & 0x0001)
+            if item is None:
+                # 點在空白處: 開始框選 (Shift 保留原本的選取)
+                if not shift: self.deselect_all()
+                self.drag_data = {"box_start_x": event.x, "box_start_y": event.y}
+                return
+            if shift:
+                self.toggle_item(item, i_type)
+                return
+            if item not in self.selection:
+                self.select_item(item, i_type)
+            if i_type == "comp":
+                self.drag_data = {
+                    "x": event.x, "y": event.y,
+                    "start_x": event.x, "start_y": event.y,
+                    "comp_start_x": item.x, "comp_start_y": item.y,
+                    "comp": item,
+                    "attached": self.attached_wire_ends()
+                }
+
+    def find_target(self, sx, sy):
+        """回傳螢幕座標下最近的 (物件, 類型)，沒有則 (None, None)"""
+        item_id = self.canvas.find_closest(sx, sy)
+        if not item_id: return None, None
+        return self.resolve_item(item_id[0])
+
+    def resolve_item(self, item_id):
+        """canvas item id -> (物件, 類型)，經由 registry 以常數時間查詢"""
+        entry = self.item_lookup.get(item_id)
+        if entry is None:
+            for tag in self.canvas.gettags(item_id):
+                entry = self.registry.get(tag)
+                if entry is not None:
+                    self.item_lookup[item_id] = entry
+                    self.lookup_ids.setdefault(tag, []).append(item_id)
+                    break
+        return entry if entry is not None else (None, None)
+
+    def set_hover(self, item, item_type=None):
+        """滑鼠停留提示: 虛線外框 + 狀態列顯示名稱"""
+        if item is self.hover: return
+        self.canvas.delete("hover")
+        self.hover = item
+        if item is None:
+            self.status_label.config(text="")
+            self.canvas.config(cursor="")
+            return
+        bbox = self.canvas.bbox(item.tags)
+        if bbox:
+            self.canvas.create_rectangle(bbox[0]-2, bbox[1]-2, bbox[2]+2, bbox[3]+2,
+                                         outline="orange", dash=(2, 2), tags="hover")
+        if item_type == "comp":
+            self.status_label.config(text=f"{type(item).__name__} {item.name}  {item.value}")
+        else:
+            self.status_label.config(text=f"Wire {item.start_p} - {item.end_p}")
+        self.canvas.config(cursor="hand2")
+
+    def find_in_box(self, sx1, sy1, sx2, sy2):
+        """框選範圍 (螢幕座標) 內的元件與電線"""
+        x1 = self.to_logical(min(sx1, sx2), True)
+        x2 = self.to_logical(max(sx1, sx2), True)
+        y1 = self.to_logical(min(sy1, sy2), False)
+        y2 = self.to_logical(max(sy1, sy2), False)
+        comps = [c for c in self.components if x1 <= c.x <= x2 and y1 <= c.y <= y2]
+        wires = [w for w in self.wires
+                 if (x1 <= w.start_p[0] <= x2 and y1 <= w.start_p[1] <= y2) and
+                    (x1 <= w.end_p[0] <= x2 and y1 <= w.end_p[1] <= y2)]
+        return comps, wires
 
     def on_mouse_move(self, event):
         lx, ly = self.to_logical(event.x, True), self.to_logical(event.y, False)
+        self.last_mouse = (lx, ly)
+
+        if self.mode == "SELECT":
+            target = (None, None)
+            for item_id in reversed(self.canvas.find_overlapping(event.x-2, event.y-2, event.x+2, event.y+2)):
+                target = self.resolve_item(item_id)
+                if target[0] is not None: break
+            self.set_hover(*target)
         
         if self.mode == "WIRE" and self.temp_wire_start:
             # 預覽線繪製
@@ -365,53 +603,61 @@ class SchematicEditor(tk.Frame):
             self.canvas.create_line(sx, sy, ex, ey, fill="gray", dash=(4, 4), tags="preview_wire")
 
     def on_drag(self, event):
-        # Box Delete Visual
-        if self.mode == "DELETE" and self.del_style.get() == "BOX":
-            start_x = self.drag_data.get("box_start_x")
+        # Box Delete / Box Select Visual
+        box_mode = (self.mode == "DELETE" and self.del_style.get() == "BOX") or self.mode == "SELECT"
+        start_x = self.drag_data.get("box_start_x")
+        if box_mode and start_x is not None:
             start_y = self.drag_data.get("box_start_y")
-            if start_x is not None:
-                self.canvas.delete("selection_box")
-                self.canvas.create_rectangle(start_x, start_y, event.x, event.y, outline="red", dash=(4, 4), width=2, tags="selection_box")
+            color = "red" if self.mode == "DELETE" else "blue"
+            self.canvas.delete("selection_box")
+            self.canvas.create_rectangle(start_x, start_y, event.x, event.y, outline=color, dash=(4, 4), width=2, tags="selection_box")
             return
 
-        # Comp Drag
-        if self.mode == "SELECT" and self.selected_item and self.selected_item[1] == "comp":
+        # Selection Drag: 整組共用 "selected" tag，每次只需一次 canvas.move
+        if self.mode == "SELECT" and self.drag_data.get("comp") in self.selection:
             dx = event.x - self.drag_data["x"]
             dy = event.y - self.drag_data["y"]
-            comp = self.drag_data["comp"]
-            self.canvas.move(comp.tags, dx, dy)
+            self.canvas.move("selected", dx, dy)
             self.drag_data["x"] = event.x
             self.drag_data["y"] = event.y
 
+            # 只更新接在移動腳位上的電線
+            tdx = event.x - self.drag_data["start_x"]
+            tdy = event.y - self.drag_data["start_y"]
+            for wire, ends in self.drag_data["attached"].items():
+                pts = [((p[0] * self.zoom_scale) + self.pan_x, (p[1] * self.zoom_scale) + self.pan_y)
+                       for p in (wire.start_p, wire.end_p)]
+                for end in ends: pts[end] = (pts[end][0] + tdx, pts[end][1] + tdy)
+                wire.preview(pts[0][0], pts[0][1], pts[1][0], pts[1][1])
+
     def on_release(self, event):
         # Box Delete Execution
         if self.mode == "DELETE" and self.del_style.get() == "BOX":
             start_x = self.drag_data.get("box_start_x")
             start_y = self.drag_data.get("box_start_y")
             if start_x is not None:
-                x1 = self.to_logical(min(start_x, event.x), True)
-                x2 = self.to_logical(max(start_x, event.x), True)
-                y1 = self.to_logical(min(start_y, event.y), False)
-                y2 = self.to_logical(max(start_y, event.y), False)
-                
-                comps_to_delete = []
-                wires_to_delete = []
-                for comp in self.components:
-                    if x1 <= comp.x <= x2 and y1 <= comp.y <= y2:
-                        comps_to_delete.append(comp)
-                for wire in self.wires:
-                    if (x1 <= wire.start_p[0] <= x2 and y1 <= wire.start_p[1] <= y2) and \
-                       (x1 <= wire.end_p[0] <= x2 and y1 <= wire.end_p[1] <= y2):
-                        wires_to_delete.append(wire)
-                for c in comps_to_delete: self.delete_target(c, "comp")
-                for w in wires_to_delete: self.delete_target(w, "wire")
+                comps, wires = self.find_in_box(start_x, start_y, event.x, event.y)
+                self.delete_items([(c, "comp") for c in comps] + [(w, "wire") for w in wires])
+                self.normalize_wires()
                 self.canvas.delete("selection_box")
                 self.drag_data["box_start_x"] = None
             return
 
-        # Component Drop
-        if self.mode == "SELECT" and self.selected_item and self.selected_item[1] == "comp":
-            comp = self.selected_item[0]
+        if self.mode != "SELECT": return
+
+        # Box Select Execution
+        start_x = self.drag_data.get("box_start_x")
+        if start_x is not None:
+            comps, wires = self.find_in_box(start_x, self.drag_data["box_start_y"], event.x, event.y)
+            for c in comps: self.select_item(c, "comp", add=True)
+            for w in wires: self.select_item(w, "wire", add=True)
+            self.canvas.delete("selection_box")
+            self.drag_data["box_start_x"] = None
+            return
+
+        # Selection Drop: 以被拖曳的元件為錨點做腳位吸附，其餘選取物件套用相同位移
+        comp = self.drag_data.get("comp")
+        if comp in self.selection:
             total_dx = (event.x - self.drag_data["start_x"]) / self.zoom_scale
             total_dy = (event.y - self.drag_data["start_y"]) / self.zoom_scale
             
@@ -430,14 +676,17 @@ class SchematicEditor(tk.Frame):
             comp.x, comp.y = orig_x, orig_y
 
             for other in self.components:
-                if other == comp: continue
+                if other in self.selection: continue
                 for o_term, ox, oy in other.get_abs_terminals():
                     for term, mx, my in my_terms:
                         d = dist((mx, my), (ox, oy))
                         if d < threshold:
                             snap_candidates.append((d, raw_target_x + (ox - mx), raw_target_y + (oy - my)))
+            attached = self.drag_data.get("attached", {})
             for wire in self.wires:
-                for wx, wy in [wire.start_p, wire.end_p]:
+                if wire in self.selection: continue
+                for end, (wx, wy) in enumerate([wire.start_p, wire.end_p]):
+                     if end in attached.get(wire, ()): continue # 跟著移動的端點
                      for term, mx, my in my_terms:
                         d = dist((mx, my), (wx, wy))
                         if d < threshold:
@@ -448,50 +697,268 @@ class SchematicEditor(tk.Frame):
                 target_x = snap_candidates[0][1]
                 target_y = snap_candidates[0][2]
             
-            comp.x = target_x
-            comp.y = target_y
-            comp.update_visuals(self.zoom_scale, self.pan_x, self.pan_y)
+            dx, dy = target_x - comp.x, target_y - comp.y
+            moves = {key: (key[0] + dx, key[1] + dy) for key in self.selected_terminal_keys()}
+            self.move_selection(dx, dy)
+            self.stretch_wires(moves)
+            self.normalize_wires()
 
     # --- 通用功能 ---
     def on_double_click(self, event):
-        if self.selected_item and self.selected_item[1] == "comp":
-            self.selected_item[0].edit_properties()
+        comp = self.drag_data.get("comp")
+        if comp in self.selection:
+            comp.edit_properties()
+            if isinstance(comp, SubcktInstance): # 改了 cell 時埠要跟著新 cell 的 Pin
+                cell = self.find_cell(comp.cell)
+                if cell is not None and cell.cell_ports() != comp.ports: comp.set_ports(cell.cell_ports())
+            self.redraw_item(comp, "comp")
+            self.touch([comp])
+            self.normalize_wires()
 
-    def select_item(self, item, item_type):
-        self.deselect_all()
-        self.selected_item = (item, item_type)
+    def highlight_item(self, item, item_type):
+        self.canvas.addtag_withtag("selected", item.tags)
         if item_type == "comp":
             self.canvas.itemconfig(item.tags, fill="blue") 
         elif item_type == "wire":
             self.canvas.itemconfig(item.tags, fill="red")
 
+    def redraw_item(self, item, item_type):
+        """重畫單一物件，若仍在選取中則補回 highlight 與 "selected" tag"""
+        if not self.materialized: return
+        self.forget_items(item)
+        if item_type == "comp":
+            item.update_visuals(self.zoom_scale, self.pan_x, self.pan_y)
+        elif item_type == "wire":
+            item.draw(self.zoom_scale, self.pan_x, self.pan_y)
+        if item in self.selection: self.highlight_item(item, item_type)
+
+    def forget_items(self, item):
+        """物件的 canvas item 即將重畫或刪除: 移除其已快取的 item id"""
+        for item_id in self.lookup_ids.pop(item.tags, ()): self.item_lookup.pop(item_id, None)
+
+    def select_item(self, item, item_type, add=False):
+        if not add: self.deselect_all()
+        self.selection[item] = item_type
+        self.highlight_item(item, item_type)
+
+    def toggle_item(self, item, item_type):
+        if item in self.selection:
+            del self.selection[item]
+            self.redraw_item(item, item_type)
+        else:
+            self.select_item(item, item_type, add=True)
+
     def deselect_all(self):
-        if self.selected_item:
-            item, i_type = self.selected_item
+        selection, self.selection = self.selection, {}
+        for item, i_type in selection.items():
+            self.redraw_item(item, i_type)
+        self.canvas.dtag("selected", "selected")
+
+    def move_selection(self, dx, dy):
+        """以邏輯座標位移整組選取，並重畫 (拖曳時的 canvas.move 只是預覽)"""
+        for item, i_type in self.selection.items():
             if i_type == "comp":
-                item.update_visuals(self.zoom_scale, self.pan_x, self.pan_y) 
+                item.x += dx
+                item.y += dy
+                self.touch([item])
             elif i_type == "wire":
-                self.canvas.itemconfig(item.tags, fill="blue")
-        self.selected_item = None
+                self.unindex_wire(item)
+                item.start_p = (item.start_p[0] + dx, item.start_p[1] + dy)
+                item.end_p = (item.end_p[0] + dx, item.end_p[1] + dy)
+                self.index_wire(item)
+            self.redraw_item(item, i_type)
 
-    def delete_target(self, item, i_type):
-        if i_type == "comp":
+    def delete_items(self, items):
+        """批次刪除 [(物件, 類型), ...]：模型清單只重建一次"""
+        doomed = dict(items)
+        if not doomed: return
+        if self.hover in doomed: self.set_hover(None)
+        for item, i_type in doomed.items():
+            self.forget_items(item)
             self.canvas.delete(item.tags)
-            if item in self.components: self.components.remove(item)
-        elif i_type == "wire":
-            self.canvas.delete(item.tags)
-            if item in self.wires: self.wires.remove(item)
-        self.selected_item = None
+            self.selection.pop(item, None)
+            self.registry.pop(item.tags, None)
+            if i_type == "wire": self.unindex_wire(item)
+        self.components = [c for c in self.components if c not in doomed]
+        self.wires = [w for w in self.wires if w not in doomed]
+        self.touch([i for i, t in doomed.items() if t == "comp"])
+
+    def add_component(self, comp):
+        self.components.append(comp)
+        self.registry[comp.tags] = (comp, "comp")
+        if self.materialized: comp.update_visuals(self.zoom_scale, self.pan_x, self.pan_y)
+        self.touch([comp])
+
+    def add_batch(self, comps, wires):
+        """大量新增: 模型一次加入、索引與 ERC 只通知一次；canvas 先畫視窗內，其餘分批補畫"""
+        self.components.extend(comps)
+        for comp in comps: self.registry[comp.tags] = (comp, "comp")
+        self.wires.extend(wires)
+        for wire in wires:
+            self.registry[wire.tags] = (wire, "wire")
+            self.index_wire(wire, notify=False)
+        self.touch(comps, wires=bool(wires))
+        self.queue_render([(c, "comp") for c in comps] + [(w, "wire") for w in wires])
+
+    # --- 電線端點索引 (腳位 -> 電線) ---
+    def add_wire(self, wire):
+        self.wires.append(wire)
+        self.registry[wire.tags] = (wire, "wire")
+        self.index_wire(wire)
+
+    def index_wire(self, wire, notify=True):
+        for end, pt in enumerate((wire.start_p, wire.end_p)):
+            self.wire_ends.setdefault(point_key(pt), set()).add((wire, end))
+        self.net_index.add_wire(wire)
+        self.overview.set(wire.tags, "wire", *wire.start_p, *wire.end_p)
+        self.bbox_index.set(wire.tags, (*wire.start_p, *wire.end_p))
+        self.spatial.set(wire.tags, (*wire.start_p, *wire.end_p))
+        self.norm_dirty.append((*wire.start_p, *wire.end_p))
+        self.erc_wires.add(wire)
+        if notify: self.touch(wires=True) # 批次新增時由呼叫端統一通知
+
+    def unindex_wire(self, wire):
+        self.net_index.remove_wire(wire)
+        self.overview.remove(wire.tags)
+        self.bbox_index.remove(wire.tags)
+        self.spatial.remove(wire.tags)
+        self.norm_dirty.append((*wire.start_p, *wire.end_p))
+        self.erc_wires.add(wire)
+        self.touch(wires=True)
+        for end, pt in enumerate((wire.start_p, wire.end_p)):
+            key = point_key(pt)
+            ends = self.wire_ends.get(key)
+            if ends is None: continue
+            ends.discard((wire, end))
+            if not ends: del self.wire_ends[key]
+
+    def selected_terminal_keys(self):
+        """選取元件的所有腳位 (point_key)，順序固定以便前後對應"""
+        return [point_key((tx, ty))
+                for item, i_type in self.selection.items() if i_type == "comp"
+                for term, tx, ty in item.get_abs_terminals()]
+
+    def attached_wire_ends(self):
+        """接在選取元件腳位上、但本身未被選取的電線 -> {wire: {0/1, ...}}"""
+        attached = {}
+        for key in self.selected_terminal_keys():
+            for wire, end in self.wire_ends.get(key, ()):
+                if wire not in self.selection:
+                    attached.setdefault(wire, set()).add(end)
+        return attached
+
+    def stretch_wires(self, moves):
+        """把端點在舊腳位 (key) 的未選取電線拉到新位置 {old_key: new_pt}"""
+        touched = {}
+        for old_key, new_pt in moves.items():
+            if old_key == point_key(new_pt): continue
+            for wire, end in list(self.wire_ends.get(old_key, ())):
+                if wire in self.selection: continue
+                touched.setdefault(wire, []).append((end, (clean_coord(new_pt[0]), clean_coord(new_pt[1]))))
+        for wire, ends in touched.items():
+            self.unindex_wire(wire)
+            for end, pt in ends: wire.set_end(end, pt)
+            self.index_wire(wire)
+            self.forget_items(wire)
+            wire.draw(self.zoom_scale, self.pan_x, self.pan_y)
+
+    def delete_target(self, item, i_type):
+        self.delete_items([(item, i_type)])
+        self.normalize_wires()
+
+    def delete_selection(self):
+        self.delete_items(list(self.selection.items()))
+        self.normalize_wires()
+
+    def normalize_wires(self):
+        """
+        合併共線線段、移除零長度線段並在交會點切開。只處理外框碰到上次之後變動範圍的電線，
+        其附近的腳位與其他電線端點當作交會點；未變動的 Wire 物件原樣保留
+        """
+        dirty, self.norm_dirty = self.norm_dirty, []
+        keys = set()
+        for box in dirty: keys |= self.spatial.query(box)
+        wires = [entry[0] for entry in (self.registry.get(k) for k in keys) if entry is not None and entry[1] == "wire"]
+        if not wires: return
+        picked = {w.tags for w in wires}
+        near = set()
+        for w in wires: near |= self.spatial.query((*w.start_p, *w.end_p))
+        junctions = []
+        for k in near - picked:
+            item, i_type = self.registry[k]
+            if i_type == "comp": junctions.extend((tx, ty) for term, tx, ty in item.get_abs_terminals())
+            else: junctions.extend((item.start_p, item.end_p))
+        segments = normalize_segments([(w.start_p, w.end_p) for w in wires], junctions)
+        keep = {}
+        for wire in wires:
+            keep.setdefault(seg_key(wire.start_p, wire.end_p), wire)
+        wanted = set()
+        new_segments = []
+        for p1, p2 in segments:
+            key = seg_key(p1, p2)
+            wanted.add(key)
+            if key not in keep: new_segments.append((p1, p2))
+        doomed = [w for w in wires
+                  if seg_key(w.start_p, w.end_p) not in wanted or keep[seg_key(w.start_p, w.end_p)] is not w]
+        if doomed or new_segments:
+            self.delete_items([(w, "wire") for w in doomed])
+            for p1, p2 in new_segments:
+                self.add_wire(Wire(self.canvas, p1, p2, self.zoom_scale, self.pan_x, self.pan_y, self.materialized))
+        self.norm_dirty = [] # 結果已正規化，本身的增刪不必再處理
+
+    def on_delete_key(self):
+        # 有選取時直接刪除，否則切換刪除模式
+        if self.mode == "SELECT" and self.selection: self.delete_selection()
+        else: self.toggle_delete_mode()
+
+    def transform_selection(self, op):
+        """以選取範圍的重心 (吸附到網格) 整組旋轉 90 度或左右鏡像"""
+        comps = [i for i, t in self.selection.items() if t == "comp"]
+        wires = [i for i, t in self.selection.items() if t == "wire"]
+        if len(comps) == 1 and not wires:
+            # 單一元件維持原地旋轉/鏡像
+            old_keys = self.selected_terminal_keys()
+            comps[0].rotate() if op == "rotate" else comps[0].flip()
+            self.redraw_item(comps[0], "comp")
+            self.touch(comps)
+            self.stretch_wires(dict(zip(old_keys, self.selected_terminal_keys())))
+            self.normalize_wires()
+            return
+        pts = [(c.x, c.y) for c in comps] + [p for w in wires for p in (w.start_p, w.end_p)]
+        if not pts: return
+        cx = snap(sum(p[0] for p in pts) / len(pts))
+        cy = snap(sum(p[1] for p in pts) / len(pts))
+
+        def tf(x, y):
+            if op == "rotate": rx, ry = rotate_point(x - cx, y - cy, 90)
+            else: rx, ry = -(x - cx), y - cy
+            return clean_coord(cx + rx), clean_coord(cy + ry)
+
+        old_keys = self.selected_terminal_keys()
+        for comp in comps:
+            comp.x, comp.y = tf(comp.x, comp.y)
+            if op == "rotate":
+                comp.rotate()
+            else:
+                # 世界座標鏡像 = 旋轉角取負 + 本地鏡像
+                comp.rotation = (-comp.rotation) % 360
+                comp.flip()
+        self.touch(comps)
+        for wire in wires:
+            self.unindex_wire(wire)
+            wire.start_p = tf(*wire.start_p)
+            wire.end_p = tf(*wire.end_p)
+            self.index_wire(wire)
+        for item, i_type in self.selection.items():
+            self.redraw_item(item, i_type)
+        self.stretch_wires(dict(zip(old_keys, self.selected_terminal_keys())))
+        self.normalize_wires()
 
     def rotate_selection(self):
-        if self.selected_item and self.selected_item[1] == "comp": 
-            self.selected_item[0].rotate()
-            self.selected_item[0].update_visuals(self.zoom_scale, self.pan_x, self.pan_y)
+        self.transform_selection("rotate")
     
     def mirror_selection(self):
-        if self.selected_item and self.selected_item[1] == "comp": 
-            self.selected_item[0].flip()
-            self.selected_item[0].update_visuals(self.zoom_scale, self.pan_x, self.pan_y)
+        self.transform_selection("mirror")
 
     def toggle_delete_mode(self):
         self.set_mode("SELECT" if self.mode == "DELETE" else "DELETE")
@@ -499,11 +966,59 @@ class SchematicEditor(tk.Frame):
     def toggle_wire_mode(self):
         self.set_mode("SELECT" if self.mode == "WIRE" else "WIRE")
 
+    def toggle_probe_mode(self):
+        self.set_mode("SELECT" if self.mode == "PROBE" else "PROBE")
+
+    def toggle_net_mode(self):
+        self.set_mode("SELECT" if self.mode == "NET" else "NET")
+
+    def toggle_route_mode(self):
+        self.set_mode("SELECT" if self.mode == "ROUTE" else "ROUTE")
+
+    # --- 自動繞線 ---
+    def pick_route_terminal(self, lx, ly, threshold=15):
+        best, min_dist = None, threshold
+        for comp in self.components:
+            for term, tx, ty in comp.get_abs_terminals():
+                d = dist((lx, ly), (tx, ty))
+                if d < min_dist: best, min_dist = (comp, tx, ty), d
+        if not best or best in self.route_picks: return
+        self.route_picks.append(best)
+        sx = (best[1] * self.zoom_scale) + self.pan_x
+        sy = (best[2] * self.zoom_scale) + self.pan_y
+        r = 6 * self.zoom_scale
+        self.canvas.create_oval(sx-r, sy-r, sx+r, sy+r, outline="purple", width=2, tags="route_pick")
+
+    def add_routed_segments(self, segments):
+        for p1, p2 in segments:
+            self.add_wire(Wire(self.canvas, p1, p2, self.zoom_scale, self.pan_x, self.pan_y))
+        self.normalize_wires()
+
+    def route_picked(self):
+        if len(self.route_picks) < 2: return
+        segments = route_net(self.components, self.wires, self.route_picks)
+        if segments is None:
+            messagebox.showwarning("Autoroute", "No route found for the picked terminals.")
+            return
+        self.add_routed_segments(segments)
+        self.route_picks = []
+        self.canvas.delete("route_pick")
+
+    def route_named_nets(self):
+        nets = unrouted_named_nets(self.components, self.wires)
+        if not nets:
+            messagebox.showinfo("Autoroute", "All named nets are already connected.")
+            return
+        routed, failed = route_nets(self.components, self.wires, nets)
+        self.add_routed_segments([seg for segs in routed.values() for seg in segs])
+        if failed:
+            messagebox.showwarning("Autoroute", "Could not route: " + ", ".join(failed))
+
     # --- Settings Windows ---
     def open_global_settings(self):
         win = tk.Toplevel(self)
         win.title("Global Configuration")
-        win.geometry("450x350")
+        win.geometry("450x490")
         
         lb_frame = tk.LabelFrame(win, text="Library & Process", padx=10, pady=10)
         lb_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -536,6 +1051,19 @@ class SchematicEditor(tk.Frame):
         pmod_var = tk.StringVar(value=self.global_settings["def_p_model"])
         tk.Entry(mod_frame, textvariable=pmod_var).grid(row=1, column=1, sticky="w", padx=5)
 
+        sim_frame = tk.LabelFrame(win, text="Simulator", padx=10, pady=10)
+        sim_frame.pack(fill=tk.X, padx=10, pady=5)
+        tk.Label(sim_frame, text="Command:").grid(row=0, column=0, sticky="e")
+        cmd_var = tk.StringVar(value=self.global_settings["sim_cmd"])
+        tk.Entry(sim_frame, textvariable=cmd_var, width=32).grid(row=0, column=1, sticky="w", padx=5)
+        tk.Label(sim_frame, text="{deck} {out} {dir} {stub}", fg="gray", font=("Arial", 8)).grid(row=1, column=1, sticky="w", padx=5)
+        tk.Label(sim_frame, text="Max Parallel Jobs:").grid(row=2, column=0, sticky="e")
+        jobs_var = tk.StringVar(value=self.global_settings["max_jobs"])
+        tk.Entry(sim_frame, textvariable=jobs_var, width=6).grid(row=2, column=1, sticky="w", padx=5)
+        tk.Label(sim_frame, text="Result Cache (MB):").grid(row=3, column=0, sticky="e")
+        cache_var = tk.StringVar(value=self.global_settings["cache_mb"])
+        tk.Entry(sim_frame, textvariable=cache_var, width=6).grid(row=3, column=1, sticky="w", padx=5)
+
         def on_save():
             self.global_settings["lib_path"] = path_var.get()
             self.global_settings["corner"] = corn_var.get()
@@ -543,6 +1071,10 @@ class SchematicEditor(tk.Frame):
             self.global_settings["options"] = opt_var.get()
             self.global_settings["def_n_model"] = nmod_var.get()
             self.global_settings["def_p_model"] = pmod_var.get()
+            self.global_settings["sim_cmd"] = cmd_var.get()
+            self.global_settings["max_jobs"] = jobs_var.get()
+            self.global_settings["cache_mb"] = cache_var.get()
+            self.netlist_changed()
             win.destroy()
         tk.Button(win, text="Save Settings", command=on_save, bg="lightgreen", width=15).pack(pady=10)
         win.transient(self)
@@ -575,196 +1107,871 @@ class SchematicEditor(tk.Frame):
             for cmd, (v_act, v_param) in vars_store.items():
                 self.sim_settings[cmd]["active"] = v_act.get()
                 self.sim_settings[cmd]["params"] = v_param.get()
+            self.netlist_changed()
             win.destroy()
         tk.Button(win, text="Save & Close", command=on_save, bg="lightgreen", width=15).grid(row=row+1, column=0, columnspan=4, pady=15)
         win.transient(self)
         win.grab_set()
         self.wait_window(win)
 
-    # --- Netlist Generation Logic ---
-    def solve_connectivity(self):
-        adj_list = {} 
-        def add_edge(p1, p2):
-            s1 = f"{p1[0]},{p1[1]}"
-            s2 = f"{p2[0]},{p2[1]}"
-            if s1 not in adj_list: adj_list[s1] = []
-            if s2 not in adj_list: adj_list[s2] = []
-            adj_list[s1].append(s2)
-            adj_list[s2].append(s1)
-
-        # 1. Wire-Wire
-        for wire in self.wires:
-            add_edge(wire.start_p, wire.end_p)
-        for w1 in self.wires:
-            for w2 in self.wires:
-                if w1 == w2: continue
-                # Check if endpoints lie on other segments
-                if is_point_on_segment(w1.start_p[0], w1.start_p[1], w2.start_p[0], w2.start_p[1], w2.end_p[0], w2.end_p[1]):
-                    add_edge(w1.start_p, w2.start_p)
-                if is_point_on_segment(w1.end_p[0], w1.end_p[1], w2.start_p[0], w2.start_p[1], w2.end_p[0], w2.end_p[1]):
-                    add_edge(w1.end_p, w2.start_p)
-
-        # 2. Terminals
-        all_terminals = [] 
+    def open_sweep_settings(self):
+        win = tk.Toplevel(self)
+        win.title("Corner / Temperature / Supply Sweep")
+        win.geometry("520x300")
+        fields = [
+            ("corners", "Corners:", "TT FF SS FS SF"),
+            ("temps", "Temperatures:", "-40 25 125"),
+            ("supplies", "Supplies:", "VDD=1.62,1.8,1.98"),
+            ("workers", "Parallel Workers:", "separate decks only")
+        ]
+        vars_store = {}
+        for row, (key, label, hint) in enumerate(fields):
+            tk.Label(win, text=label).grid(row=row, column=0, padx=5, pady=5, sticky="e")
+            var = tk.StringVar(value=self.sweep_settings[key])
+            tk.Entry(win, textvariable=var, width=30).grid(row=row, column=1, padx=5, sticky="w")
+            tk.Label(win, text=hint, fg="gray", font=("Arial", 8)).grid(row=row, column=2, sticky="w")
+            vars_store[key] = var
+        mode_var = tk.StringVar(value=self.sweep_settings["mode"])
+        mode_frame = tk.Frame(win)
+        mode_frame.grid(row=len(fields), column=0, columnspan=3, pady=5)
+        tk.Radiobutton(mode_frame, text="Single deck with .ALTER", variable=mode_var, value="ALTER").pack(side=tk.LEFT)
+        tk.Radiobutton(mode_frame, text="Separate decks", variable=mode_var, value="DECKS").pack(side=tk.LEFT)
+
+        def store():
+            for key, var in vars_store.items(): self.sweep_settings[key] = var.get()
+            self.sweep_settings["mode"] = mode_var.get()
+        def on_save():
+            store(); win.destroy()
+        def on_export():
+            store()
+            base = filedialog.asksaveasfilename(title="Export Sweep", parent=win)
+            if not base: return
+            if base.endswith(".sp"): base = base[:-3]
+            paths = self.export_sweep(base)
+            messagebox.showinfo("Sweep", f"Wrote {len(paths)} netlist file(s).", parent=win)
+        btns = tk.Frame(win)
+        btns.grid(row=len(fields)+1, column=0, columnspan=3, pady=15)
+        tk.Button(btns, text="Export...", command=on_export, bg="yellow", width=12).pack(side=tk.LEFT, padx=5)
+        tk.Button(btns, text="Save & Close", command=on_save, bg="lightgreen", width=15).pack(side=tk.LEFT, padx=5)
+        win.transient(self)
+        win.grab_set()
+        self.wait_window(win)
+
+    def open_params_dialog(self):
+        win = tk.Toplevel(self)
+        win.title("Design Parameters (.PARAM)")
+        win.geometry("460x420")
+        tk.Label(win, text="One per line:  name = expression   (e.g. Wn = 2*Lmin)", fg="gray").pack(anchor="w", padx=5, pady=3)
+        text = tk.Text(win, height=12, font=("Consolas", 10))
+        text.pack(fill=tk.BOTH, expand=True, padx=5)
+        text.insert("1.0", "\n".join(f"{k} = {v}" for k, v in self.params.as_dict().items()))
+        result = tk.Listbox(win, height=8, font=("Consolas", 9))
+        result.pack(fill=tk.X, padx=5, pady=5)
+
+        def show_values():
+            result.delete(0, tk.END)
+            for key in self.params.order():
+                name = self.params.display[key]
+                if key in self.params.errors: result.insert(tk.END, f"{name}: ERROR {self.params.errors[key]}")
+                else: result.insert(tk.END, f"{name} = {self.params.values[key]:.6g}")
+        def parse():
+            params = {}
+            for n, line in enumerate(text.get("1.0", tk.END).splitlines(), 1):
+                line = line.strip()
+                if not line or line.startswith("*"): continue
+                if "=" not in line: raise ValueError(f"line {n}: expected name = expression")
+                name, expr = (part.strip() for part in line.split("=", 1))
+                if not re.match(r"^[A-Za-z_]\w*$", name): raise ValueError(f"line {n}: invalid name {name!r}")
+                params[name] = expr
+            return params
+        def apply():
+            try:
+                params = parse()
+                changed = self.params.update(params)
+            except ValueError as e:
+                messagebox.showerror("Parameters", str(e), parent=win)
+                return False
+            show_values()
+            if changed: self.netlist_changed()
+            if changed and self.op_result is not None: self.status_label.config(text="Parameters changed: re-run DC OP to refresh annotations")
+            return True
+        def on_save():
+            if apply(): win.destroy()
+        btns = tk.Frame(win)
+        btns.pack(pady=5)
+        tk.Button(btns, text="Apply", command=apply, width=10).pack(side=tk.LEFT, padx=5)
+        tk.Button(btns, text="Save & Close", command=on_save, bg="lightgreen", width=15).pack(side=tk.LEFT, padx=5)
+        show_values()
+        win.transient(self)
+        win.grab_set()
+        self.wait_window(win)
+
+    def export_sweep(self, base):
+        """
+        輸出掃描 netlist: 連線只解一次，各變體共用同一份元件行。
+        回傳寫出的檔案路徑
+        """
+        variants = expand_sweep(self.sweep_settings, self.global_settings)
+        circuit = list(self.iter_circuit_lines())
+        if self.sweep_settings["mode"] == "ALTER":
+            with open(base + ".sp", "w") as f:
+                f.write(render_alter_deck(self.global_settings, self.sim_settings, circuit, variants))
+            return [base + ".sp"]
+        try: workers = int(self.sweep_settings["workers"])
+        except ValueError: workers = None
+        return write_decks(base, self.global_settings, self.sim_settings, circuit, variants, workers)
+
+    # --- Simulation Jobs ---
+    def job_runner(self):
+        runner = default_runner()
+        try: runner.set_max_workers(self.global_settings["max_jobs"])
+        except ValueError: pass
+        if runner.cache is not None:
+            try: runner.cache.max_bytes = float(self.global_settings["cache_mb"]) * 2**20
+            except ValueError: pass
+        return runner
+
+    def clear_result_cache(self):
+        if default_runner().cache is not None: default_runner().cache.clear()
+        self.status_label.config(text="Simulation result cache cleared")
+
+    def run_simulation(self):
+        runner = self.job_runner()
+        job = runner.submit_text(self.generate_netlist_text(), self.global_settings["sim_cmd"], self.cell_name())
+        self.last_job = job
+        state = "restored from cache" if job.status == "cached" else "queued"
+        self.status_label.config(text=f"Job {job.id} {state}: {job.workdir}")
+        self.open_job_queue()
+
+    def run_sweep(self):
+        """掃描各變體各寫一份 deck 到同一工作目錄，整批送進 job queue 平行執行"""
+        runner = self.job_runner()
+        workdir = runner.new_workdir(self.cell_name() + "_sweep")
+        variants = expand_sweep(self.sweep_settings, self.global_settings)
+        circuit = list(self.iter_circuit_lines())
+        try: workers = int(self.sweep_settings["workers"])
+        except ValueError: workers = None
+        paths = write_decks(os.path.join(workdir, self.cell_name()), self.global_settings, self.sim_settings,
+                            circuit, variants, workers)
+        for path in paths: self.last_job = runner.submit(path, self.global_settings["sim_cmd"], workdir=workdir)
+        self.status_label.config(text=f"{len(paths)} sweep job(s) queued: {workdir}")
+        self.open_job_queue()
+
+    def latest_waveform_file(self):
+        """最近一次模擬的波形輸出 (.wfm 優先，其次 .csv)；尚未完成或沒有則 None"""
+        job = self.last_job
+        if job is None or job.status not in ("done", "cached"): return None
+        stem = os.path.splitext(job.deck_path)[0]
+        for ext in (".wfm", ".csv"):
+            if os.path.exists(stem + ext): return stem + ext
+        return None
+
+    def open_job_queue(self):
+        if self.job_window is not None and self.job_window.winfo_exists():
+            self.job_window.lift()
+            return
+        win = tk.Toplevel(self)
+        win.title("Simulation Jobs")
+        win.geometry("640x480")
+        self.job_window = win
+        cols = ("name", "status", "time")
+        tree = ttk.Treeview(win, columns=cols, height=8)
+        tree.heading("#0", text="ID"); tree.column("#0", width=50)
+        tree.heading("name", text="Name"); tree.column("name", width=320)
+        tree.heading("status", text="Status"); tree.column("status", width=90)
+        tree.heading("time", text="Time"); tree.column("time", width=70)
+        tree.pack(fill=tk.X, padx=5, pady=5)
+        btns = tk.Frame(win)
+        btns.pack(fill=tk.X, padx=5)
+        log = tk.Text(win, font=("Consolas", 9), state=tk.DISABLED)
+        log.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        runner = default_runner()
+        shown = {"job": None, "lines": 0} # log 視窗目前顯示的工作與行數
+
+        def selected_ids():
+            return [int(i) for i in tree.selection()]
+        tk.Button(btns, text="Cancel", command=lambda: [runner.cancel(i) for i in selected_ids()]).pack(side=tk.LEFT, padx=2)
+        tk.Button(btns, text="Cancel All", command=runner.cancel_all).pack(side=tk.LEFT, padx=2)
+        tk.Label(btns, text="Select a job to follow its log", fg="gray").pack(side=tk.RIGHT)
+
+        def refresh():
+            if not win.winfo_exists(): return
+            for job in runner.jobs.values():
+                values = (job.name, job.status, f"{job.elapsed():.1f}s")
+                if tree.exists(str(job.id)): tree.item(str(job.id), values=values)
+                else: tree.insert("", tk.END, iid=str(job.id), text=str(job.id), values=values)
+            ids = selected_ids()
+            job = runner.jobs.get(ids[0]) if ids else None
+            if job is not shown["job"]:
+                shown.update(job=job, lines=0)
+                log.config(state=tk.NORMAL); log.delete("1.0", tk.END); log.config(state=tk.DISABLED)
+            if job is not None and len(job.log) > shown["lines"]:
+                new = job.log[shown["lines"]:]
+                shown["lines"] += len(new)
+                log.config(state=tk.NORMAL); log.insert(tk.END, "".join(new)); log.see(tk.END); log.config(state=tk.DISABLED)
+            win.after(200, refresh)
+        refresh()
+
+    def net_at(self, sx, sy):
+        """螢幕座標下電線或最近腳位所屬的網路名稱"""
+        item, i_type = self.find_target(sx, sy)
+        if item is None: return None
+        if i_type == "wire": return self.net_of(item.start_p)
+        lx, ly = self.to_logical(sx, True), self.to_logical(sy, False)
+        terms = item.get_abs_terminals()
+        if not terms: return None
+        _, tx, ty = min(terms, key=lambda t: dist((lx, ly), (t[1], t[2])))
+        return self.net_of((tx, ty))
+
+    # --- 網路查詢與高亮 ---
+    def net_of(self, point):
+        """邏輯座標點 (腳位、電線端點或電線上) 所屬的網路名稱，沒有則 None"""
+        return self.nets().net_at(point)
+
+    def members_of(self, net):
+        """網路上的 ([Wire], [(comp, term, (x, y))])"""
+        return self.nets().members(net)
+
+    def highlight_net(self, net):
+        self.hl_net = net
+        self.draw_net_highlight()
+        wires, terms = self.members_of(net)
+        self.status_label.config(text=f"Net {net}: {len(wires)} segment(s), {len(terms)} terminal(s)")
+
+    def clear_net_highlight(self):
+        self.hl_net = None
+        self.canvas.delete("net_hl")
+
+    def draw_net_highlight(self):
+        self.canvas.delete("net_hl")
+        if self.hl_net is None: return
+        wires, terms = self.members_of(self.hl_net)
+        s, px, py = self.zoom_scale, self.pan_x, self.pan_y
+        lw = max(4, int(4 * s))
+        for w in wires:
+            self.canvas.create_line(w.start_p[0] * s + px, w.start_p[1] * s + py, w.end_p[0] * s + px, w.end_p[1] * s + py,
+                                    fill="#ff8800", width=lw, tags="net_hl")
+        r = 5 * s
+        for comp, term, (tx, ty) in terms:
+            sx, sy = tx * s + px, ty * s + py
+            self.canvas.create_oval(sx - r, sy - r, sx + r, sy + r, outline="#ff8800", width=2, tags="net_hl")
+        self.canvas.tag_raise("net_hl")
+
+    # --- Built-in DC Operating Point ---
+    def source_dc_value(self, comp):
+        """DC 工作點使用的電源值: DC 值，PULSE 取 v1，SIN 取 vo，AC 為 0"""
+        p = comp.params.get(comp.source_type, {})
+        if comp.source_type == "DC": return self.params.evaluate(p.get("dc_val", "0"))
+        if comp.source_type == "PULSE": return self.params.evaluate(p.get("v1", "0"))
+        if comp.source_type == "SIN": return self.params.evaluate(p.get("vo", "0"))
+        return 0.0
+
+    def dc_elements(self, node_map):
+        """
+        元件 -> dc_solver 元件列；L 視為 0V 短路，C 開路。
+        回傳 (elements, problems)，無法處理的元件記在 problems 並略過
+        """
+        elements, problems = [], []
+        for comp, name, nodes in self.iter_elements(node_map, problems):
+            try:
+                if isinstance(comp, Resistor):
+                    ohms = self.params.evaluate(comp.value)
+                    if ohms == 0: elements.append(("V", name, nodes, 0.0))
+                    else: elements.append(("R", name, nodes, ohms))
+                elif isinstance(comp, Inductor): elements.append(("V", name, nodes, 0.0))
+                elif isinstance(comp, Capacitor): continue
+                elif isinstance(comp, VoltageSource): elements.append(("V", name, nodes, self.source_dc_value(comp)))
+                elif isinstance(comp, CurrentSource): elements.append(("I", name, nodes, self.source_dc_value(comp)))
+                elif isinstance(comp, CMOS):
+                    elements.append(("M", name, nodes, ("p" if comp.p_type else "n", self.params.evaluate(comp.w), self.params.evaluate(comp.l))))
+                else: problems.append(f"{name}: {type(comp).__name__} not supported")
+            except ValueError as e:
+                problems.append(f"{name}: {e}")
+        return elements, problems
+
+    def run_dc_op(self):
+        node_map = self.solve_connectivity()
+        elements, problems = self.dc_elements(node_map)
+        if not elements:
+            messagebox.showinfo("DC Operating Point", "Nothing to solve.")
+            return
+        result = solve_op(elements)
+        if any(v != v for v in result.voltages.values()): # NaN: 矩陣奇異 (例如電壓源迴路)
+            messagebox.showerror("DC Operating Point", "Singular circuit matrix (voltage source loop or floating source?)")
+            return
+        self.op_result = result
+        self.op_points = []
+        done = set()
         for comp in self.components:
             for term, tx, ty in comp.get_abs_terminals():
-                all_terminals.append((comp, term, tx, ty))
-                for wire in self.wires:
-                    if is_point_on_segment(tx, ty, wire.start_p[0], wire.start_p[1], wire.end_p[0], wire.end_p[1]):
-                        add_edge((tx, ty), wire.start_p)
-
-        # 3. Short
-        connection_tolerance = 15.0 
-        for i in range(len(all_terminals)):
-            for j in range(i + 1, len(all_terminals)):
-                t1 = all_terminals[i]
-                t2 = all_terminals[j]
-                if dist((t1[2], t1[3]), (t2[2], t2[3])) < connection_tolerance:
-                    add_edge((t1[2], t1[3]), (t2[2], t2[3]))
-
-        # 4. BFS
-        visited = set()
-        node_map = {} 
-        net_counter = 1
-        for comp, term, tx, ty in all_terminals:
-            pt_key = f"{tx},{ty}"
-            if pt_key not in visited:
-                group_pts = []
-                queue = [pt_key]
-                visited.add(pt_key)
-                group_pts.append(pt_key)
-                while queue:
-                    curr = queue.pop(0)
-                    if curr in adj_list:
-                        for neighbor in adj_list[curr]:
-                            if neighbor not in visited:
-                                visited.add(neighbor)
-                                group_pts.append(neighbor)
-                                queue.append(neighbor)
-                final_name = None
-                pin_names = []
-                custom_names = []
-                for c, t, ctx, cty in all_terminals:
-                    c_key = f"{ctx},{cty}"
-                    if c_key in group_pts:
-                        if isinstance(c, Pin):
-                            pin_names.append(c.name)
-                        elif t.custom_net_name.strip() != "":
-                            custom_names.append(t.custom_net_name)
-                if pin_names: final_name = pin_names[0]
-                elif custom_names: final_name = custom_names[0]
-                else:
-                    final_name = f"N_{net_counter}"
-                    net_counter += 1
-                for pt in group_pts:
-                    node_map[pt] = final_name
-        return node_map
+                key = point_key((tx, ty))
+                if key in done or key not in node_map: continue
+                done.add(key)
+                v = result.voltage(node_map[key])
+                if v is not None: self.op_points.append((tx, ty, v))
+        self.draw_op_annotations()
+        state = f"converged in {result.iterations} iteration(s)" if result.converged else "did NOT converge"
+        self.status_label.config(text=f"DC OP: {len(result.voltages)} node(s), {state}")
+        if problems:
+            messagebox.showwarning("DC Operating Point", "Skipped:\n" + "\n".join(problems[:20]))
 
-    def generate_netlist_text(self):
-        node_map = self.solve_connectivity()
-        lines = ["* Generated by Python Circuit CAD"]
-        
-        if self.global_settings["options"]: lines.append(f".OPTIONS {self.global_settings['options']}")
-        if self.global_settings["temp"]: lines.append(f".TEMP {self.global_settings['temp']}")
-        if self.global_settings["lib_path"]:
-            lines.append(".PROTECT")
-            lines.append(f".LIB '{self.global_settings['lib_path']}' {self.global_settings['corner']}")
-            lines.append(".UNPROTECT")
-        lines.append("")
+    def clear_op_annotations(self):
+        self.op_result = None
+        self.op_points = []
+        self.canvas.delete("op_annot")
+
+    def draw_op_annotations(self):
+        """各腳位旁標示所屬網路的工作點電壓 (同一點只標一次)；只畫視窗內的腳位"""
+        self.canvas.delete("op_annot")
+        if self.op_result is None: return
+        w, h = self.canvas.winfo_width(), self.canvas.winfo_height()
+        x1, y1 = self.to_logical(0, True), self.to_logical(0, False)
+        x2, y2 = self.to_logical(w, True), self.to_logical(h, False)
+        for tx, ty, v in self.op_points:
+            if x1 <= tx <= x2 and y1 <= ty <= y2:
+                sx, sy = tx * self.zoom_scale + self.pan_x, ty * self.zoom_scale + self.pan_y
+                self.canvas.create_text(sx + 4, sy - 4, text=f"{v:.4g}V", anchor="sw", fill="#0066cc",
+                                        font=("Arial", max(int(8 * self.zoom_scale), 6)), tags="op_annot")
+
+    # --- Minimap ---
+    def update_minimap_view(self):
+        w, h = self.canvas.winfo_width(), self.canvas.winfo_height()
+        self.minimap.show_view(self.to_logical(0, True), self.to_logical(0, False),
+                               self.to_logical(w, True), self.to_logical(h, False))
+
+    def center_view(self, x, y):
+        """把邏輯座標 (x, y) 移到視窗中心"""
+        self.pan_x = self.canvas.winfo_width() / 2 - x * self.zoom_scale
+        self.pan_y = self.canvas.winfo_height() / 2 - y * self.zoom_scale
+        self.redraw_all()
+
+    # --- 剪貼簿 (各分頁共用) 與陣列貼上 ---
+    clipboard = None # {"components": [元件 dict], "wires": [(起點, 終點)], "box": (x1, y1, x2, y2)}
 
+    def copy_selection(self):
+        comps = [item for item, t in self.selection.items() if t == "comp"]
+        wires = [item for item, t in self.selection.items() if t == "wire"]
+        if not comps and not wires: return
+        SchematicEditor.clipboard = {
+            "components": [component_to_dict(c) for c in comps],
+            "wires": [(w.start_p, w.end_p) for w in wires],
+            "box": self.bbox_index.union(item.tags for item in self.selection)}
+        self.status_label.config(text=f"Copied {len(comps)} component(s), {len(wires)} wire(s)")
+
+    def cut_selection(self):
+        self.copy_selection()
+        self.delete_selection()
+
+    def paste_anchor(self):
+        """滑鼠所在位置；沒有時為視窗中心"""
+        if self.last_mouse is not None: return self.last_mouse
+        return (self.to_logical(self.canvas.winfo_width() / 2, True), self.to_logical(self.canvas.winfo_height() / 2, False))
+
+    def paste(self, rows=1, cols=1, pitch=None):
+        """
+        貼到滑鼠位置 (剪貼簿範圍左上角對齊)；rows x cols 時依 pitch 排成陣列。
+        名稱依此分頁同字首的最大編號往後編 (Pin 為網路名稱，保留)；整批一次加入
+        """
+        clip = SchematicEditor.clipboard
+        if not clip: return
+        box = clip["box"]
+        ax, ay = self.paste_anchor()
+        base_x, base_y = snap(ax) - snap(box[0]), snap(ay) - snap(box[1])
+        pitch = pitch or (snap(box[2] - box[0]) + 40, snap(box[3] - box[1]) + 40)
+        next_name = self.renamer()
+        comps, wires = [], []
+        for r in range(rows):
+            for c in range(cols):
+                dx, dy = base_x + c * pitch[0], base_y + r * pitch[1]
+                for item in clip["components"]:
+                    name = item["name"] if item["type"] == "Pin" else next_name(item["name"])
+                    comp = component_from_dict(self.canvas, dict(item, x=item["x"] + dx, y=item["y"] + dy, name=name),
+                                               counted=False)
+                    comps.append(comp)
+                for (x1, y1), (x2, y2) in clip["wires"]:
+                    wires.append(Wire(self.canvas, (x1 + dx, y1 + dy), (x2 + dx, y2 + dy), drawn=False))
+        self.set_mode("SELECT")
+        self.deselect_all()
+        self.selection.update((comp, "comp") for comp in comps) # 畫出時才套用選取外觀
+        self.selection.update((wire, "wire") for wire in wires)
+        self.add_batch(comps, wires)
+        self.normalize_wires()
+        self.status_label.config(text=f"Pasted {len(comps)} component(s), {len(wires)} wire(s)")
+
+    def renamer(self):
+        """
+        回傳 next_name(原名稱)；同字首 (不分大小寫) 編號接續此分頁的最大值，保留匯流排字尾 <a:b>。
+        貼上的元件不走自動編號，所以編出的號碼要登記回 Component，之後新增的元件才不會撞名
+        """
+        top = {}
         for comp in self.components:
-            if isinstance(comp, Pin): continue 
-            abs_terms = comp.get_abs_terminals()
-            node_names = []
-            for term, tx, ty in abs_terms:
-                key = f"{tx},{ty}"
-                if key in node_map: node_names.append(node_map[key])
-                else: node_names.append(f"NC_{comp.name}_{term.name}")
-            
-            line = ""
-            if isinstance(comp, CMOS):
-                line = f"{comp.name} {' '.join(node_names)} {comp.model} W={comp.w} L={comp.l}"
-            elif isinstance(comp, (VoltageSource, CurrentSource)):
-                stype = comp.source_type
-                p = comp.params.get(stype, {})
-                base_line = f"{comp.name} {' '.join(node_names)}"
-                if stype == "DC": line = f"{base_line} DC {p.get('dc_val', '0')}"
-                elif stype == "AC": line = f"{base_line} AC {p.get('mag', '1')} {p.get('phase', '0')}"
-                elif stype == "PULSE": line = f"{base_line} PULSE({p.get('v1')} {p.get('v2')} {p.get('td')} {p.get('tr')} {p.get('tf')} {p.get('pw')} {p.get('per')})"
-                elif stype == "SIN": line = f"{base_line} SIN({p.get('vo')} {p.get('va')} {p.get('freq')} {p.get('td')} {p.get('theta')})"
-                else: line = f"{base_line} DC 0"
+            m = NAME_NUM_RE.match(comp.name)
+            key = m.group(1).lower()
+            top[key] = max(top.get(key, 0), int(m.group(2) or 0))
+        def next_name(name):
+            m = NAME_NUM_RE.match(name)
+            key = m.group(1).lower()
+            top[key] = top.get(key, 0) + 1
+            Component.reserve(m.group(1), top[key])
+            return f"{m.group(1)}{top[key]}{m.group(3) or ''}"
+        return next_name
+
+    def array_paste_dialog(self):
+        clip = SchematicEditor.clipboard
+        if not clip:
+            messagebox.showinfo("Array Paste", "Copy a selection first (Ctrl+C).")
+            return
+        x1, y1, x2, y2 = clip["box"]
+        win = tk.Toplevel(self)
+        win.title("Array Paste")
+        fields = [("Rows", 2), ("Columns", 2), ("X Pitch", snap(x2 - x1) + 40), ("Y Pitch", snap(y2 - y1) + 40)]
+        entries = []
+        for i, (label, default) in enumerate(fields):
+            tk.Label(win, text=f"{label}:").grid(row=i, column=0, padx=10, pady=5, sticky="e")
+            e = tk.Entry(win, width=10)
+            e.insert(0, str(default))
+            e.grid(row=i, column=1, padx=10, pady=5)
+            entries.append(e)
+        def on_ok(event=None):
+            try: rows, cols, px, py = (int(float(e.get())) for e in entries)
+            except ValueError:
+                messagebox.showerror("Array Paste", "Enter whole numbers.", parent=win)
+                return
+            if rows < 1 or cols < 1: return
+            win.destroy()
+            self.paste(rows, cols, (px, py))
+        tk.Button(win, text="Paste", command=on_ok, bg="lightblue", width=10).grid(row=len(fields), column=0, columnspan=2, pady=10)
+        win.bind('<Return>', on_ok)
+        win.transient(self)
+        win.grab_set()
+        self.wait_window(win)
+
+    # --- 尋找與縮放至範圍 (只查索引，不掃描元件) ---
+    FIND_ZOOM = 2.0
+
+    def zoom_to_box(self, box, margin=0.9):
+        x1, y1, x2, y2 = box
+        w, h = self.canvas.winfo_width(), self.canvas.winfo_height()
+        zoom = min(w / max(x2 - x1, 1), h / max(y2 - y1, 1)) * margin
+        self.zoom_scale = min(max(zoom, 0.2), 5.0) # 與滾輪縮放相同的範圍
+        self.center_view((x1 + x2) / 2, (y1 + y2) / 2)
+
+    def zoom_to_fit(self):
+        """有選取時縮放至選取範圍，否則整張設計"""
+        if self.selection: return self.zoom_to_selection()
+        box = self.bbox_index.bounds()
+        if box is not None: self.zoom_to_box(box)
+
+    def zoom_to_selection(self):
+        box = self.bbox_index.union(item.tags for item in self.selection)
+        if box is not None: self.zoom_to_box(box)
+
+    def goto_hit(self, hit):
+        name, kind, point, uid = hit
+        self.zoom_scale = max(self.zoom_scale, self.FIND_ZOOM)
+        self.deselect_all()
+        self.center_view(*point)
+        entry = self.registry.get(uid)
+        if entry is not None: self.select_item(*entry)
+        self.status_label.config(text=f"Found {kind} {name}")
+
+    def find_dialog(self):
+        """輸入時即時以字首/模糊比對列出結果；Enter 或雙擊跳到該處 (視窗不關閉，可逐一查看)"""
+        win = tk.Toplevel(self)
+        win.title("Find")
+        query = tk.StringVar()
+        entry = tk.Entry(win, textvariable=query, width=40)
+        entry.pack(fill=tk.X, padx=5, pady=5)
+        lb = tk.Listbox(win, width=50, height=15)
+        lb.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0, 5))
+        hits = []
+        def update(*args):
+            hits[:] = self.name_index.search(query.get().strip())
+            lb.delete(0, tk.END)
+            for name, kind, point, uid in hits: lb.insert(tk.END, f"{name}    ({kind})")
+            if hits: lb.selection_set(0)
+        def go(event=None):
+            sel = lb.curselection()
+            if sel: self.goto_hit(hits[sel[0]])
+        query.trace_add("write", update)
+        entry.bind("<Return>", go)
+        entry.bind("<Down>", lambda e: lb.focus_set())
+        lb.bind("<Return>", go)
+        lb.bind("<Double-Button-1>", go)
+        win.bind("<Escape>", lambda e: win.destroy())
+        win.transient(self)
+        entry.focus_set()
+
+    # --- 與檔案結構化比對 (overlay) ---
+    DIFF_COLORS = {"added": "#00aa00", "removed": "red", "moved": "#ff8800", "revalued": "#0066cc"}
+    DIFF_BOX = 25 # 元件標記框半寬 (邏輯座標)
+
+    def compare_with_file(self):
+        """以檔案為舊版、目前內容為新版，在背景比對；結果畫在畫布上並列在清單中"""
+        path = filedialog.askopenfilename(filetypes=[("JSON", "*.json")])
+        if not path: return
+        new = self.get_schematic_data()
+        result = {}
+        def work():
+            try:
+                with open(path) as f: result["items"] = diff_schematics(json.load(f), new)
+            except Exception as e: result["error"] = f"{type(e).__name__}: {e}"
+            finally: result["done"] = True # 任何例外都要讓 poll 停下
+        threading.Thread(target=work, daemon=True).start()
+        self.status_label.config(text=f"Comparing with {os.path.basename(path)}...")
+        def poll():
+            if not result.get("done"):
+                self.after(100, poll)
+            elif "error" in result:
+                messagebox.showerror("Compare", result["error"])
             else:
-                line = f"{comp.name} {' '.join(node_names)} {comp.value}"
-            lines.append(line)
-        
-        lines.append("\n* --- Simulation Settings ---")
-        for cmd, settings in self.sim_settings.items():
-            if settings["active"]:
-                lines.append(f"{cmd} {settings['params']}")
-        lines.append(".END")
-        return "\n".join(lines)
+                self.diff_items = result["items"]
+                self.draw_diff_overlay()
+                self.show_diff_list(os.path.basename(path))
+                self.status_label.config(text=f"{len(self.diff_items)} difference(s) from {os.path.basename(path)}")
+        self.after(100, poll)
+
+    def clear_diff_overlay(self):
+        self.diff_items = None
+        self.canvas.delete("diff_ovl")
+        if self.diff_window is not None and self.diff_window.winfo_exists(): self.diff_window.destroy()
+
+    def draw_diff_overlay(self):
+        """新增綠、刪除紅 (虛線，畫在舊位置)、移動橘 (舊位置虛線框連到新位置)、改值藍；網路變化只列在清單"""
+        self.canvas.delete("diff_ovl")
+        if not self.diff_items: return
+        s, px, py = self.zoom_scale, self.pan_x, self.pan_y
+        r = self.DIFF_BOX * s
+        lw = max(2, int(3 * s))
+        def box(x, y, color, dash=None):
+            sx, sy = x * s + px, y * s + py
+            self.canvas.create_rectangle(sx - r, sy - r, sx + r, sy + r, outline=color, width=2, dash=dash, tags="diff_ovl")
+        for item in self.diff_items:
+            color = self.DIFF_COLORS.get(item.kind)
+            if item.what == "comp":
+                if item.kind == "moved":
+                    box(item.old["x"], item.old["y"], color, (4, 2))
+                    self.canvas.create_line(item.old["x"] * s + px, item.old["y"] * s + py, item.new["x"] * s + px,
+                                            item.new["y"] * s + py, fill=color, dash=(4, 2), arrow=tk.LAST, tags="diff_ovl")
+                box(*item.point, color, (4, 2) if item.kind == "removed" else None)
+            elif item.what == "wire":
+                (x1, y1), (x2, y2) = item.new or item.old
+                self.canvas.create_line(x1 * s + px, y1 * s + py, x2 * s + px, y2 * s + py, fill=color, width=lw,
+                                        dash=(6, 3) if item.kind == "removed" else None, tags="diff_ovl")
+        self.canvas.tag_raise("diff_ovl")
+
+    def show_diff_list(self, title):
+        if self.diff_window is not None and self.diff_window.winfo_exists(): self.diff_window.destroy()
+        win = tk.Toplevel(self)
+        win.title(f"Differences from {title}")
+        win.geometry("640x360")
+        self.diff_window = win
+        tree = ttk.Treeview(win, columns=("kind", "message"), show="headings")
+        tree.heading("kind", text="Change"); tree.column("kind", width=90, stretch=False)
+        tree.heading("message", text="Details"); tree.column("message", width=520)
+        tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        for kind, color in self.DIFF_COLORS.items(): tree.tag_configure(kind, foreground=color)
+        rows = {}
+        for item in self.diff_items:
+            rows[tree.insert("", tk.END, values=(f"{item.what} {item.kind}", item.message), tags=(item.kind,))] = item
+        def go(event=None):
+            sel = tree.selection()
+            item = rows.get(sel[0]) if sel else None
+            if item is None or item.point is None: return
+            self.deselect_all()
+            self.center_view(*item.point)
+            if item.what == "comp" and item.kind != "removed":
+                name = item.new["name"]
+                for hit_name, kind, point, uid in self.name_index.prefix(name):
+                    entry = self.registry.get(uid)
+                    if hit_name == name and kind != "net" and entry is not None: self.select_item(*entry)
+            self.status_label.config(text=item.message)
+        tree.bind("<Double-Button-1>", go)
+        tree.bind("<Return>", go)
+        win.protocol("WM_DELETE_WINDOW", self.clear_diff_overlay)
+        win.transient(self)
+
+    def toggle_minimap(self):
+        if self.minimap.winfo_ismapped(): self.minimap.pack_forget()
+        else: self.minimap.pack(side=tk.RIGHT, anchor="n", padx=2, pady=2, before=self.canvas)
+
+    # --- 隱藏分頁釋放 canvas item，切回時先畫視窗內，其餘分批補畫 ---
+    RENDER_CHUNK = 500
+
+    def release_canvas(self):
+        """只保留模型: 刪除所有 canvas item 與可重建的索引"""
+        if not self.materialized: return
+        self.cancel_render()
+        self.set_hover(None)
+        self.canvas.delete("all")
+        self.item_lookup = {}
+        self.lookup_ids = {}
+        for wire in self.wires: wire.items = ()
+        self.net_index = NetIndex()
+        self.materialized = False
+
+    def materialize(self):
+        if self.materialized: return
+        self.materialized = True
+        self.draw_grid()
+        self.queue_render([(c, "comp") for c in self.components] + [(w, "wire") for w in self.wires])
+        self.draw_op_annotations()
+        self.draw_net_highlight()
+        self.draw_diff_overlay()
+
+    def queue_render(self, items):
+        """[(物件, 類型)]: 視窗內的立即畫，其餘排入分批補畫"""
+        if not self.materialized: return
+        w, h = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if w < 10: w, h = 2000, 2000
+        m = 100 # 邏輯座標邊界，含元件大小
+        x1, y1 = self.to_logical(0, True) - m, self.to_logical(0, False) - m
+        x2, y2 = self.to_logical(w, True) + m, self.to_logical(h, False) + m
+        def visible(item, i_type):
+            if i_type == "comp": return x1 <= item.x <= x2 and y1 <= item.y <= y2
+            (ax, ay), (bx, by) = item.start_p, item.end_p
+            return min(ax, bx) <= x2 and max(ax, bx) >= x1 and min(ay, by) <= y2 and max(ay, by) >= y1
+        for item, i_type in items:
+            if visible(item, i_type): self.redraw_item(item, i_type)
+            else: self.render_queue.append((item, i_type))
+        if self.render_queue and self.render_job is None: self.render_job = self.after(1, self.render_step)
+
+    def render_step(self):
+        self.render_job = None
+        batch, self.render_queue = self.render_queue[:self.RENDER_CHUNK], self.render_queue[self.RENDER_CHUNK:]
+        for item, i_type in batch:
+            if item.tags in self.registry: self.redraw_item(item, i_type) # 補畫前已刪除的略過
+        self.canvas.tag_raise("op_annot")
+        self.canvas.tag_raise("net_hl")
+        self.canvas.tag_raise("diff_ovl")
+        if self.render_queue: self.render_job = self.after(1, self.render_step)
+
+    def cancel_render(self):
+        if self.render_job is not None: self.after_cancel(self.render_job)
+        self.render_job = None
+        self.render_queue = []
+
+    # --- 階層 (每個分頁即一個 cell) ---
+    def cell_name(self):
+        """分頁名稱 (去除空白等符號) 作為 .SUBCKT 名稱"""
+        try: text = self.master.tab(self, "text")
+        except (AttributeError, tk.TclError): text = "TOP"
+        return re.sub(r"\W+", "_", text).strip("_") or "TOP"
+
+    def sibling_editors(self):
+        try: tab_ids = self.master.tabs()
+        except (AttributeError, tk.TclError): return []
+        editors = []
+        for tab_id in tab_ids:
+            widget = self.nametowidget(tab_id)
+            if isinstance(widget, SchematicEditor): editors.append(widget)
+        return editors
+
+    def find_cell(self, name):
+        for editor in self.sibling_editors():
+            if editor.cell_name() == name: return editor
+        return None
+
+    def place_instance(self, cell_name):
+        self.set_mode("SELECT")
+        cell = self.find_cell(cell_name)
+        ports = cell.cell_ports() if cell else []
+        x = self.to_logical(self.canvas.winfo_width()/2, True)
+        y = self.to_logical(self.canvas.winfo_height()/2, False)
+        self.add_component(SubcktInstance(self.canvas, x, y, cell_name, ports))
+        self.normalize_wires()
+        self.canvas.focus_set()
+
+    def place_instance_dialog(self):
+        cells = [e.cell_name() for e in self.sibling_editors() if e is not self and e.cell_ports()]
+        if not cells:
+            messagebox.showinfo("Subcircuit", "Open another tab with PIN ports to use it as a cell.")
+            return
+        win = tk.Toplevel(self)
+        win.title("Place Subcircuit Instance")
+        tk.Label(win, text="Cell:").grid(row=0, column=0, padx=10, pady=10, sticky="e")
+        cell_var = tk.StringVar(value=cells[0])
+        ttk.Combobox(win, textvariable=cell_var, values=cells, state="readonly").grid(row=0, column=1, padx=10, pady=10)
+        def on_ok(event=None):
+            win.destroy()
+            self.place_instance(cell_var.get())
+        tk.Button(win, text="Place", command=on_ok, bg="lightblue", width=10).grid(row=1, column=0, columnspan=2, pady=10)
+        win.bind('<Return>', on_ok)
+        win.transient(self)
+        win.grab_set()
+        self.wait_window(win)
+
+    def refresh_instances(self):
+        """依目前 cell 的 Pin 更新所有實例的埠"""
+        for comp in self.components:
+            if not isinstance(comp, SubcktInstance): continue
+            cell = self.find_cell(comp.cell)
+            if cell is not None and cell.cell_ports() != comp.ports:
+                comp.set_ports(cell.cell_ports())
+                self.redraw_item(comp, "comp")
+                self.touch([comp])
+        self.normalize_wires()
+
+    def rename_cell(self, old, new):
+        for comp in self.components:
+            if isinstance(comp, SubcktInstance) and comp.cell == old:
+                comp.cell = comp.value = new
+                self.redraw_item(comp, "comp")
+                self.touch([comp])
+
+    # --- 背景 ERC ---
+    def touch(self, comps=(), wires=False):
+        """記錄模型變動；短暫閒置後才送出一次 ERC，連續編輯不會每步都檢查"""
+        for comp in comps:
+            comp.revision += 1
+            if comp.tags not in self.registry: # 已刪除
+                self.net_index.remove_component(comp.tags)
+                self.overview.remove(comp.tags)
+                self.name_index.remove(comp.tags)
+                self.bbox_index.remove(comp.tags)
+                old = self.spatial.boxes.get(comp.tags)
+                if old is not None: self.norm_dirty.append(old)
+                self.spatial.remove(comp.tags)
+                continue
+            hw, hh = comp.hitbox_size[0] / 2, comp.hitbox_size[1] / 2
+            if comp.rotation % 180 == 90: hw, hh = hh, hw
+            box = (comp.x - hw, comp.y - hh, comp.x + hw, comp.y + hh)
+            self.overview.set(comp.tags, "comp", *box)
+            self.bbox_index.set(comp.tags, box)
+            # 正規化範圍要含腳位 (腳位可能在 hitbox 外)，移動時舊位置也要重新檢查
+            pts = [(tx, ty) for term, tx, ty in comp.get_abs_terminals()]
+            xs, ys = [box[0], box[2]] + [p[0] for p in pts], [box[1], box[3]] + [p[1] for p in pts]
+            old = self.spatial.boxes.get(comp.tags)
+            if old is not None: self.norm_dirty.append(old)
+            self.spatial.set(comp.tags, (min(xs), min(ys), max(xs), max(ys)))
+            self.norm_dirty.append(self.spatial.boxes[comp.tags])
+            names = [(comp.name, "pin" if isinstance(comp, Pin) else "inst", (comp.x, comp.y))]
+            names += [(term.custom_net_name, "net", (tx, ty)) for term, tx, ty in comp.get_abs_terminals()]
+            self.name_index.set(comp.tags, names)
+            self.net_index.set_component(comp.tags, self.terminal_entries(comp)) # 只更新受影響的網路
+        if comps or wires: self.minimap.schedule_flush()
+        if self.op_result is not None and (comps or wires): self.clear_op_annotations() # 節點編號已變，舊標示會對錯網路
+        if self.hl_net is not None: self.clear_net_highlight()
+        self.netlist_changed(comps)
+        self.erc_dirty.update(comps) # 電線在 index_wire/unindex_wire 記錄
+        if self.erc_scheduled or not (self.erc_dirty or self.erc_wires): return
+        self.erc_scheduled = True
+        self.after(300, self.run_erc)
+
+    def run_erc(self):
+        """在 UI thread 建立變動元件與電線的快照 (只含差異)，送到背景 thread 檢查"""
+        self.erc_scheduled = False
+        if self.erc is None: self.erc = ErcWorker()
+        changed = {c.tags: CompInfo(c) if c.tags in self.registry else None for c in self.erc_dirty}
+        wires = {w.tags: (w.start_p, w.end_p) if w.tags in self.registry else None for w in self.erc_wires}
+        self.erc_dirty, self.erc_wires = set(), set()
+        self.erc.submit(changed, wires)
+        self.erc_pending += 1
+        if self.erc_pending == 1: self.after(100, self.poll_erc)
+
+    def poll_erc(self):
+        if self.erc is None or not self.erc_pending: return
+        for merged, upserts, removed in self.erc.poll():
+            self.erc_pending -= merged
+            for key in removed: self.findings.pop(key, None)
+            for f in upserts: self.findings[f.key] = f
+            self.refresh_problems()
+        if self.erc_pending: self.after(100, self.poll_erc)
+
+    def reset_erc(self):
+        """載入新檔時丟掉舊的 ERC 狀態"""
+        if self.erc is not None: self.erc.stop()
+        self.erc = None
+        self.erc_dirty, self.erc_wires, self.erc_pending = set(), set(), 0
+        self.findings = {}
+        self.refresh_problems()
+
+    def refresh_problems(self):
+        tree = self.problems_tree
+        tree.delete(*tree.get_children())
+        self.problems_rows = {}
+        errors = 0
+        for f in sorted(self.findings.values(), key=lambda f: (f.severity != "error", f.message)):
+            iid = tree.insert("", tk.END, values=(f.severity, f.message), tags=(f.severity,))
+            self.problems_rows[iid] = f.key
+            errors += f.severity == "error"
+        self.problems_btn.config(text=f"Problems ({len(self.findings)})", fg="red" if errors else "black")
+
+    def toggle_problems(self):
+        if self.problems_panel.winfo_ismapped(): self.problems_panel.pack_forget()
+        else: self.problems_panel.pack(side=tk.BOTTOM, fill=tk.X, before=self.canvas)
+
+    def on_problem_select(self, event=None):
+        sel = self.problems_tree.selection()
+        f = self.findings.get(self.problems_rows.get(sel[0])) if sel else None
+        if f is None: return
+        # 把問題位置移到畫面中央並選取相關元件
+        self.deselect_all()
+        self.center_view(*f.point)
+        for uid in f.uids:
+            entry = self.registry.get(uid)
+            if entry is not None: self.select_item(entry[0], entry[1], add=True)
+        self.status_label.config(text=f.message)
+
+    def destroy(self):
+        if self.erc is not None: self.erc.stop()
+        self.cancel_export()
+        self.cancel_render()
+        super().destroy()
 
     # --- File Operations ---
     def get_schematic_data(self):
-        data = {"global_settings": self.global_settings, "sim_settings": self.sim_settings, "components": [], "wires": []}
-        for comp in self.components:
-            item = {
-                "type": type(comp).__name__, "x": comp.x, "y": comp.y, 
-                "rotation": comp.rotation, "mirror": comp.mirror, 
-                "name": comp.name, "value": comp.value, 
-                "terminals": [t.custom_net_name for t in comp.terminals]
-            }
-            if isinstance(comp, CMOS): item.update({"model": comp.model, "w": comp.w, "l": comp.l, "p_type": comp.p_type})
-            elif isinstance(comp, (VoltageSource, CurrentSource)): item.update({"source_type": comp.source_type, "params": comp.params})
-            data["components"].append(item)
+        """可序列化的完整內容；巢狀的 dict/list 都是複本，可交給背景 thread 使用"""
+        data = {"global_settings": dict(self.global_settings),
+                "sim_settings": {k: dict(v) for k, v in self.sim_settings.items()},
+                "sweep_settings": dict(self.sweep_settings), "params": self.params.as_dict(),
+                "components": [], "wires": []}
+        data["components"] = [component_to_dict(comp) for comp in self.components]
         for wire in self.wires: data["wires"].append({"start": wire.start_p, "end": wire.end_p})
         return data
 
     def load_schematic_data(self, data):
+        self.cancel_render()
         self.canvas.delete("all")
         self.components = []
         self.wires = []
-        if "global_settings" in data: self.global_settings = data["global_settings"]
+        self.wire_ends = {}
+        self.registry = {}
+        self.item_lookup = {}
+        self.lookup_ids = {}
+        self.selection = {}
+        self.hover = None
+        self.reset_erc()
+        self.clear_diff_overlay()
+        self.overview.reset()
+        self.name_index = NameIndex()
+        self.bbox_index = BoundsIndex()
+        self.spatial = SpatialIndex()
+        self.norm_dirty = []
+        self.net_index = NetIndex() # 下一次查詢時整批建立，不必逐一增量加入
+        if "global_settings" in data: self.global_settings.update(data["global_settings"])
         if "sim_settings" in data: self.sim_settings = data["sim_settings"]
+        if "sweep_settings" in data: self.sweep_settings.update(data["sweep_settings"])
+        self.params = ParamTable()
+        try: self.params.update(data.get("params", {}))
+        except ValueError as e: messagebox.showwarning("Parameters", str(e))
         
-        class_map = {
-            "Resistor": Resistor, "Inductor": Inductor, "Capacitor": Capacitor,
-            "CMOS": CMOS, "Pin": Pin, 
-            "VoltageSource": VoltageSource, "CurrentSource": CurrentSource
-        }
+        missing = []
         for item in data["components"]:
-            c_type = item["type"]
-            if c_type not in class_map: continue
-            cls = class_map[c_type]
-            if c_type == "CMOS":
-                comp = cls(self.canvas, item["x"], item["y"], item.get("p_type", False))
-                comp.model = item.get("model", "nch")
-                comp.w = item.get("w", "1u")
-                comp.l = item.get("l", "0.18u")
-            else:
-                comp = cls(self.canvas, item["x"], item["y"])
-            
-            comp.name = item["name"]
-            comp.value = item["value"]
-            comp.rotation = item.get("rotation", 0)
-            comp.mirror = item.get("mirror", False)
-            term_names = item.get("terminals", [])
-            for i, t_name in enumerate(term_names):
-                if i < len(comp.terminals): comp.terminals[i].custom_net_name = t_name
-            if isinstance(comp, (VoltageSource, CurrentSource)):
-                comp.source_type = item.get("source_type", "DC")
-                comp.params = item.get("params", {})
-                comp.update_display_value()
-            
-            self.components.append(comp)
-            comp.update_visuals(self.zoom_scale, self.pan_x, self.pan_y)
+            comp = component_from_dict(self.canvas, item)
+            if isinstance(comp, PlaceholderComponent): missing.append(f"{comp.name}: {comp.reason}")
+            self.add_component(comp)
 
         for w_data in data["wires"]:
             start = tuple(w_data["start"])
             end = tuple(w_data["end"])
-            wire = Wire(self.canvas, start, end, self.zoom_scale, self.pan_x, self.pan_y)
-            self.wires.append(wire)
-        self.draw_grid()
+            wire = Wire(self.canvas, start, end, self.zoom_scale, self.pan_x, self.pan_y, self.materialized)
+            self.add_wire(wire)
+        self.normalize_wires()
+        if self.materialized: self.draw_grid()
+        if missing: # 以佔位元件保留，存檔時原樣寫回
+            messagebox.showwarning("Open", f"{len(missing)} component(s) could not be loaded and are kept as placeholders:\n"
+                                   + "\n".join(missing[:20]))
 
     def save_schematic_dialog(self):
         filename = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON Files", "*.json")])
@@ -773,27 +1980,126 @@ class SchematicEditor(tk.Frame):
             messagebox.showinfo("Success", "Saved!")
 
     def load_schematic_dialog(self):
-        filename = filedialog.askopenfilename(filetypes=[("JSON Files", "*.json")])
-        if filename:
-            with open(filename, "r") as f: self.load_schematic_data(json.load(f))
+        """可多選: 第一個檔案載入目前分頁，其餘各開新分頁"""
+        filenames = filedialog.askopenfilenames(filetypes=[("JSON Files", "*.json")])
+        if not filenames: return
+        if self.on_open_callback: self.on_open_callback(list(filenames), self)
+        else:
+            with open(filenames[0], "r") as f: self.load_schematic_data(json.load(f))
 
     def save_netlist_dialog(self):
         filename = filedialog.asksaveasfilename(defaultextension=".sp", filetypes=[("SPICE", "*.sp")])
-        if filename:
-            with open(filename, "w") as f: f.write(self.generate_netlist_text())
-            messagebox.showinfo("Success", "Saved!")
+        if filename: self.start_export(netlist_path=filename)
 
     def save_both_dialog(self):
         base = filedialog.asksaveasfilename(title="Save Both")
         if base:
             if base.endswith(".json"): base = base[:-5]
-            with open(base+".json", "w") as f: json.dump(self.get_schematic_data(), f, indent=4)
-            with open(base+".sp", "w") as f: f.write(self.generate_netlist_text())
-            messagebox.showinfo("Success", "Saved Both!")
+            self.start_export(netlist_path=base+".sp", json_path=base+".json")
+
+    def export_image_dialog(self):
+        path = filedialog.asksaveasfilename(defaultextension=".svg",
+                                            filetypes=[("SVG", "*.svg"), ("PDF", "*.pdf"), ("PNG", "*.png")])
+        if not path: return
+        data = self.get_schematic_data()
+        result = {}
+        def work():
+            try: export_data(data, path)
+            except Exception as e: result["error"] = f"{type(e).__name__}: {e}"
+            finally: result["done"] = True # 任何例外都要讓 poll 停下
+        threading.Thread(target=work, daemon=True).start()
+        self.status_label.config(text=f"Exporting {os.path.basename(path)}...")
+        def poll():
+            if not result.get("done"):
+                self.after(100, poll)
+            elif "error" in result:
+                messagebox.showerror("Export", result["error"])
+            else:
+                self.status_label.config(text=f"Exported: {path}")
+        self.after(100, poll)
+
+    # --- 背景匯出 ---
+    def export_snapshot(self):
+        """(cell 名稱, 資料, {引用到的 cell: 資料})；在 UI thread 複製，之後只在背景使用"""
+        cells, stack = {}, [self]
+        while stack:
+            editor = stack.pop()
+            for comp in editor.components:
+                if not isinstance(comp, SubcktInstance) or comp.cell in cells: continue
+                cell = self.find_cell(comp.cell)
+                if cell is None or cell is self: continue
+                cells[comp.cell] = cell.get_schematic_data()
+                stack.append(cell)
+        return self.cell_name(), self.get_schematic_data(), cells
+
+    def start_export(self, netlist_path=None, json_path=None):
+        """在背景產生 netlist 並寫檔；畫布可繼續編輯，進度顯示在狀態列"""
+        job = self.export_job
+        if job is not None and job.active:
+            self.status_label.config(text="An export is already running")
+            return None
+        job = ExportJob(self.export_snapshot(), netlist_path, json_path)
+        self.export_job = job
+        self.cancel_btn.pack(side=tk.RIGHT)
+        self.after(100, self.poll_export)
+        return job
+
+    def cancel_export(self):
+        if self.export_job is not None: self.export_job.cancel()
+
+    def poll_export(self):
+        job = self.export_job
+        if job is None: return
+        if job.active:
+            self.status_label.config(text=f"Exporting netlist... {job.progress:.0%}")
+            self.after(100, self.poll_export)
+            return
+        self.export_job = None
+        self.cancel_btn.pack_forget()
+        if job.status == "failed":
+            messagebox.showerror("Export", job.error)
+        elif job.status == "cancelled":
+            self.status_label.config(text="Export cancelled")
+        else:
+            self.status_label.config(text="Saved: " + ", ".join(p for p in (job.json_path, job.netlist_path) if p))
 
     def export_netlist_window(self):
-        content = self.generate_netlist_text()
-        win = tk.Toplevel(self); t = tk.Text(win); t.pack(); t.insert(tk.END, content)
+        """即時 netlist 視窗: 每次編輯後閒置時只更新變動元件所在的行 (LiveNetlist)"""
+        if self.netlist_window is not None:
+            self.netlist_window[0].lift()
+            return
+        win = tk.Toplevel(self)
+        win.title(f"Netlist - {self.cell_name()}")
+        t = tk.Text(win)
+        t.pack(fill=tk.BOTH, expand=True)
+        self.netlist_window = (win, t, LiveNetlist(self))
+        self.netlist_dirty = set()
+        self.netlist_shown = -1
+        def on_close():
+            self.netlist_window = None
+            win.destroy()
+        win.protocol("WM_DELETE_WINDOW", on_close)
+        self.refresh_netlist_window()
+
+    def netlist_changed(self, comps=()):
+        self.revision += 1
+        if self.netlist_window is None: return
+        self.netlist_dirty.update(comps)
+        self.after_idle(self.refresh_netlist_window)
+
+    def refresh_netlist_window(self):
+        """
+        只替換變動的行範圍: 變動元件 (touch) 與網路名稱改變的元件才重算，
+        其餘的行與捲動位置都不動；連線 (NetIndex) 本身也是增量維護
+        """
+        if self.netlist_window is None or self.netlist_shown == self.revision: return
+        win, t, live = self.netlist_window
+        changed = {c.tags: c if c.tags in self.registry else None for c in self.netlist_dirty}
+        self.netlist_dirty = set()
+        for line, count, text in live.update(changed):
+            t.delete(f"{line + 1}.0", f"{line + 1 + count}.0")
+            t.insert(f"{line + 1}.0", text)
+        self.netlist_shown = self.revision
 
     def show_help(self):
         help_text = (
@@ -804,14 +2110,26 @@ class SchematicEditor(tk.Frame):
             "Double Click: Edit Component Properties \n \n"
             "Keyboard Shortcuts 】 \n"
             "W: Toggle Wire Mode \n"
-            "R: Rotate Selection \n"
+            "A: Toggle Route Mode (click terminals, Enter to route) \n"
+            "O: Rotate Selection \n"
             "M: Mirror Selection \n"
-            "Delete: Toggle Delete Mode \n"
+            "F: Zoom to Fit (or to Selection) \n"
+            "Ctrl+C / Ctrl+X / Ctrl+V: Copy / Cut / Paste at cursor (works across tabs) \n"
+            "Ctrl+F: Find by Name \n"
+            "Delete: Delete Selection / Toggle Delete Mode \n"
             "Ctrl+T: New Tab\n"
             "Ctrl+W: Close Tab\n\n"
             "【 Features 】\n"
             "Box Delete: Switch to 'Box' in Del Mode to area delete.\n"
+            "Subcircuits: Each tab is a cell whose PINs are its ports; press X to place one.\n"
+            "Arrays/Buses: Name an instance M1<0:63> and nets D<0:63>; expanded at netlist time.\n"
+            "Multi-Select: Drag on empty space to box select, Shift+Click to add/remove.\n"
             "Branching: Click on existing wires to create branches.\n"
-            "Global Config: Set .LIB, .TEMP and default models."
+            "Global Config: Set .LIB, .TEMP, default models and the simulator command.\n"
+            "Run: Launch the simulator in the background; sweeps run as parallel jobs.\n"
+            "Probe (G): Click a wire or terminal to plot its node voltage.\n"
+            "Highlight Net (H): Click a wire or terminal to highlight its whole net.\n"
+            "DC Operating Point: Built-in solver for R/L/C/V/I/MOS; voltages shown next to terminals.\n"
+            "Problems: Rule checks run in the background while editing; click a row to jump to it."
         )
         messagebox.showinfo("Circuit CAD Help", help_text)
\ No newline at end of file
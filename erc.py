@@ -0,0 +1,234 @@
+import queue
+import threading
+from net_index import Connectivity
+
+# 元件快照在 UI thread 建立，之後只在 ERC worker 內使用 (不碰 Tk 物件)
+class CompInfo:
+    __slots__ = ("uid", "kind", "name", "bbox", "terms", "pin_name")
+
+    def __init__(self, comp):
+        self.uid = comp.tags
+        self.kind = type(comp).__name__
+        if self.kind == "CMOS": self.kind = "PMOS" if comp.p_type else "NMOS"
+        self.name = comp.name
+        hw, hh = comp.hitbox_size[0] / 2, comp.hitbox_size[1] / 2
+        if comp.rotation % 180 == 90: hw, hh = hh, hw
+        self.bbox = (comp.x - hw, comp.y - hh, comp.x + hw, comp.y + hh)
+        self.terms = [(term.name, (tx, ty), term.custom_net_name) for term, tx, ty in comp.get_abs_terminals()]
+        self.pin_name = comp.name if self.kind == "Pin" else ""
+
+class Finding:
+    """一筆 ERC 結果；key 唯一識別 (供增量新增/移除)"""
+    __slots__ = ("key", "severity", "message", "uids", "point")
+
+    def __init__(self, key, severity, message, uids, point):
+        self.key = key
+        self.severity = severity   # "error" / "warning"
+        self.message = message
+        self.uids = uids           # 相關元件 (點選時選取)
+        self.point = point         # 邏輯座標，點選時置中
+
+OVERLAP_RATIO = 0.3   # 重疊面積超過較小元件的此比例才回報
+
+class ErcEngine:
+    """
+    增量 ERC。元件以網格分桶 (空間索引)，重疊檢查只比對變動元件的鄰近桶；
+    名稱重複只重查變動元件的新舊名稱；連線以 Connectivity 增量維護，網路相關檢查只重查成員有變動的網路
+    """
+
+    def __init__(self, cell=100):
+        self.cell = cell
+        self.comps = {}       # {uid: CompInfo}
+        self.buckets = {}     # {(gx, gy): {uid}}
+        self.names = {}       # {小寫名稱: {uid}}
+        self.conn = Connectivity() # 腳位 id = (uid, 腳位名稱)，電線 id 由呼叫端決定
+        self.next_order = 0
+        self.scopes = {}      # {網路 id: frozenset((uid, 腳位名稱))}，以成員集合識別網路 (自動編號會變動)
+        self.findings = {}    # {key: Finding}
+        self.refs = {}        # {key: 產生此結果的檢查範圍數}
+        self.by_scope = {}    # {("comp", uid) / ("name", n) / ("net", n): {key}} 每個檢查範圍產生的結果
+
+    # --- 空間索引 ---
+    def _cells(self, bbox):
+        x1, y1, x2, y2 = bbox
+        for gx in range(int(x1 // self.cell), int(x2 // self.cell) + 1):
+            for gy in range(int(y1 // self.cell), int(y2 // self.cell) + 1):
+                yield gx, gy
+
+    def _index(self, info):
+        for c in self._cells(info.bbox): self.buckets.setdefault(c, set()).add(info.uid)
+        self.names.setdefault(info.name.lower(), set()).add(info.uid)
+
+    def _unindex(self, info):
+        for c in self._cells(info.bbox):
+            bucket = self.buckets.get(c)
+            if bucket is not None:
+                bucket.discard(info.uid)
+                if not bucket: del self.buckets[c]
+        users = self.names.get(info.name.lower())
+        if users is not None:
+            users.discard(info.uid)
+            if not users: del self.names[info.name.lower()]
+
+    def neighbors(self, bbox):
+        out = set()
+        for c in self._cells(bbox): out |= self.buckets.get(c, set())
+        return out
+
+    # --- 結果管理 ---
+    def _set_scope(self, scope, findings, touched):
+        """以新結果取代某檢查範圍的舊結果 (同一 key 可能同時來自新舊兩個網路名稱，以參考計數處理)"""
+        for key in self.by_scope.pop(scope, ()):
+            touched.add(key)
+            self.refs[key] -= 1
+            if not self.refs[key]:
+                del self.refs[key], self.findings[key]
+        for f in findings:
+            touched.add(f.key)
+            self.refs[f.key] = self.refs.get(f.key, 0) + 1
+            self.findings[f.key] = f
+        if findings: self.by_scope[scope] = {f.key for f in findings}
+
+    def update(self, changed, wires=None):
+        """
+        changed: {uid: CompInfo 或 None (已刪除)}；wires: 變動的電線 {電線 id: (p1, p2) 或 None (已刪除)}。
+        回傳 (新增或內容更新的 Finding, 移除的 key)
+        """
+        touched = set()
+        def set_scope(scope, findings): self._set_scope(scope, findings, touched)
+        dirty_names = set()
+        recheck = set() # 舊位置的鄰居也要重查: 重疊結果記在 uid 較小的一方，移走的元件可能是另一方
+        for uid, info in changed.items():
+            old = self.comps.pop(uid, None)
+            if old is not None:
+                recheck |= self.neighbors(old.bbox)
+                self._unindex(old)
+                dirty_names.add(old.name.lower())
+                for term_name, pt, custom in old.terms: self.conn.remove_terminal((uid, term_name))
+            if info is not None:
+                self.comps[uid] = info
+                self._index(info)
+                dirty_names.add(info.name.lower())
+                for term_name, pt, custom in info.terms:
+                    self.conn.add_terminal((uid, term_name), pt, self.next_order, info.pin_name, custom)
+                    self.next_order += 1
+        for wid, seg in (wires or {}).items():
+            self.conn.remove_wire(wid)
+            if seg is not None: self.conn.add_wire(wid, *seg)
+
+        # 1. 重疊: 變動元件與其新舊位置的鄰近元件 (刪除的元件只需清掉結果)
+        for uid, info in changed.items():
+            recheck.add(uid)
+            if info is not None: recheck |= self.neighbors(info.bbox)
+        for uid in recheck:
+            set_scope(("comp", uid), self.check_overlaps(uid))
+
+        # 2. 名稱重複
+        for name in dirty_names:
+            set_scope(("name", name), self.check_duplicate(name))
+
+        # 3. 網路: 只看這次合併/分割/增減腳位的網路，成員集合有變動才重查 (N_k 編號變動不算)
+        old_nets, new_nets = set(), set()
+        for nid in self.conn.take_changes():
+            old = self.scopes.pop(nid, None)
+            if old is not None: old_nets.add(old)
+            terms = self.conn.terms.get(nid)
+            if terms:
+                self.scopes[nid] = frozenset(terms)
+                new_nets.add(self.scopes[nid])
+        for members in old_nets - new_nets:
+            set_scope(("net", members), [])
+        for members in new_nets:
+            if members not in old_nets or any(uid in changed for uid, _ in members):
+                set_scope(("net", members), self.check_net(members))
+        upserts = [self.findings[k] for k in touched if k in self.findings]
+        return upserts, [k for k in touched if k not in self.findings]
+
+    # --- 檢查 ---
+    def check_overlaps(self, uid):
+        info = self.comps.get(uid)
+        if info is None: return []
+        out = []
+        ax1, ay1, ax2, ay2 = info.bbox
+        for other in self.neighbors(info.bbox):
+            if other <= uid: continue # 每對只由 uid 較小者回報
+            o = self.comps[other]
+            bx1, by1, bx2, by2 = o.bbox
+            w, h = min(ax2, bx2) - max(ax1, bx1), min(ay2, by2) - max(ay1, by1)
+            if w <= 0 or h <= 0: continue
+            smaller = min((ax2 - ax1) * (ay2 - ay1), (bx2 - bx1) * (by2 - by1))
+            if w * h < OVERLAP_RATIO * smaller: continue
+            out.append(Finding(("overlap", uid, other), "warning", f"{info.name} overlaps {o.name}",
+                               (uid, other), ((ax1 + ax2) / 2, (ay1 + ay2) / 2)))
+        return out
+
+    def check_duplicate(self, name):
+        uids = sorted(u for u in self.names.get(name, ()) if self.comps[u].kind != "Pin")
+        if len(uids) < 2: return []
+        first = self.comps[uids[0]]
+        x1, y1, x2, y2 = first.bbox
+        return [Finding(("duplicate", name), "error", f"Duplicate instance name {first.name} ({len(uids)}x)",
+                        tuple(uids), ((x1 + x2) / 2, (y1 + y2) / 2))]
+
+    def check_net(self, members):
+        out = []
+        if len(members) == 1:
+            (uid, term), = members
+            info = self.comps[uid]
+            pt = dict((t[0], t[1]) for t in info.terms)[term]
+            if info.kind == "Pin":
+                out.append(Finding(("nc", uid, term), "warning", f"Pin {info.name} is not connected", (uid,), pt))
+            elif info.kind in ("NMOS", "PMOS") and term == "G":
+                out.append(Finding(("floating_gate", uid), "error", f"Floating gate on {info.name}", (uid,), pt))
+            else:
+                out.append(Finding(("nc", uid, term), "warning", f"Unconnected terminal {info.name}.{term}", (uid,), pt))
+        by_uid = {}
+        for uid, term in members: by_uid.setdefault(uid, set()).add(term)
+        for uid, terms in by_uid.items():
+            info = self.comps[uid]
+            if info.kind == "VoltageSource" and len(terms) == 2:
+                x1, y1, x2, y2 = info.bbox
+                out.append(Finding(("vshort", uid), "error", f"Voltage source {info.name} is shorted",
+                                   (uid,), ((x1 + x2) / 2, (y1 + y2) / 2)))
+        return out
+
+class ErcWorker:
+    """
+    背景 thread 執行 ErcEngine.update；UI 以 submit() 送出變動，
+    以 poll() 取回 (合併的請求數, 新增/更新, 移除) 結果。多筆待處理的變動會合併成一次更新
+    """
+
+    def __init__(self):
+        self.engine = ErcEngine()
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, changed, wires=None):
+        """wires: 變動的電線 {電線 id: (p1, p2) 或 None}，只傳差異"""
+        self.requests.put((changed, wires or {}))
+
+    def _loop(self):
+        while True:
+            req = self.requests.get()
+            if req is None: return
+            changed, wires = dict(req[0]), dict(req[1])
+            merged = 1
+            while True: # 合併排隊中的變動
+                try: nxt = self.requests.get_nowait()
+                except queue.Empty: break
+                if nxt is None: return
+                changed.update(nxt[0])
+                wires.update(nxt[1])
+                merged += 1
+            self.results.put((merged, *self.engine.update(changed, wires)))
+
+    def poll(self):
+        out = []
+        while True:
+            try: out.append(self.results.get_nowait())
+            except queue.Empty: return out
+
+    def stop(self):
+        self.requests.put(None)
@@ -1,10 +1,22 @@
+import os
+import sys
 import tkinter as tk
-from tkinter import ttk, simpledialog
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import ttk, simpledialog, filedialog, messagebox
 from editor import SchematicEditor
+from waveform import WaveformViewer
+from session import read_json, save_session, load_session
+
+MAX_LIVE_TABS = 3 # 同時保留 canvas item 的原理圖分頁數，其餘隱藏分頁只留模型
 
 class CircuitApp:
-    def __init__(self, root):
+    def __init__(self, root, files=(), max_live_tabs=MAX_LIVE_TABS):
         self.root = root
+        self.max_live_tabs = max_live_tabs
+        self.live_tabs = [] # 已繪製的編輯器，依最近顯示排序 (LRU，最後為目前分頁)
+        self.loader = ThreadPoolExecutor(max_workers=4) # 原理圖檔背景解析
+        self.loading = []   # [(future, 檔案路徑, 編輯器, 視圖)] 解析完成後在 UI thread 載入
+        self.load_polling = False
         self.root.title("Python Circuit CAD v6.0 (Tabs & Renaming)")
         self.root.geometry("1200x800")
 
@@ -15,9 +27,13 @@ class CircuitApp:
         file_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Application", menu=file_menu)
         file_menu.add_command(label="New Tab", command=self.add_tab)
+        file_menu.add_command(label="Open Schematics...", command=self.open_files_dialog)
         file_menu.add_command(label="Close Tab", command=self.close_current_tab)
+        file_menu.add_command(label="Open Waveform...", command=self.open_waveform_dialog)
+        file_menu.add_command(label="Live Tabs Limit...", command=self.live_tabs_dialog)
         file_menu.add_separator()
-        file_menu.add_command(label="Exit", command=root.quit)
+        file_menu.add_command(label="Exit", command=self.quit)
+        root.protocol("WM_DELETE_WINDOW", self.quit)
 
         # 2. Notebook (Tabs)
         self.notebook = ttk.Notebook(root)
@@ -28,9 +44,11 @@ class CircuitApp:
         self.notebook.bind("<Button-3>", self.on_tab_right_click)
         # 雙擊左鍵也可以改名
         self.notebook.bind("<Double-Button-1>", self.on_tab_double_click)
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
 
-        # 初始分頁
-        self.add_tab()
+        # 初始分頁: 命令列檔案，否則還原上次的工作階段
+        if files: self.open_files(files)
+        elif not self.restore_session(): self.add_tab()
 
         # 綁定全域快捷鍵
         root.bind("<Control-t>", lambda e: self.add_tab())
@@ -39,23 +57,170 @@ class CircuitApp:
         # 綁定操作快捷鍵 (轉發給當前 Active Tab)
         keys = ["<r>", "<R>", "<l>", "<L>", "<c>", "<C>", 
                 "<n>", "<N>", "<p>", "<P>", "<v>", "<V>", "<i>", "<I>", 
-                "<m>", "<M>", "<Delete>", "<w>", "<W>", "<F1>"]
+                "<m>", "<M>", "<o>", "<O>", "<Delete>", "<w>", "<W>", "<a>", "<A>", "<x>", "<X>",
+                "<g>", "<G>", "<h>", "<H>", "<f>", "<F>", "<F1>",
+                "<Control-f>", "<Control-c>", "<Control-x>", "<Control-v>"]
         for key in keys:
             root.bind(key, self.dispatch_event)
 
-    def add_tab(self):
+    def add_tab(self, name=None, select=True):
         tab_count = len(self.notebook.tabs()) + 1
         # [修改] 將 self.add_tab 作為 callback 傳入 Editor
         # 這樣 Editor 內部的 File 選單就能呼叫這個函數來開新分頁
-        new_tab = SchematicEditor(self.notebook, on_new_file_callback=self.add_tab)
-        self.notebook.add(new_tab, text=f"Untitled {tab_count}")
-        self.notebook.select(new_tab)
+        new_tab = SchematicEditor(self.notebook, on_new_file_callback=self.add_tab, on_probe_callback=self.probe_net,
+                                  on_open_callback=self.open_files)
+        self.notebook.add(new_tab, text=name or f"Untitled {tab_count}")
+        if select: self.notebook.select(new_tab)
+        else: new_tab.release_canvas() # 背景分頁載入時不繪製，切換過去才畫
+        return new_tab
+
+    def add_waveform_tab(self, path, name=None):
+        viewer = WaveformViewer(self.notebook, path)
+        self.notebook.add(viewer, text=name or os.path.basename(path))
+        return viewer
+
+    def open_waveform_dialog(self):
+        path = filedialog.askopenfilename(filetypes=[("Waveforms", "*.wfm *.csv"), ("All Files", "*.*")])
+        if not path: return
+        try: self.notebook.select(self.add_waveform_tab(path))
+        except (OSError, ValueError) as e: messagebox.showerror("Waveform", str(e))
+
+    def probe_net(self, editor, net):
+        """在顯示該編輯器最近一次模擬結果的波形分頁中加入 net；必要時開新分頁"""
+        path = editor.latest_waveform_file()
+        viewers = [self.root.nametowidget(t) for t in self.notebook.tabs()]
+        viewers = [v for v in viewers if isinstance(v, WaveformViewer) and v.wave is not None]
+        if path is not None:
+            wfm = os.path.splitext(path)[0] + ".wfm"
+            matching = [v for v in viewers if os.path.abspath(v.wave.path) == os.path.abspath(wfm)]
+            if matching: viewer = matching[0]
+            else:
+                try: viewer = self.add_waveform_tab(path)
+                except (OSError, ValueError) as e:
+                    messagebox.showerror("Waveform", str(e)); return
+        elif viewers: viewer = viewers[-1]
+        else:
+            messagebox.showinfo("Probe", "No simulation results yet. Run a simulation or open a waveform first.")
+            return
+        if not viewer.plot_node(net):
+            messagebox.showwarning("Probe", f"Net '{net}' not found in {os.path.basename(viewer.wave.path)}")
+            return
+        # 保持在原理圖分頁，方便連續探測；狀態列提示
+        editor.status_label.config(text=f"Probe: {net} -> {self.notebook.tab(viewer, 'text')}")
 
     def close_current_tab(self):
         if not self.notebook.tabs(): return
         current_tab_id = self.notebook.select()
+        widget = self.root.nametowidget(current_tab_id)
+        if widget in self.live_tabs: self.live_tabs.remove(widget)
         self.notebook.forget(current_tab_id)
-        self.root.nametowidget(current_tab_id).destroy()
+        widget.destroy()
+
+    # --- 多檔開啟與工作階段: 檔案在 thread pool 解析，完成一個就載入一個分頁 ---
+    def open_files_dialog(self):
+        paths = filedialog.askopenfilenames(filetypes=[("JSON Files", "*.json")])
+        if paths: self.open_files(list(paths))
+
+    def open_files(self, paths, target=None):
+        """依順序先建立分頁 (第一個檔案可載入 target)，解析完成後再各自載入"""
+        jobs = []
+        for i, path in enumerate(paths):
+            if i == 0 and target is not None: editor = target
+            else: editor = self.add_tab(os.path.splitext(os.path.basename(path))[0], select=(i == 0))
+            jobs.append((path, editor, None))
+        self.start_loading(jobs)
+
+    def start_loading(self, jobs):
+        for path, editor, view in jobs:
+            editor.status_label.config(text=f"Loading {os.path.basename(path)}...")
+            self.loading.append((self.loader.submit(read_json, path), path, editor, view))
+        if not self.load_polling:
+            self.load_polling = True
+            self.root.after(50, self.poll_loading)
+
+    def poll_loading(self):
+        """每次只載入一個完成的檔案 (目前分頁優先)，介面在載入之間仍可操作"""
+        done = [job for job in self.loading if job[0].done()]
+        if done:
+            current = self.notebook.select()
+            job = next((j for j in done if str(j[2]) == current), done[0])
+            self.loading.remove(job)
+            self.attach_loaded(*job)
+        if self.loading: self.root.after(1 if len(done) > 1 else 50, self.poll_loading)
+        else: self.load_polling = False
+
+    def attach_loaded(self, future, path, editor, view):
+        if not editor.winfo_exists(): return # 載入前分頁已關閉
+        try: data = future.result()
+        except (OSError, ValueError) as e:
+            editor.status_label.config(text=f"Failed to open {os.path.basename(path)}")
+            messagebox.showerror("Open", f"{path}: {e}")
+            return
+        if view: editor.zoom_scale, editor.pan_x, editor.pan_y = view
+        editor.load_schematic_data(data)
+        editor.status_label.config(text=f"Loaded: {path}")
+
+    def restore_session(self):
+        """還原分頁名稱、視圖與設定；目前分頁先建立並先載入，其餘分頁不繪製"""
+        saved = load_session()
+        if saved is None or not saved[1]: return False
+        active, tabs = saved
+        jobs = []
+        for i, tab in enumerate(tabs):
+            try:
+                if tab.get("kind") == "waveform": self.add_waveform_tab(tab["path"], tab.get("name"))
+                else:
+                    editor = self.add_tab(tab.get("name"), select=(i == active))
+                    jobs.append((tab["file"], editor, tab.get("view")))
+            except (KeyError, OSError, ValueError): continue # 波形檔已不存在等
+        if not self.notebook.tabs(): return False
+        if active < len(self.notebook.tabs()): self.notebook.select(active)
+        jobs.sort(key=lambda j: str(j[1]) != self.notebook.select()) # 目前分頁先送出解析
+        self.start_loading(jobs)
+        return True
+
+    def save_session(self):
+        pending = {str(editor): path for _, path, editor, _ in self.loading}
+        tabs = []
+        for tab_id in self.notebook.tabs():
+            widget = self.root.nametowidget(tab_id)
+            name = self.notebook.tab(tab_id, "text")
+            if isinstance(widget, SchematicEditor):
+                tab = {"kind": "schematic", "name": name, "view": [widget.zoom_scale, widget.pan_x, widget.pan_y]}
+                if tab_id in pending: tab["file"] = pending[tab_id] # 尚未載入，沿用原檔
+                else: tab["data"] = widget.get_schematic_data()
+                tabs.append(tab)
+            elif isinstance(widget, WaveformViewer) and widget.wave is not None:
+                tabs.append({"kind": "waveform", "name": name, "path": widget.wave.path})
+        active = self.notebook.index(self.notebook.select()) if self.notebook.tabs() else 0
+        save_session(tabs, active)
+
+    def quit(self):
+        try: self.save_session()
+        except OSError as e: messagebox.showwarning("Session", f"Could not save session: {e}")
+        self.loader.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+
+    # --- 分頁繪製: 顯示時才重畫，超過上限時釋放最久未顯示的分頁 ---
+    def on_tab_changed(self, event=None):
+        if not self.notebook.tabs(): return
+        editor = self.root.nametowidget(self.notebook.select())
+        if not isinstance(editor, SchematicEditor): return
+        if editor in self.live_tabs: self.live_tabs.remove(editor)
+        self.live_tabs.append(editor)
+        editor.materialize()
+        self.enforce_live_limit()
+
+    def enforce_live_limit(self):
+        while len(self.live_tabs) > max(1, self.max_live_tabs):
+            self.live_tabs.pop(0).release_canvas()
+
+    def live_tabs_dialog(self):
+        n = simpledialog.askinteger("Live Tabs", "Schematic tabs kept drawn (others keep only the model):",
+                                    initialvalue=self.max_live_tabs, minvalue=1)
+        if n is None: return
+        self.max_live_tabs = n
+        self.enforce_live_limit()
 
     # --- [新增] 分頁重新命名邏輯 ---
     def rename_tab(self, event):
@@ -68,7 +233,16 @@ class CircuitApp:
             new_name = simpledialog.askstring("Rename Tab", "Enter new name:", initialvalue=current_text)
             
             if new_name:
+                editor = self.root.nametowidget(self.notebook.tabs()[tab_index])
+                if not isinstance(editor, SchematicEditor):
+                    self.notebook.tab(tab_index, text=new_name)
+                    return
+                old_cell = editor.cell_name()
                 self.notebook.tab(tab_index, text=new_name)
+                # 其他分頁中引用此 cell 的實例跟著改名
+                for tab_id in self.notebook.tabs():
+                    widget = self.root.nametowidget(tab_id)
+                    if isinstance(widget, SchematicEditor): widget.rename_cell(old_cell, editor.cell_name())
         except tk.TclError:
             # 如果點擊的地方不是分頁標籤 (例如點到右邊空白處)，忽略錯誤
             pass
@@ -83,8 +257,15 @@ class CircuitApp:
         if not self.notebook.tabs(): return
         current_tab_id = self.notebook.select()
         editor = self.root.nametowidget(current_tab_id)
+        if not isinstance(editor, SchematicEditor): return # 波形分頁不處理編輯快捷鍵
         
         char = event.keysym.lower()
+        if event.state & 0x4: # Ctrl 組合鍵
+            if char == 'f': editor.find_dialog()
+            elif char == 'c': editor.copy_selection()
+            elif char == 'x': editor.cut_selection()
+            elif char == 'v': editor.paste()
+            return
         if char == 'r': editor.add_comp("R")
         elif char == 'l': editor.add_comp("L")
         elif char == 'c': editor.add_comp("C")
@@ -93,13 +274,19 @@ class CircuitApp:
         elif char == 'v': editor.add_comp("V")
         elif char == 'i': editor.add_comp("I")
         elif char == 'm': editor.mirror_selection()
-        elif event.keysym == 'Delete': editor.toggle_delete_mode()
+        elif char == 'o': editor.rotate_selection()
+        elif event.keysym == 'Delete': editor.on_delete_key()
         elif char == 'w': editor.toggle_wire_mode()
+        elif char == 'a': editor.toggle_route_mode()
+        elif char == 'x': editor.place_instance_dialog()
+        elif char == 'g': editor.toggle_probe_mode()
+        elif char == 'h': editor.toggle_net_mode()
+        elif char == 'f': editor.zoom_to_fit()
         elif event.keysym == 'F1': editor.show_help()
 
 def main():
     root = tk.Tk()
-    app = CircuitApp(root)
+    app = CircuitApp(root, files=sys.argv[1:])
     root.mainloop()
 
 if __name__ == "__main__":
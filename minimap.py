@@ -0,0 +1,161 @@
+import tkinter as tk
+
+COMP_COLOR = "#606060"
+WIRE_COLOR = "#4a7bd0"
+EMPTY_COLOR = "#ffffff"
+
+class MinimapRaster:
+    """
+    整張設計的低解析度點陣 (不碰 Tk)。每個像素記錄覆蓋它的元件數與電線數，
+    編輯時只增減該物件的足跡並記下變動的像素；
+    物件超出目前範圍時才放大範圍 (內容四周各留 1/4 邊界) 並整張重建，很少發生
+    """
+
+    def __init__(self, width=200, height=150):
+        self.width = width
+        self.height = height
+        self.reset()
+
+    def reset(self):
+        n = self.width * self.height
+        self.comp_hits = [0] * n
+        self.wire_hits = [0] * n
+        self.shapes = {}   # {key: (類型 "comp"/"wire", x1, y1, x2, y2)} 邏輯座標
+        self.prints = {}   # {key: [像素 index]}
+        self.bounds = None # 點陣對應的邏輯座標範圍 (x1, y1, x2, y2)，比內容多留邊界
+        self.extent = None # 曾放過物件的範圍 (不縮小)
+        self.scale = 1.0
+        self.origin = (0.0, 0.0)
+        self.dirty = set()
+        self.full = True   # 需要整張重畫
+
+    # --- 座標 ---
+    def _set_bounds(self, bounds):
+        x1, y1, x2, y2 = bounds
+        self.scale = min(self.width / (x2 - x1), self.height / (y2 - y1))
+        # 保持長寬比，設計置中
+        self.origin = (x1 - (self.width / self.scale - (x2 - x1)) / 2, y1 - (self.height / self.scale - (y2 - y1)) / 2)
+        self.bounds = bounds
+
+    def to_pixel(self, x, y):
+        return (x - self.origin[0]) * self.scale, (y - self.origin[1]) * self.scale
+
+    def to_logical(self, px, py):
+        return px / self.scale + self.origin[0], py / self.scale + self.origin[1]
+
+    def _clamp(self, px, py):
+        return min(max(int(px), 0), self.width - 1), min(max(int(py), 0), self.height - 1)
+
+    def footprint(self, kind, x1, y1, x2, y2):
+        w = self.width
+        a, b = self._clamp(*self.to_pixel(x1, y1))
+        c, d = self._clamp(*self.to_pixel(x2, y2))
+        if kind == "comp":
+            return [py * w + px for py in range(min(b, d), max(b, d) + 1) for px in range(min(a, c), max(a, c) + 1)]
+        steps = max(abs(c - a), abs(d - b)) or 1
+        return list(dict.fromkeys(int(b + (d - b) * i / steps + 0.5) * w + int(a + (c - a) * i / steps + 0.5)
+                                  for i in range(steps + 1)))
+
+    # --- 增量更新 ---
+    def _add(self, key):
+        shape = self.shapes[key]
+        hits = self.comp_hits if shape[0] == "comp" else self.wire_hits
+        pixels = self.footprint(*shape)
+        for i in pixels: hits[i] += 1
+        self.prints[key] = pixels
+        self.dirty.update(pixels)
+
+    def _drop(self, key):
+        pixels = self.prints.pop(key, None)
+        if pixels is None: return
+        hits = self.comp_hits if self.shapes[key][0] == "comp" else self.wire_hits
+        for i in pixels: hits[i] -= 1
+        self.dirty.update(pixels)
+
+    def set(self, key, kind, x1, y1, x2, y2):
+        """新增或移動一個物件 (元件為外框，電線為線段)"""
+        self._drop(key)
+        self.shapes[key] = (kind, x1, y1, x2, y2)
+        lo_x, hi_x, lo_y, hi_y = min(x1, x2), max(x1, x2), min(y1, y2), max(y1, y2)
+        b = self.bounds
+        if b is None or lo_x < b[0] or lo_y < b[1] or hi_x > b[2] or hi_y > b[3]:
+            self._grow((lo_x, lo_y, hi_x, hi_y))
+            return
+        self._add(key)
+        e = self.extent
+        self.extent = (min(e[0], lo_x), min(e[1], lo_y), max(e[2], hi_x), max(e[3], hi_y))
+
+    def remove(self, key):
+        self._drop(key)
+        self.shapes.pop(key, None)
+
+    def _grow(self, bbox):
+        b = self.extent or bbox
+        x1, y1 = min(b[0], bbox[0]), min(b[1], bbox[1])
+        x2, y2 = max(b[2], bbox[2]), max(b[3], bbox[3])
+        self.extent = (x1, y1, x2, y2)
+        mx, my = max((x2 - x1) / 4, 200), max((y2 - y1) / 4, 150)
+        self._set_bounds((x1 - mx, y1 - my, x2 + mx, y2 + my))
+        n = self.width * self.height
+        self.comp_hits = [0] * n
+        self.wire_hits = [0] * n
+        self.prints = {}
+        for key in self.shapes: self._add(key)
+        self.dirty = set()
+        self.full = True
+
+    def color(self, i):
+        if self.comp_hits[i]: return COMP_COLOR
+        return WIRE_COLOR if self.wire_hits[i] else EMPTY_COLOR
+
+    def take_dirty(self):
+        """回傳 (是否整張, 變動像素) 並清除記錄"""
+        full, dirty = self.full, self.dirty
+        self.full, self.dirty = False, set()
+        return full, dirty
+
+class Minimap(tk.Canvas):
+    """
+    縮圖面板: PhotoImage 只重畫變動的像素，另疊一個目前視窗範圍的框；
+    點擊或拖曳時以 on_jump(邏輯 x, y) 把視窗中心移過去
+    """
+
+    def __init__(self, parent, raster, on_jump):
+        super().__init__(parent, width=raster.width, height=raster.height, bg=EMPTY_COLOR,
+                         highlightthickness=1, highlightbackground="gray")
+        self.raster = raster
+        self.on_jump = on_jump
+        self.image = tk.PhotoImage(width=raster.width, height=raster.height)
+        self.create_image(0, 0, image=self.image, anchor="nw")
+        self.view_rect = self.create_rectangle(0, 0, 0, 0, outline="red")
+        self.view = None # 目前視窗的邏輯範圍
+        self.flush_job = None
+        self.bind("<Button-1>", self.on_press)
+        self.bind("<B1-Motion>", self.on_press)
+
+    def schedule_flush(self):
+        """同一輪事件中的多次編輯只重畫一次"""
+        if self.flush_job is None: self.flush_job = self.after_idle(self.flush)
+
+    def flush(self):
+        self.flush_job = None
+        raster = self.raster
+        full, dirty = raster.take_dirty()
+        w = raster.width
+        if full or len(dirty) > w * raster.height // 4: # 大量變動時整張一次送出
+            rows = ("{" + " ".join(raster.color(y * w + x) for x in range(w)) + "}" for y in range(raster.height))
+            self.image.put(" ".join(rows))
+        else:
+            for i in dirty:
+                x, y = i % w, i // w
+                self.image.put(raster.color(i), to=(x, y, x + 1, y + 1))
+        if full and self.view: self.show_view(*self.view) # 範圍變了，視窗框重新換算
+
+    def show_view(self, x1, y1, x2, y2):
+        self.view = (x1, y1, x2, y2)
+        if self.raster.bounds is None: return
+        self.coords(self.view_rect, *self.raster.to_pixel(x1, y1), *self.raster.to_pixel(x2, y2))
+
+    def on_press(self, event):
+        if self.raster.bounds is None: return
+        self.on_jump(*self.raster.to_logical(event.x, event.y))
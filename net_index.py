@@ -0,0 +1,366 @@
+import re
+from bisect import bisect_left
+from circuit_utils import point_key, dist, is_point_on_segment
+
+class Connectivity:
+    """
+    增量連線，結果與 build_node_map 相同。點 (point_key) 之間的邊來自電線與相距小於 tolerance 的腳位；
+    加邊時把較小的網路併入較大的，移除最後一條邊時只從兩端點交錯走訪，
+    較小的一側走完仍未相遇就分出新網路，成本只與編輯附近的網路大小有關。
+    命名: Pin > 自訂名稱 > N_k，N_k 依各自動命名網路第一個腳位的 order 排名
+    """
+
+    def __init__(self, tolerance=15.0):
+        self.tolerance = tolerance
+        self.adj = {}         # {point_key: {相鄰 point_key: 邊數}}
+        self.refs = {}        # {point_key: 引用此點的電線端點與腳位數}
+        self.net_of = {}      # {point_key: 網路 id}
+        self.keys = {}        # {網路 id: {point_key}}
+        self.terms = {}       # {網路 id: {腳位 id}}
+        self.key_terms = {}   # {point_key: {腳位 id}}
+        self.key_wires = {}   # {point_key: {電線 id}}
+        self.terminals = {}   # {腳位 id: (point_key, (x, y), order, pin_name, custom)}
+        self.wires = {}       # {電線 id: (point_key, point_key)}
+        self.buckets = {}     # {(gx, gy): {腳位 id}} 找鄰近腳位
+        self.next_id = 0
+        self.changed = set()  # take_changes() 之後變動過的網路 id
+        self.stale = set()    # 命名摘要待重算的網路 id
+        self.summary = {}     # {網路 id: (第一個 order, pin 名稱, 自訂名稱)}，只有含腳位的網路
+        self.auto = []        # 自動命名網路的第一個 order (已排序)
+        self.auto_net = {}    # {第一個 order: 網路 id}
+        self.named = {}       # {Pin/自訂名稱: {網路 id}}
+        self.renamed = set()  # take_renamed() 之後重算過名稱的網路 id
+        self.rank_from = None # 自動編號從此排名起可能位移
+
+    # --- 點與邊 ---
+    def _dirty(self, nid):
+        self.changed.add(nid)
+        self.stale.add(nid)
+
+    def _node(self, key):
+        self.refs[key] = self.refs.get(key, 0) + 1
+        if key in self.net_of: return
+        nid = self.next_id
+        self.next_id += 1
+        self.net_of[key] = nid
+        self.keys[nid] = {key}
+        self.terms[nid] = set()
+        self._dirty(nid)
+
+    def _release(self, key):
+        self.refs[key] -= 1
+        if self.refs[key]: return
+        del self.refs[key]
+        nid = self.net_of.pop(key)
+        self.keys[nid].discard(key)
+        self._dirty(nid)
+        if not self.keys[nid]: del self.keys[nid], self.terms[nid]
+
+    def _link(self, a, b):
+        if a == b: return
+        for x, y in ((a, b), (b, a)):
+            edges = self.adj.setdefault(x, {})
+            edges[y] = edges.get(y, 0) + 1
+        na, nb = self.net_of[a], self.net_of[b]
+        if na == nb: return
+        if len(self.keys[na]) < len(self.keys[nb]): na, nb = nb, na
+        for key in self.keys[nb]: self.net_of[key] = na
+        self.keys[na] |= self.keys.pop(nb)
+        self.terms[na] |= self.terms.pop(nb)
+        self._dirty(na)
+        self._dirty(nb)
+
+    def _unlink(self, a, b):
+        if a == b: return
+        for x, y in ((a, b), (b, a)):
+            edges = self.adj[x]
+            edges[y] -= 1
+            if not edges[y]: del edges[y]
+            if not edges: del self.adj[x]
+        if b in self.adj.get(a, ()): return # 還有平行的邊
+        part = self._split_side(a, b)
+        if part is None: return
+        old, nid = self.net_of[a], self.next_id
+        self.next_id += 1
+        moved = {t for key in part for t in self.key_terms.get(key, ())}
+        for key in part: self.net_of[key] = nid
+        self.keys[old] -= part
+        self.keys[nid] = part
+        self.terms[old] -= moved
+        self.terms[nid] = moved
+        self._dirty(old)
+        self._dirty(nid)
+
+    def _split_side(self, a, b):
+        """a、b 仍相連回傳 None；否則回傳較先走完的一側 (通常是較小的) 的點集合"""
+        seen = ({a}, {b})
+        frontier = ([a], [b])
+        while True:
+            for side in (0, 1):
+                if not frontier[side]: return seen[side]
+                key = frontier[side].pop()
+                for nxt in self.adj.get(key, ()):
+                    if nxt in seen[1 - side]: return None
+                    if nxt not in seen[side]:
+                        seen[side].add(nxt)
+                        frontier[side].append(nxt)
+
+    def _cell(self, pt):
+        return int(pt[0] // self.tolerance), int(pt[1] // self.tolerance)
+
+    def _near(self, pt):
+        """相距小於 tolerance 的已登錄腳位 id"""
+        cx, cy = self._cell(pt)
+        for gx in (cx - 1, cx, cx + 1):
+            for gy in (cy - 1, cy, cy + 1):
+                for tid in self.buckets.get((gx, gy), ()):
+                    if dist(pt, self.terminals[tid][1]) < self.tolerance: yield tid
+
+    # --- 編輯 ---
+    def add_terminal(self, tid, pt, order, pin_name="", custom=""):
+        """order: 可排序且不重複，對應 build_node_map 的腳位順序"""
+        if tid in self.terminals: self.remove_terminal(tid)
+        key = point_key(pt)
+        self.terminals[tid] = (key, pt, order, pin_name, custom)
+        self._node(key)
+        self.key_terms.setdefault(key, set()).add(tid)
+        nid = self.net_of[key]
+        self.terms[nid].add(tid)
+        self._dirty(nid)
+        for other in list(self._near(pt)): self._link(key, self.terminals[other][0])
+        self.buckets.setdefault(self._cell(pt), set()).add(tid)
+
+    def remove_terminal(self, tid):
+        entry = self.terminals.get(tid)
+        if entry is None: return
+        key, pt = entry[0], entry[1]
+        cell = self._cell(pt)
+        self.buckets[cell].discard(tid)
+        if not self.buckets[cell]: del self.buckets[cell]
+        for other in list(self._near(pt)): self._unlink(key, self.terminals[other][0])
+        del self.terminals[tid]
+        nid = self.net_of[key]
+        self.terms[nid].discard(tid)
+        self._dirty(nid)
+        self.key_terms[key].discard(tid)
+        if not self.key_terms[key]: del self.key_terms[key]
+        self._release(key)
+
+    def add_wire(self, wid, p1, p2):
+        if wid in self.wires: self.remove_wire(wid)
+        a, b = point_key(p1), point_key(p2)
+        self.wires[wid] = (a, b)
+        for key in (a, b):
+            self._node(key)
+            self.key_wires.setdefault(key, set()).add(wid)
+        self._link(a, b)
+
+    def remove_wire(self, wid):
+        ends = self.wires.pop(wid, None)
+        if ends is None: return
+        a, b = ends
+        self._unlink(a, b)
+        for key in (a, b):
+            wires = self.key_wires.get(key)
+            if wires is not None:
+                wires.discard(wid)
+                if not wires: del self.key_wires[key]
+            self._release(key)
+
+    def take_changes(self):
+        """回傳並清除上次呼叫後變動過的網路 id (可能已不存在)"""
+        changed, self.changed = self.changed, set()
+        return changed
+
+    # --- 命名 ---
+    def _flush(self):
+        # 先移除全部舊摘要再加入新的: 合併/分割時腳位 (與其 order) 會在待重算的網路之間搬移
+        for nid in self.stale:
+            old = self.summary.pop(nid, None)
+            if old is None: continue
+            if old[1] is None and old[2] is None:
+                rank = bisect_left(self.auto, old[0])
+                del self.auto[rank]
+                del self.auto_net[old[0]]
+                self._shifted(rank)
+            else:
+                name = old[1] if old[1] is not None else old[2]
+                self.named[name].discard(nid)
+                if not self.named[name]: del self.named[name]
+        for nid in self.stale:
+            tids = self.terms.get(nid)
+            if not tids: continue
+            first = pin = custom = None
+            for tid in tids:
+                key, pt, order, pin_name, custom_name = self.terminals[tid]
+                if first is None or order < first: first = order
+                if pin_name:
+                    if pin is None or order < pin[0]: pin = (order, pin_name)
+                elif custom_name.strip() != "":
+                    if custom is None or order < custom[0]: custom = (order, custom_name)
+            summary = (first, pin and pin[1], custom and custom[1])
+            self.summary[nid] = summary
+            if pin is None and custom is None:
+                rank = bisect_left(self.auto, first)
+                self.auto.insert(rank, first)
+                self.auto_net[first] = nid
+                self._shifted(rank)
+            else:
+                self.named.setdefault(summary[1] if pin is not None else summary[2], set()).add(nid)
+        self.renamed |= self.stale
+        self.stale = set()
+
+    def _shifted(self, rank):
+        if self.rank_from is None or rank < self.rank_from: self.rank_from = rank
+
+    def take_renamed(self):
+        """回傳並清除上次呼叫後名稱可能改變的網路 id: 變動過的網路，以及自動編號因此位移的網路"""
+        if self.stale: self._flush()
+        renamed = self.renamed
+        if self.rank_from is not None: renamed |= {self.auto_net[o] for o in self.auto[self.rank_from:]}
+        self.renamed, self.rank_from = set(), None
+        return renamed
+
+    def name(self, nid):
+        """網路名稱；沒有腳位的網路 (只有電線) 回傳 None"""
+        if self.stale: self._flush()
+        summary = self.summary.get(nid)
+        if summary is None: return None
+        first, pin, custom = summary
+        if pin is not None: return pin
+        if custom is not None: return custom
+        return f"N_{bisect_left(self.auto, first) + 1}"
+
+    def nets_named(self, name):
+        """名稱為 name 的網路 id (不相連的網路可能同名)"""
+        if self.stale: self._flush()
+        out = set(self.named.get(name, ()))
+        m = re.fullmatch(r"N_(\d+)", name)
+        if m and 0 < int(m.group(1)) <= len(self.auto): out.add(self.auto_net[self.auto[int(m.group(1)) - 1]])
+        return out
+
+class NodeMap:
+    """{point_key: 網路名稱} 的唯讀檢視 (只含有腳位的網路)；名稱在查詢時才由 Connectivity 求出"""
+    __slots__ = ("conn",)
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def get(self, key, default=None):
+        nid = self.conn.net_of.get(key)
+        name = None if nid is None else self.conn.name(nid)
+        return default if name is None else name
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        name = self.get(key)
+        if name is None: raise KeyError(key)
+        return name
+
+    def items(self):
+        for key in self.conn.net_of:
+            name = self.get(key)
+            if name is not None: yield key, name
+
+class NetIndex:
+    """
+    持久的網路索引: 點 -> 網路名稱、網路 -> (電線, 腳位)。
+    第一次查詢時整批建立，之後由編輯器逐一回報元件與電線的增刪 (Connectivity 只更新受影響的網路)；
+    失效 (例如釋放分頁) 時編輯回報會略過，下一次查詢再重建
+    """
+
+    def __init__(self, cell=50):
+        self.cell = cell
+        self.reset()
+
+    def reset(self):
+        self.valid = False
+        self.conn = Connectivity()
+        self.node_map = NodeMap(self.conn) # {point_key: 網路名稱}，與 netlist 命名一致
+        self.entries = {}     # {(元件 tag, 腳位序): (comp, term, (x, y))}
+        self.comp_terms = {}  # {元件 tag: 腳位數}
+        self.order = {}       # {元件 tag: 加入順序}，等同元件清單的順序
+        self.next_order = 0
+        self.wire_ends = {}   # {Wire: (p1, p2)} 登錄時的座標
+        self.wire_cells = {}  # {(gx, gy): [Wire]} 電線空間索引，查詢線段中間的點
+
+    def invalidate(self):
+        self.reset()
+
+    def _cells(self, p1, p2):
+        x1, x2 = sorted((p1[0], p2[0]))
+        y1, y2 = sorted((p1[1], p2[1]))
+        for gx in range(int(x1 // self.cell), int(x2 // self.cell) + 1):
+            for gy in range(int(y1 // self.cell), int(y2 // self.cell) + 1):
+                yield gx, gy
+
+    def build(self, components, wires):
+        """components: [(元件 tag, [(comp, term, (x, y), pin_name)])] 依元件順序；wires 需已正規化"""
+        self.reset()
+        self.valid = True
+        for tag, terminals in components: self.set_component(tag, terminals)
+        for wire in wires: self.add_wire(wire)
+
+    # --- 增量更新 (索引失效時略過) ---
+    def set_component(self, tag, terminals):
+        """新增或更新元件的腳位；新元件排在最後 (元件清單只會附加或刪除)"""
+        if not self.valid: return
+        self.remove_component(tag, keep_order=True)
+        if tag not in self.order:
+            self.order[tag] = self.next_order
+            self.next_order += 1
+        seq = self.order[tag]
+        for i, (comp, term, pt, pin_name) in enumerate(terminals):
+            self.entries[(tag, i)] = (comp, term, pt)
+            self.conn.add_terminal((tag, i), pt, (seq, i), pin_name, term.custom_net_name)
+        self.comp_terms[tag] = len(terminals)
+
+    def remove_component(self, tag, keep_order=False):
+        if not self.valid: return
+        for i in range(self.comp_terms.pop(tag, 0)):
+            self.conn.remove_terminal((tag, i))
+            del self.entries[(tag, i)]
+        if not keep_order: self.order.pop(tag, None)
+
+    def add_wire(self, wire):
+        if not self.valid: return
+        self.remove_wire(wire)
+        ends = (wire.start_p, wire.end_p)
+        self.wire_ends[wire] = ends
+        self.conn.add_wire(wire, *ends)
+        for c in self._cells(*ends): self.wire_cells.setdefault(c, []).append(wire)
+
+    def remove_wire(self, wire):
+        ends = self.wire_ends.pop(wire, None)
+        if ends is None: return
+        self.conn.remove_wire(wire)
+        for c in self._cells(*ends):
+            cell = self.wire_cells[c]
+            cell.remove(wire)
+            if not cell: del self.wire_cells[c]
+
+    # --- 查詢 ---
+    def take_renamed(self):
+        """上次呼叫後網路名稱可能改變的元件 {元件 tag: comp}"""
+        return {tid[0]: self.entries[tid][0] for nid in self.conn.take_renamed() for tid in self.conn.terms.get(nid, ())}
+
+    def net_at(self, pt, tolerance=5):
+        """邏輯座標點所在的網路 (腳位/電線端點或電線中段)；不在任何網路上回傳 None"""
+        net = self.node_map.get(point_key(pt))
+        if net is not None: return net
+        cell = (int(pt[0] // self.cell), int(pt[1] // self.cell))
+        for wire in self.wire_cells.get(cell, ()):
+            if is_point_on_segment(pt[0], pt[1], *wire.start_p, *wire.end_p, tolerance):
+                return self.node_map.get(point_key(wire.start_p))
+        return None
+
+    def members(self, net):
+        """回傳 ([Wire], [(comp, term, (x, y))])，腳位依元件順序"""
+        wires, terms = set(), []
+        for nid in self.conn.nets_named(net):
+            for key in self.conn.keys[nid]: wires |= self.conn.key_wires.get(key, set())
+            terms.extend(self.conn.terms[nid])
+        terms.sort(key=lambda tid: (self.order[tid[0]], tid[1]))
+        return list(wires), [self.entries[tid] for tid in terms]
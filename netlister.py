@@ -0,0 +1,462 @@
+import json
+import os
+import threading
+from components import (Pin, CMOS, VoltageSource, CurrentSource, SubcktInstance, LibraryComponent, PlaceholderComponent,
+                        component_from_dict)
+from net_index import NetIndex
+from circuit_utils import point_key, split_bus, bus_width, bus_bit, netlist_header, sim_lines
+from params import ParamTable
+
+def port_bits(port, net):
+    """
+    子電路埠的節點: 匯流排埠 (D<0:63>) 逐位元展開，與 .SUBCKT 標頭及內部陣列元件的位元一致。
+    net 同寬時逐位元對應，單一網路則每個位元都接到它
+    """
+    width = bus_width(port)
+    if width == 1: return [net]
+    if bus_width(net) == width: return [bus_bit(net, i) for i in range(width)]
+    return [net] * width
+
+class NetlistMixin:
+    """
+    netlist 產生，編輯器與背景匯出用的 CellSnapshot 共用。
+    需要 components / wires / params / global_settings / sim_settings / net_index / line_cache
+    以及 cell_name() / find_cell(name)
+    """
+
+    def terminal_entries(self, comp):
+        """NetIndex 用的 [(comp, term, (x, y), pin_name)]"""
+        pin_name = comp.name if isinstance(comp, Pin) else ""
+        return [(comp, term, (tx, ty), pin_name) for term, tx, ty in comp.get_abs_terminals()]
+
+    def nets(self):
+        """目前的 NetIndex (失效時重建一次)"""
+        if not self.net_index.valid:
+            self.net_index.build([(comp.tags, self.terminal_entries(comp)) for comp in self.components], self.wires)
+        return self.net_index
+
+    def solve_connectivity(self):
+        """回傳 {point_key: net_name} (與 NetIndex 共用，未編輯時不重算)；不可修改"""
+        return self.nets().node_map
+
+    def generate_netlist_text(self):
+        return "\n".join(self.iter_netlist_lines())
+
+    def write_netlist(self, f):
+        """逐行寫出 (陣列/匯流排展開不會在記憶體中堆成整份字串)"""
+        for i, line in enumerate(self.iter_netlist_lines()):
+            if i: f.write("\n")
+            f.write(line)
+
+    def iter_netlist_lines(self):
+        yield from netlist_header(self.global_settings)
+        yield from self.iter_circuit_lines()
+        yield from sim_lines(self.sim_settings)
+
+    def iter_circuit_lines(self):
+        """元件與子電路定義 (不含標頭與分析指令)，掃描 (sweep) 各變體共用"""
+        subckts = {}
+        back = self.recursive_refs()
+        yield from self.param_block()
+        yield from self.iter_netlist_body(subckts, back.get(self.cell_name(), set()))
+        yield from self.iter_subckt_lines(subckts, back)
+
+    def param_block(self):
+        params = self.params.netlist_lines()
+        if not params: return []
+        return ["* --- Parameters ---", *params, ""]
+
+    def iter_subckt_lines(self, subckts, back):
+        """子電路定義放在主電路之後；巢狀 cell 會在輸出途中加入 subckts"""
+        done = 0
+        while done < len(subckts):
+            name, (ports, cell) = list(subckts.items())[done]
+            done += 1
+            if done == 1: yield "\n* --- Subcircuits ---"
+            yield f".SUBCKT {name} {' '.join(bit for p in ports for bit in port_bits(p, p))}"
+            yield from cell.params.netlist_lines()
+            yield from cell.iter_netlist_body(subckts, back.get(name, set()))
+            yield f".ENDS {name}"
+
+    def recursive_refs(self, instances=None):
+        """
+        {cell: {引用的 cell}}: 由頂層依實例順序做 DFS，指回目前路徑上 cell 的引用
+        (自我引用、A -> B -> A 等間接遞迴)。只依 (上層, 下層) 決定，與輸出順序無關。
+        instances: 頂層的子電路實例 (依元件順序)，省略時由 components 找出
+        """
+        back, state = {}, {} # state: 1 = 在目前路徑上，2 = 已完成
+        def visit(name, comps):
+            state[name] = 1
+            for comp in comps:
+                if not isinstance(comp, SubcktInstance): continue
+                if state.get(comp.cell) == 1:
+                    back.setdefault(name, set()).add(comp.cell)
+                elif comp.cell not in state:
+                    child = self.find_cell(comp.cell)
+                    if child is not None: visit(comp.cell, child.components)
+            state[name] = 2
+        visit(self.cell_name(), self.components if instances is None else instances)
+        return back
+
+    def iter_netlist_body(self, subckts, recursive):
+        """
+        元件行 (Pin 只當網路名稱)。用到的子電路登記在 subckts {cell: (ports, editor)}，
+        每個 cell 只解一次連線，與實例數量無關；recursive 內的 cell (recursive_refs) 不展開，實例行改成註解
+        """
+        node_map = self.solve_connectivity()
+        cache = {}
+        for comp in self.components:
+            yield from self.element_lines(comp, node_map, subckts, recursive, cache)
+        self.line_cache = cache # 只保留仍存在的元件
+
+    def element_lines(self, comp, node_map, subckts, recursive, cache):
+        """
+        單一元件的 netlist 行，警告放在它前面；陣列實例 (M1<0:63>) 在此才逐位元展開。
+        元件本身與其網路都沒變時沿用 line_cache 的行，用到的項目放入 cache
+        """
+        warnings = []
+        for comp, name, node_names in self.comp_elements(comp, node_map, warnings):
+            if isinstance(comp, SubcktInstance): # 埠依賴其他 cell，且需登記 subckts，不快取
+                line = self.instance_line(comp, name, node_names, subckts, recursive, warnings)
+                while warnings: yield f"* WARNING: {warnings.pop(0)}"
+                yield line
+                continue
+            while warnings: yield f"* WARNING: {warnings.pop(0)}"
+            key, nodes = (comp.tags, name), tuple(node_names)
+            hit = self.line_cache.get(key)
+            if hit is None or hit[0] != comp.revision or hit[1] != nodes:
+                hit = (comp.revision, nodes, self.component_line(comp, name, node_names))
+            cache[key] = hit
+            yield hit[2]
+        while warnings: yield f"* WARNING: {warnings.pop(0)}"
+
+    def iter_elements(self, node_map, warnings):
+        """所有元件的 (元件, 實例名稱, 節點名稱)，見 comp_elements"""
+        for comp in self.components:
+            yield from self.comp_elements(comp, node_map, warnings)
+
+    def comp_elements(self, comp, node_map, warnings):
+        """
+        (元件, 實例名稱, 節點名稱)；Pin 略過，陣列實例逐位元展開。
+        寬度不符與無法建立的元件 (PlaceholderComponent，略過) 的訊息附加到 warnings
+        """
+        if isinstance(comp, Pin): return
+        if isinstance(comp, PlaceholderComponent):
+            warnings.append(f"{comp.name} skipped: {comp.reason}")
+            return
+        base, bus_range = split_bus(comp.name)
+        abs_terms = comp.get_abs_terminals()
+        node_names = []
+        for term, tx, ty in abs_terms:
+            key = point_key((tx, ty))
+            if key in node_map: node_names.append(node_map[key])
+            else: node_names.append(f"NC_{base}_{term.name}{bus_range}")
+
+        width = bus_width(comp.name)
+        if width == 1:
+            yield comp, comp.name, node_names
+            return
+        for net in node_names:
+            if bus_width(net) not in (1, width):
+                warnings.append(f"{comp.name} is {width} wide but net {net} is {bus_width(net)} wide")
+        for i in range(width):
+            bit_nodes = [bus_bit(net, i) if bus_width(net) == width else net for net in node_names]
+            yield comp, bus_bit(comp.name, i), bit_nodes
+
+    def component_line(self, comp, name, node_names):
+        line = ""
+        if isinstance(comp, CMOS):
+            line = f"{name} {' '.join(node_names)} {comp.model} W={comp.w} L={comp.l}"
+        elif isinstance(comp, (VoltageSource, CurrentSource)):
+            stype = comp.source_type
+            p = comp.params.get(stype, {})
+            base_line = f"{name} {' '.join(node_names)}"
+            if stype == "DC": line = f"{base_line} DC {p.get('dc_val', '0')}"
+            elif stype == "AC": line = f"{base_line} AC {p.get('mag', '1')} {p.get('phase', '0')}"
+            elif stype == "PULSE": line = f"{base_line} PULSE({p.get('v1')} {p.get('v2')} {p.get('td')} {p.get('tr')} {p.get('tf')} {p.get('pw')} {p.get('per')})"
+            elif stype == "SIN": line = f"{base_line} SIN({p.get('vo')} {p.get('va')} {p.get('freq')} {p.get('td')} {p.get('theta')})"
+            else: line = f"{base_line} DC 0"
+        elif isinstance(comp, LibraryComponent):
+            line = comp.symbol.netlist_line(name, node_names, comp.params)
+        else:
+            line = f"{name} {' '.join(node_names)} {comp.value}"
+        return line
+
+    def instance_line(self, comp, name, node_names, subckts, recursive, warnings):
+        """
+        X 行，以下情況加一筆警告 (陣列實例只警告一次): 找不到的 cell (沒有 .SUBCKT 定義)；
+        遞迴引用 (recursive 內的 cell)，該行改成註解，netlist 不會出現互相引用的定義
+        """
+        nets = dict(zip((t.name for t in comp.terminals), node_names))
+        ports = comp.ports
+        first_bit = name == comp.name or name == bus_bit(comp.name, 0)
+        is_loop = comp.cell in recursive
+        if is_loop and first_bit:
+            warnings.append(f"{comp.name} references {comp.cell} recursively; instance commented out")
+        if comp.cell in subckts:
+            ports = subckts[comp.cell][0]
+        elif not is_loop:
+            cell = self.find_cell(comp.cell)
+            if cell is not None:
+                ports = cell.cell_ports()
+                subckts[comp.cell] = (ports, cell)
+            elif first_bit: warnings.append(f"{comp.name}: cell {comp.cell} not found; subcircuit not defined")
+        base = split_bus(comp.name)[0]
+        nodes = []
+        for p in ports:
+            net = nets.get(p, f"NC_{base}_{p}")
+            if bus_width(net) not in (1, bus_width(p)):
+                if first_bit: warnings.append(f"{comp.name} port {p} is {bus_width(p)} wide but net {net} is {bus_width(net)} wide")
+                net = f"NC_{base}_{p}"
+            nodes.extend(port_bits(p, net))
+        line = f"{name} {' '.join(nodes)} {comp.cell}"
+        return "* " + line if is_loop else line
+
+    def cell_ports(self):
+        """Pin 元件即為埠，依放置順序 (同名只取一次)"""
+        ports = []
+        for comp in self.components:
+            if isinstance(comp, Pin) and comp.name not in ports: ports.append(comp.name)
+        return ports
+
+class Segment:
+    __slots__ = ("start_p", "end_p")
+
+    def __init__(self, p1, p2):
+        self.start_p = tuple(p1)
+        self.end_p = tuple(p2)
+
+class CellSnapshot(NetlistMixin):
+    """
+    由 get_schematic_data() 的內容重建的唯讀電路 (不需要 Tk)，可在背景 thread 產生 netlist。
+    cells: {cell 名稱: 資料}，子電路實例引用的 cell 在需要時才建立
+    """
+
+    def __init__(self, name, data, cells=None):
+        self.name = name
+        self.cells = cells or {}
+        self._cell_cache = {}
+        self.global_settings = dict(data.get("global_settings", {}))
+        self.sim_settings = data.get("sim_settings", {})
+        self.params = ParamTable()
+        self.params.update(data.get("params", {}))
+        self.components = [component_from_dict(None, item, counted=False) for item in data["components"]]
+        self.wires = [Segment(w["start"], w["end"]) for w in data["wires"]]
+        self.net_index = NetIndex()
+        self.line_cache = {}
+
+    def cell_name(self):
+        return self.name
+
+    def find_cell(self, name):
+        if name not in self._cell_cache:
+            data = self.cells.get(name)
+            self._cell_cache[name] = None if data is None else CellSnapshot(name, data, self.cells)
+        return self._cell_cache[name]
+
+    def element_count(self):
+        """netlist 元件行數 (陣列展開後)，供進度估計"""
+        return sum(bus_width(c.name) for c in self.components if not isinstance(c, Pin))
+
+def section_text(lines):
+    """多行合成一段 Text 內容 (每行含換行)，空段為空字串"""
+    return "\n".join(lines) + "\n" if lines else ""
+
+class LineCounts:
+    """各段落的行數，以順序號索引 (Fenwick tree)；某段之前的總行數 O(log n)"""
+    __slots__ = ("counts", "tree")
+
+    def __init__(self):
+        self.counts = []
+        self.tree = [0]
+
+    def _grow(self, need):
+        size = max(16, 2 * len(self.counts), need)
+        self.counts += [0] * (size - len(self.counts))
+        self.tree = [0] * (size + 1)
+        for i in range(1, size + 1):
+            self.tree[i] += self.counts[i - 1]
+            parent = i + (i & -i)
+            if parent <= size: self.tree[parent] += self.tree[i]
+
+    def get(self, i):
+        return self.counts[i] if i < len(self.counts) else 0
+
+    def set(self, i, n):
+        if i >= len(self.counts): self._grow(i + 1)
+        delta = n - self.counts[i]
+        self.counts[i] = n
+        i += 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def before(self, i):
+        """順序號小於 i 的段落總行數"""
+        i = min(i, len(self.counts))
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def total(self):
+        return self.before(len(self.counts))
+
+class LiveNetlist:
+    """
+    即時 netlist 視窗的內容 (不需要 Tk)，與 generate_netlist_text() 相同但分段維護:
+    head (標頭與參數)、每個元件一段 (依元件順序)、tail (子電路定義與分析指令)。
+    update() 只重算 touch() 記錄的元件與網路名稱可能改變的元件 (NetIndex.take_renamed)，
+    子電路實例依賴其他 cell，每次都重算；回傳要替換的行範圍，視窗依序套用
+    """
+
+    def __init__(self, source):
+        self.source = source  # NetlistMixin (編輯器)
+        self.reset(None)
+
+    def reset(self, conn):
+        self.conn = conn      # 建立時 NetIndex 的 Connectivity；索引重建後整份重來
+        self.head = ""
+        self.tail = ""
+        self.chunks = {}      # {元件 tag: 文字}，空段不記錄
+        self.comps = {}       # {元件 tag: comp}
+        self.instances = {}   # {元件 tag: SubcktInstance}
+        self.seq = {}         # {元件 tag: 元件順序號 (NetIndex.order)}
+        self.lines = LineCounts()
+
+    def text(self):
+        return self.head + "".join(self.chunks[t] for t in sorted(self.chunks, key=self.seq.get)) + self.tail
+
+    def line_count(self):
+        return self.head.count("\n") + self.lines.total() + self.tail.count("\n")
+
+    def update(self, changed=()):
+        """
+        changed: {元件 tag: comp 或 None (已刪除)}。
+        回傳 [(起始行 (0 起算), 原行數, 新文字)]，每筆的行號已反映前面各筆的替換
+        """
+        index = self.source.nets()
+        if index.conn is not self.conn:
+            old = self.line_count()
+            self.reset(index.conn)
+            index.take_renamed()
+            self._apply({comp.tags: comp for comp in self.source.components})
+            return [(0, old, self.text())]
+        changed = dict(changed)
+        for tag, comp in index.take_renamed().items(): changed.setdefault(tag, comp)
+        return self._apply(changed)
+
+    def _apply(self, changed):
+        src = self.source
+        index = src.nets()
+        for tag, comp in changed.items():
+            if comp is None:
+                self.comps.pop(tag, None)
+                self.instances.pop(tag, None)
+                continue
+            self.comps[tag] = comp
+            self.seq.setdefault(tag, index.order[tag])
+            if isinstance(comp, SubcktInstance): self.instances[tag] = comp
+            else: self.instances.pop(tag, None)
+        instances = [self.instances[t] for t in sorted(self.instances, key=self.seq.get)]
+        back = src.recursive_refs(instances)
+        recursive = back.get(src.cell_name(), set())
+        node_map = src.solve_connectivity()
+
+        edits = []
+        head = section_text(netlist_header(src.global_settings) + src.param_block())
+        if head != self.head:
+            edits.append((0, self.head.count("\n"), head))
+            self.head = head
+        for tag in set(changed) | set(self.instances):
+            comp = self.comps.get(tag)
+            lines = [] if comp is None else list(src.element_lines(comp, node_map, {}, recursive, src.line_cache))
+            self._set_chunk(edits, tag, section_text(lines))
+            if comp is None: self.seq.pop(tag, None)
+
+        subckts = {} # 與 iter_netlist_body 相同: 依實例順序登記 (遞迴的不展開)
+        for comp in instances:
+            if comp.cell in subckts or comp.cell in recursive: continue
+            cell = src.find_cell(comp.cell)
+            if cell is not None: subckts[comp.cell] = (cell.cell_ports(), cell)
+        tail = section_text(list(src.iter_subckt_lines(subckts, back)) + sim_lines(src.sim_settings))
+        if tail != self.tail:
+            edits.append((self.head.count("\n") + self.lines.total(), self.tail.count("\n"), tail))
+            self.tail = tail
+        return edits
+
+    def _set_chunk(self, edits, tag, text):
+        if text == self.chunks.get(tag, ""): return
+        seq = self.seq[tag]
+        edits.append((self.head.count("\n") + self.lines.before(seq), self.lines.get(seq), text))
+        self.lines.set(seq, text.count("\n"))
+        if text: self.chunks[tag] = text
+        else: del self.chunks[tag]
+
+class ExportJob:
+    """
+    背景匯出: 在 worker thread 由快照解連線、產生 netlist 並寫檔 (先寫暫存檔，完成才取代)。
+    UI 以 progress (0~1) / status 輪詢，cancel() 會在下一個檢查點停止
+    """
+    CHECK_EVERY = 500 # 每幾行檢查一次取消並更新進度
+
+    def __init__(self, snapshot, netlist_path=None, json_path=None):
+        self.snapshot = snapshot   # (cell 名稱, 資料, {cell: 資料})
+        self.netlist_path = netlist_path
+        self.json_path = json_path
+        self.progress = 0.0
+        self.status = "running"    # running / done / failed / cancelled
+        self.error = None
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    @property
+    def active(self):
+        return self.status == "running"
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _run(self):
+        tmp_paths = []
+        try:
+            name, data, cells = self.snapshot
+            if self.json_path:
+                tmp = self.json_path + ".tmp"
+                tmp_paths.append(tmp)
+                with open(tmp, "w") as f: json.dump(data, f, indent=4)
+            cell = CellSnapshot(name, data, cells)
+            total = cell.element_count() + 20 # 標頭/分析指令約略數
+            out = None
+            if self.netlist_path:
+                tmp = self.netlist_path + ".tmp"
+                tmp_paths.append(tmp)
+                out = open(tmp, "w")
+            try:
+                for i, line in enumerate(cell.iter_netlist_lines()):
+                    if i % self.CHECK_EVERY == 0:
+                        if self.cancelled.is_set():
+                            self.status = "cancelled"
+                            return
+                        self.progress = min(i / total, 0.99)
+                    if out is not None:
+                        if i: out.write("\n")
+                        out.write(line)
+            finally:
+                if out is not None: out.close()
+            if self.cancelled.is_set():
+                self.status = "cancelled"
+                return
+            if self.json_path: os.replace(self.json_path + ".tmp", self.json_path)
+            if self.netlist_path: os.replace(self.netlist_path + ".tmp", self.netlist_path)
+            tmp_paths = []
+            self.progress = 1.0
+            self.status = "done"
+        except Exception as e: # 回報給 UI，不讓 thread 默默結束
+            self.error = str(e)
+            self.status = "failed"
+        finally:
+            for tmp in tmp_paths:
+                if os.path.exists(tmp): os.remove(tmp)
@@ -0,0 +1,205 @@
+import math
+import re
+from functools import lru_cache
+from circuit_utils import spice_number
+
+# 運算式: SPICE 數字 (可帶倍率字尾)、參數名稱、四則運算 / ** / ^、括號與常用函式
+_TOKEN_RE = re.compile(r"""
+    (?P<num>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?[a-zA-Z]*) |
+    (?P<name>[A-Za-z_][A-Za-z_0-9]*) |
+    (?P<op>\*\*|[-+*/^(),]) |
+    (?P<ws>\s+)
+""", re.X)
+
+FUNCTIONS = {
+    "sqrt": math.sqrt, "exp": math.exp, "log": math.log, "ln": math.log, "log10": math.log10,
+    "abs": abs, "min": min, "max": max, "pow": math.pow, "pwr": math.pow,
+    "sin": math.sin, "cos": math.cos, "tan": math.tan, "atan": math.atan,
+}
+CONSTANTS = {"pi": math.pi}
+
+def _real(value, text):
+    """運算結果必須是實數 (單獨的函式名稱、逗號組成的 tuple、負數開根號的複數都不算)"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool): return float(value)
+    raise ValueError(f"{text!r} is not a real number")
+
+class Expr:
+    """已編譯的運算式: names 為引用到的參數 (小寫)"""
+    __slots__ = ("text", "code", "names", "const")
+
+    def __init__(self, text, code, names):
+        self.text = text
+        self.code = code
+        self.names = names
+        self.const = None if names else _real(eval(code, {"__builtins__": {}}, dict(FUNCTIONS, **CONSTANTS)), text)
+
+    def evaluate(self, env):
+        if self.const is not None: return self.const
+        scope = dict(FUNCTIONS, **CONSTANTS)
+        scope.update(env)
+        try:
+            return _real(eval(self.code, {"__builtins__": {}}, scope), self.text)
+        except NameError as e:
+            raise ValueError(f"undefined parameter in {self.text!r}: {e}")
+        except (ArithmeticError, TypeError) as e:
+            raise ValueError(f"cannot evaluate {self.text!r}: {e}")
+
+def _strip_quotes(text):
+    text = text.strip()
+    if len(text) >= 2 and (text[0], text[-1]) in (("'", "'"), ("{", "}"), ('"', '"')): return text[1:-1].strip()
+    return text
+
+@lru_cache(maxsize=4096)
+def compile_expr(text):
+    """
+    把 SPICE 運算式轉成 Python bytecode (以字串為 key 快取)；
+    只接受數字/名稱/運算子 token，不會執行任意程式碼。格式錯誤丟出 ValueError
+    """
+    body = _strip_quotes(text)
+    out, names = [], set()
+    pos = 0
+    while pos < len(body):
+        m = _TOKEN_RE.match(body, pos)
+        if not m: raise ValueError(f"invalid expression: {text!r}")
+        pos = m.end()
+        if m.lastgroup == "num": out.append(repr(spice_number(m.group())))
+        elif m.lastgroup == "name":
+            name = m.group().lower()
+            if name.startswith("__"): raise ValueError(f"invalid name in {text!r}")
+            out.append(name)
+            if name not in FUNCTIONS and name not in CONSTANTS: names.add(name)
+        elif m.lastgroup == "op": out.append("**" if m.group() == "^" else m.group())
+    if not out: raise ValueError(f"empty expression: {text!r}")
+    try:
+        return Expr(text, compile(" ".join(out), "<expr>", "eval"), frozenset(names))
+    except SyntaxError:
+        raise ValueError(f"invalid expression: {text!r}")
+    except (ArithmeticError, TypeError) as e:
+        raise ValueError(f"cannot evaluate {text!r}: {e}")
+
+def evaluate(text, env=None):
+    return compile_expr(text).evaluate(env or {})
+
+class ParamTable:
+    """
+    設計層級的 .PARAM 表。每個參數記錄相依關係；
+    set() 只重算該參數與其 (遞移) 相依者，其他值與已快取的元件數值不動
+    """
+
+    def __init__(self):
+        self.exprs = {}     # {小寫名稱: 運算式字串}
+        self.display = {}   # {小寫名稱: 原始大小寫}
+        self.values = {}    # {小寫名稱: float}
+        self.errors = {}    # {小寫名稱: 錯誤訊息}
+        self.deps = {}      # {名稱: 引用到的參數}
+        self.users = {}     # {名稱: 引用它的參數} (反向圖)
+        self._value_cache = {} # {字串: (數值, 相依參數)}
+
+    def __contains__(self, name):
+        return name.lower() in self.exprs
+
+    def set(self, name, expr):
+        key = name.lower()
+        compiled = compile_expr(expr) # 先檢查語法，失敗時表格不變
+        for dep in self.deps.get(key, ()): self.users.get(dep, set()).discard(key)
+        self.exprs[key] = expr
+        self.display[key] = name
+        self.deps[key] = compiled.names
+        for dep in compiled.names: self.users.setdefault(dep, set()).add(key)
+        return self._reevaluate({key})
+
+    def remove(self, name):
+        key = name.lower()
+        if key not in self.exprs: return set()
+        for dep in self.deps.pop(key, ()): self.users.get(dep, set()).discard(key)
+        del self.exprs[key], self.display[key]
+        self.values.pop(key, None)
+        self.errors.pop(key, None)
+        return self._reevaluate(set(self.users.get(key, ())) | {key})
+
+    def update(self, params):
+        """以 {名稱: 運算式} 取代整張表，只重算有變動的部分；回傳受影響的參數"""
+        wanted = {k.lower(): (k, v) for k, v in params.items()}
+        for name, expr in wanted.values(): compile_expr(expr) # 全部通過語法檢查才修改表格
+        changed = set()
+        for key in list(self.exprs):
+            if key not in wanted: changed |= self.remove(key)
+        for key, (name, expr) in wanted.items():
+            if self.exprs.get(key) != expr or self.display.get(key) != name: changed |= self.set(name, expr)
+        return changed
+
+    def dependents(self, keys):
+        """keys 與所有 (遞移) 引用它們的參數"""
+        seen, stack = set(), list(keys)
+        while stack:
+            key = stack.pop()
+            if key in seen: continue
+            seen.add(key)
+            stack.extend(self.users.get(key, ()))
+        return seen
+
+    def order(self, keys=None):
+        """拓撲排序 (被引用者在前)；循環引用的參數放最後"""
+        keys = set(self.exprs) if keys is None else keys & set(self.exprs)
+        out, state = [], {}
+        def visit(key):
+            if state.get(key) == 2: return True
+            if state.get(key) == 1: return False # 循環
+            state[key] = 1
+            ok = all(visit(dep) for dep in self.deps.get(key, ()) if dep in keys)
+            state[key] = 2
+            if ok: out.append(key)
+            return ok
+        for key in sorted(keys): visit(key)
+        return out + sorted(keys - set(out))
+
+    def _reevaluate(self, keys):
+        affected = self.dependents(keys)
+        ordered = self.order(affected)
+        for key in ordered:
+            self.values.pop(key, None)
+            self.errors.pop(key, None)
+        for key in ordered:
+            if key not in self.exprs: continue
+            missing = [d for d in self.deps[key] if d not in self.values]
+            if missing:
+                reason = "circular reference" if any(d in affected and d in self.exprs for d in missing) else "undefined"
+                self.errors[key] = f"{reason}: {', '.join(sorted(missing))}"
+                continue
+            try: self.values[key] = compile_expr(self.exprs[key]).evaluate(self.values)
+            except ValueError as e: self.errors[key] = str(e)
+        # 只丟掉用到這些參數的元件數值快取
+        self._value_cache = {t: v for t, v in self._value_cache.items() if not (v[1] & affected)}
+        return affected
+
+    def value(self, name):
+        return self.values[name.lower()]
+
+    def evaluate(self, text):
+        """元件數值字串 -> float (可含參數)；結果快取到相依參數變動為止"""
+        hit = self._value_cache.get(text)
+        if hit is not None: return hit[0]
+        expr = compile_expr(text)
+        missing = [n for n in expr.names if n not in self.values]
+        if missing: raise ValueError(f"undefined parameter in {text!r}: {', '.join(sorted(missing))}")
+        value = expr.evaluate(self.values)
+        self._value_cache[text] = (value, expr.names)
+        return value
+
+    def as_dict(self):
+        return {self.display[k]: self.exprs[k] for k in self.order()}
+
+    def netlist_lines(self):
+        """.PARAM 行 (依相依順序)；運算式以單引號包住"""
+        lines = []
+        for key in self.order():
+            expr = self.exprs[key].strip()
+            body = _strip_quotes(expr)
+            if expr == body and not _is_number(body): expr = f"'{body}'"
+            lines.append(f".PARAM {self.display[key]}={expr}")
+        return lines
+
+def _is_number(text):
+    try: spice_number(text)
+    except ValueError: return False
+    return True
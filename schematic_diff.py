@@ -0,0 +1,303 @@
+"""
+原理圖結構化比對與三方合併 (不需要 Tk)。
+元件以 (類型, 名稱) 配對、電線以幾何 (與方向無關的線段 key) 配對，皆為雜湊索引，O(n)。
+用法:
+    python schematic_diff.py 舊.json 新.json [--no-nets] [--workers N]
+        列出新增/刪除/移動/改值的項目、設定與網路連線變化
+    python schematic_diff.py --merge 共同祖先.json 我方.json 對方.json [-o 輸出.json]
+也可當 git 的外部 diff (GIT_EXTERNAL_DIFF，7 個參數) 與 merge driver (%O %A %B -o %A)。
+合併衝突: 同一欄位兩邊改法不同時取我方；一方刪除、另一方修改的元件保留修改的一方 (不丟掉修改)。
+比對有差異 (git 外部 diff 除外) / 合併有衝突時結束碼為 1
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from circuit_utils import snap, point_key, seg_key, build_node_map
+from components import component_from_dict
+
+POSITION = ("x", "y", "rotation", "mirror")
+SETTINGS = ("global_settings", "sim_settings", "sweep_settings", "params")
+TERMINAL_FIELDS = ("terminals", "ports", "symbol") # 改變這些欄位才可能影響連線
+PARALLEL_MIN = 20000 # 物件數超過此值時，兩版的連線解析分給兩個 process
+_AUTO_NET_RE = re.compile(r"^N_\d+$")
+
+class DiffItem:
+    """
+    一筆差異。what: "comp" / "wire" / "net" / "setting"；kind: added / removed / moved / revalued (元件)、
+    added / removed (電線)、changed / renamed / added / removed / merged (網路)、changed (設定)。
+    old / new 為元件 dict、線段 ((x1, y1), (x2, y2)) 或網路名稱；point 為邏輯座標 (編輯器置中用)
+    """
+    __slots__ = ("what", "kind", "message", "point", "old", "new", "fields")
+
+    def __init__(self, what, kind, message, point=None, old=None, new=None, fields=None):
+        self.what = what
+        self.kind = kind
+        self.message = message
+        self.point = point
+        self.old = old
+        self.new = new
+        self.fields = fields or {}   # {欄位: (舊值, 新值)}
+
+def _short(value, limit=60):
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+class Conflict:
+    """三方合併衝突；結果先採用我方 (ours) 的值"""
+    __slots__ = ("key", "field", "base", "ours", "theirs")
+
+    def __init__(self, key, field, base, ours, theirs):
+        self.key = key
+        self.field = field
+        self.base = base
+        self.ours = ours
+        self.theirs = theirs
+
+    def __str__(self):
+        return f"{self.key}: {self.field} base={_short(self.base)} ours={_short(self.ours)} theirs={_short(self.theirs)}"
+
+def comp_key(item):
+    return item["type"], item["name"]
+
+def index_components(items):
+    """{(類型, 名稱[, 序號]): 元件 dict}；同類型同名的第 2 個之後加序號，仍能一一配對"""
+    index, seen = {}, Counter()
+    for item in items:
+        key = comp_key(item)
+        seen[key] += 1
+        if seen[key] > 1: key = key + (seen[key] - 1,)
+        index[key] = item
+    return index
+
+def index_wires(wires):
+    return {seg_key(w["start"], w["end"]): w for w in wires}
+
+def key_label(key):
+    return key[1] if len(key) == 2 else f"{key[1]}#{key[2]}"
+
+def field_changes(old, new):
+    """位置以外有變動的欄位 {欄位: (舊, 新)}"""
+    fields = {}
+    for f in old.keys() | new.keys():
+        if f in POSITION: continue
+        if old.get(f) != new.get(f): fields[f] = (old.get(f), new.get(f))
+    return fields
+
+def terminal_nets(data):
+    """
+    {(元件名稱, 端點名稱): 網路名稱}，與 netlist 的連線解析與命名相同。
+    腳位相對位置依 (形狀, 方向) 只建一個原型元件求出，不必逐一建立元件
+    """
+    protos, refs, terms = {}, [], []
+    for item in data["components"]:
+        shape = (item["type"], item.get("p_type"), tuple(item.get("ports", ())), item.get("symbol"),
+                 item.get("rotation", 0), item.get("mirror", False))
+        if shape not in protos:
+            comp = component_from_dict(None, dict(item, x=0, y=0), counted=False)
+            protos[shape] = [(t.name, x, y) for t, x, y in comp.get_abs_terminals()]
+        x, y = snap(item["x"]), snap(item["y"])
+        pin_name = item["name"] if item["type"] == "Pin" else ""
+        customs = item.get("terminals", [])
+        for i, (t_name, rx, ry) in enumerate(protos[shape]):
+            refs.append((item["name"], t_name))
+            terms.append(((x + rx, y + ry), pin_name, customs[i] if i < len(customs) else ""))
+    node_map = build_node_map(terms, [(w["start"], w["end"]) for w in data["wires"]])
+    return {ref: node_map[point_key(pt)] for ref, (pt, pin_name, custom) in zip(refs, terms)}
+
+def _members(of):
+    members = {}
+    for ref, net in of.items(): members.setdefault(net, set()).add(ref)
+    return members
+
+def _refs(refs, limit=8):
+    names = sorted(f"{c}.{t}" for c, t in refs)
+    more = f" (+{len(names) - limit} more)" if len(names) > limit else ""
+    return ", ".join(names[:limit]) + more
+
+def _net_label(net, members):
+    """自動命名的網路 (N_k) 在兩版之間不穩定，以其中一個腳位代稱"""
+    if not _AUTO_NET_RE.match(net) or not members: return net
+    c, t = min(members)
+    return f"{net} ({c}.{t})"
+
+def diff_nets(old_of, new_of):
+    """
+    網路依成員 (元件.端點) 配對: 每個新網路的來源是其成員在舊版中最多所屬的網路。
+    只比成員集合，自動命名的編號不同不算變化
+    """
+    old_members, new_members = _members(old_of), _members(new_of)
+    items, claimed = [], set()
+    for net in sorted(new_members):
+        members = new_members[net]
+        votes = Counter(old_of[ref] for ref in members if ref in old_of)
+        if not votes:
+            items.append(DiffItem("net", "added", f"net {_net_label(net, members)} added: {_refs(members)}", new=net))
+            continue
+        origin = votes.most_common(1)[0][0]
+        claimed.add(origin)
+        added, removed = members - old_members[origin], old_members[origin] - members
+        label = _net_label(net, members)
+        if added or removed:
+            parts = [f"+{_refs(added)}" if added else "", f"-{_refs(removed)}" if removed else ""]
+            items.append(DiffItem("net", "changed", f"net {label}: {' '.join(p for p in parts if p)}",
+                                  old=origin, new=net, fields={"added": sorted(added), "removed": sorted(removed)}))
+        elif origin != net and not (_AUTO_NET_RE.match(origin) and _AUTO_NET_RE.match(net)):
+            items.append(DiffItem("net", "renamed", f"net {origin} renamed to {net}", old=origin, new=net))
+    for net in sorted(set(old_members) - claimed):
+        members = old_members[net]
+        into = sorted({new_of[ref] for ref in members if ref in new_of})
+        if into:
+            items.append(DiffItem("net", "merged", f"net {_net_label(net, members)} merged into {', '.join(into)}", old=net))
+        else:
+            items.append(DiffItem("net", "removed", f"net {_net_label(net, members)} removed", old=net))
+    return items
+
+def diff_schematics(old, new, nets=True, workers=1):
+    """
+    get_schematic_data() 格式的兩版比對，回傳 [DiffItem] (元件、電線、設定、網路依序)。
+    沒有元件增刪/移動、電線增刪或端點欄位變動時連線必然相同，不解析網路；
+    workers > 1 且檔案夠大時兩版的網路在兩個 process 平行解析
+    """
+    items = []
+    old_comps, new_comps = index_components(old["components"]), index_components(new["components"])
+    for key, item in new_comps.items():
+        prev = old_comps.get(key)
+        label = f"{key[0]} {key_label(key)}"
+        if prev is None:
+            items.append(DiffItem("comp", "added", f"{label} added", (item["x"], item["y"]), new=item))
+            continue
+        if any(prev.get(f) != item.get(f) for f in POSITION):
+            items.append(DiffItem("comp", "moved", f"{label} moved ({prev['x']}, {prev['y']}) -> ({item['x']}, {item['y']})",
+                                  (item["x"], item["y"]), prev, item,
+                                  {f: (prev.get(f), item.get(f)) for f in POSITION if prev.get(f) != item.get(f)}))
+        fields = field_changes(prev, item)
+        if fields:
+            desc = ", ".join(f"{f}: {a!r} -> {b!r}" for f, (a, b) in sorted(fields.items()))
+            items.append(DiffItem("comp", "revalued", f"{label} {desc}", (item["x"], item["y"]), prev, item, fields))
+    for key, item in old_comps.items():
+        if key not in new_comps:
+            items.append(DiffItem("comp", "removed", f"{key[0]} {key_label(key)} removed", (item["x"], item["y"]), old=item))
+
+    old_wires, new_wires = index_wires(old["wires"]), index_wires(new["wires"])
+    for key in new_wires.keys() - old_wires.keys():
+        items.append(DiffItem("wire", "added", f"wire {key[0]} - {key[1]} added", key[0], new=key))
+    for key in old_wires.keys() - new_wires.keys():
+        items.append(DiffItem("wire", "removed", f"wire {key[0]} - {key[1]} removed", key[0], old=key))
+
+    for section in SETTINGS:
+        a, b = old.get(section, {}), new.get(section, {})
+        for f in sorted(a.keys() | b.keys()):
+            if a.get(f) != b.get(f):
+                items.append(DiffItem("setting", "changed", f"{section}.{f}: {a.get(f)!r} -> {b.get(f)!r}",
+                                      old=a.get(f), new=b.get(f)))
+    if nets and any(i.what == "wire" or (i.what == "comp" and i.kind != "revalued")
+                    or any(f in i.fields for f in TERMINAL_FIELDS) for i in items):
+        if workers > 1 and len(old["components"]) + len(old["wires"]) > PARALLEL_MIN:
+            with ProcessPoolExecutor(max_workers=2) as pool: old_of, new_of = pool.map(terminal_nets, (old, new))
+        else:
+            old_of, new_of = terminal_nets(old), terminal_nets(new)
+        items.extend(diff_nets(old_of, new_of))
+    return items
+
+# --- 三方合併 ---
+
+_MISSING = object() # 鍵不存在 (與值為 None 區分)
+
+def _merge_value(key, field, base, ours, theirs, conflicts):
+    if ours == theirs or theirs == base: return ours
+    if ours == base: return theirs
+    conflicts.append(Conflict(key, field, *(None if v is _MISSING else v for v in (base, ours, theirs))))
+    return ours
+
+def merge_dicts(key, base, ours, theirs, conflicts):
+    """逐鍵三方合併 (值整體比較)；一方刪除、另一方未修改的鍵即刪除"""
+    out = {}
+    for f in list(ours) + [f for f in theirs if f not in ours]:
+        v = _merge_value(key, f, base.get(f, _MISSING), ours.get(f, _MISSING), theirs.get(f, _MISSING), conflicts)
+        if v is not _MISSING: out[f] = v
+    return out
+
+def merge_component(key, base, ours, theirs, conflicts):
+    """位置 (x, y, rotation, mirror) 視為一個欄位，避免合出兩邊都沒有的座標；其餘逐欄合併"""
+    pos = lambda d: tuple(d.get(f) for f in POSITION)
+    out = merge_dicts(key, {f: v for f, v in base.items() if f not in POSITION},
+                      {f: v for f, v in ours.items() if f not in POSITION},
+                      {f: v for f, v in theirs.items() if f not in POSITION}, conflicts)
+    out.update(zip(POSITION, _merge_value(key, "position", pos(base), pos(ours), pos(theirs), conflicts)))
+    return {f: out[f] for f in list(ours) + [f for f in out if f not in ours] if f in out} # 維持我方的欄位順序
+
+def merge_schematics(base, ours, theirs):
+    """
+    三方合併，回傳 (合併結果, [Conflict])。元件順序依我方，對方新增的接在後面；
+    電線為集合合併: 祖先已有的線兩邊都保留才保留，新增的線任一邊有就保留。
+    衝突時欄位取我方的值；一方刪除、另一方修改的元件則保留修改後的版本 (刪除可再手動重做，修改遺失則無從找回)
+    """
+    conflicts = []
+    b_comps, o_comps, t_comps = (index_components(d["components"]) for d in (base, ours, theirs))
+    comps = []
+    for key in list(o_comps) + [k for k in t_comps if k not in o_comps]:
+        b, o, t = b_comps.get(key), o_comps.get(key), t_comps.get(key)
+        label = f"{key[0]} {key_label(key)}"
+        if o is None:   # 我方刪除或對方新增
+            if b is None: comps.append(t)
+            elif t != b:
+                conflicts.append(Conflict(label, "deleted by ours, modified by theirs", b, None, t))
+                comps.append(t)
+        elif t is None:
+            if b is None: comps.append(o)
+            elif o != b:
+                conflicts.append(Conflict(label, "modified by ours, deleted by theirs", b, o, None))
+                comps.append(o)
+        else:
+            comps.append(merge_component(label, b or {}, o, t, conflicts) if o != t else o)
+
+    b_wires, o_wires, t_wires = (index_wires(d["wires"]) for d in (base, ours, theirs))
+    wires = [w for k, w in o_wires.items() if k in t_wires or k not in b_wires]
+    wires += [w for k, w in t_wires.items() if k not in o_wires and k not in b_wires]
+
+    merged = {section: merge_dicts(section, base.get(section, {}), ours.get(section, {}), theirs.get(section, {}), conflicts)
+              for section in SETTINGS if section in ours or section in theirs}
+    merged["components"] = comps
+    merged["wires"] = wires
+    return merged, conflicts
+
+# --- CLI ---
+
+def _load(path):
+    if path == os.devnull: return {"components": [], "wires": []} # git: 新增/刪除的檔案
+    with open(path) as f: return json.load(f)
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog=os.path.basename(argv[0]), description=__doc__.strip().splitlines()[0])
+    parser.add_argument("files", nargs="+", help="old new | base ours theirs (--merge) | git's 7 external-diff arguments")
+    parser.add_argument("--merge", action="store_true", help="three-way merge")
+    parser.add_argument("-o", dest="out_path", help="merge output (default: stdout)")
+    parser.add_argument("--no-nets", action="store_true", help="skip net connectivity changes")
+    parser.add_argument("--workers", type=int, default=0, help="processes for large files (default: up to 2)")
+    opts = parser.parse_args(argv[1:])
+    args, merge, out_path = opts.files, opts.merge, opts.out_path
+    if opts.workers < 0: parser.error("--workers must be >= 0")
+    workers = opts.workers or min(2, os.cpu_count() or 1)
+    git_diff = len(args) == 7 and not merge
+    if git_diff: args = [args[1], args[4]] # git 外部 diff: path old-file old-hex old-mode new-file ...
+    if len(args) != (3 if merge else 2):
+        parser.error("--merge needs base ours theirs" if merge else "expected old.json new.json")
+
+    if merge:
+        merged, conflicts = merge_schematics(*(_load(p) for p in args))
+        if out_path:
+            with open(out_path, "w") as f: json.dump(merged, f, indent=4)
+        else:
+            json.dump(merged, sys.stdout, indent=4)
+        for c in conflicts: print(f"CONFLICT {c}", file=sys.stderr)
+        return 1 if conflicts else 0
+    items = diff_schematics(_load(args[0]), _load(args[1]), nets=not opts.no_nets, workers=workers)
+    for item in items: print(f"{item.kind.upper():9} {item.message}")
+    return 1 if items and not git_diff else 0 # git 把非 0 視為 diff 程式失敗
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,188 @@
+"""
+原理圖匯出 (不需要 Tk 顯示): 由存檔 JSON 依元件幾何直接輸出 SVG，PDF/PNG 再經 cairosvg 轉換。
+用法: python schematic_export.py 檔案或資料夾... [-o 輸出資料夾] [--format svg|pdf|png] [--workers N]
+資料夾會匯出其中所有 .json；多個檔案以 process pool 平行處理
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape, quoteattr
+from components import component_from_dict
+
+FORMATS = ("svg", "pdf", "png")
+MARGIN = 40
+TK_COLORS = {"": "none", "gray30": "#4d4d4d"} # 其餘 Tk 色名 SVG 也認得
+
+def _color(c):
+    return TK_COLORS.get(c, c)
+
+class SvgCanvas:
+    """
+    記錄用 canvas: 元件的 create_* 呼叫直接轉成 SVG 元素寫出 (不保留 item)，
+    同時累計範圍供最後的 viewBox 使用
+    """
+
+    def __init__(self, out):
+        self.out = out
+        self.bounds = [float("inf"), float("inf"), float("-inf"), float("-inf")]
+        self.count = 0
+
+    def _extend(self, coords):
+        b = self.bounds
+        for x, y in zip(coords[0::2], coords[1::2]):
+            if x < b[0]: b[0] = x
+            if y < b[1]: b[1] = y
+            if x > b[2]: b[2] = x
+            if y > b[3]: b[3] = y
+
+    @staticmethod
+    def _stroke(outline, width, dash):
+        if not outline: return ' stroke="none"'
+        s = f' stroke={quoteattr(_color(outline))} stroke-width="{width:g}"'
+        if dash: s += f' stroke-dasharray="{" ".join(str(d) for d in dash)}"'
+        return s
+
+    def _write(self, text):
+        self.out.write(text)
+        self.count += 1
+
+    def create_line(self, *coords, fill="black", width=1, dash=None, **kw):
+        if len(coords) == 1: coords = coords[0]
+        self._extend(coords)
+        pts = " ".join(f"{x:g},{y:g}" for x, y in zip(coords[0::2], coords[1::2]))
+        self._write(f'<polyline points="{pts}" fill="none"{self._stroke(fill, width, dash)}/>\n')
+
+    def create_rectangle(self, x1, y1, x2, y2, fill="", outline="black", width=1, dash=None, **kw):
+        self._extend((x1, y1, x2, y2))
+        x, y = min(x1, x2), min(y1, y2)
+        self._write(f'<rect x="{x:g}" y="{y:g}" width="{abs(x2 - x1):g}" height="{abs(y2 - y1):g}" '
+                    f'fill={quoteattr(_color(fill))}{self._stroke(outline, width, dash)}/>\n')
+
+    def create_oval(self, x1, y1, x2, y2, fill="", outline="black", width=1, dash=None, **kw):
+        self._extend((x1, y1, x2, y2))
+        self._write(f'<ellipse cx="{(x1 + x2) / 2:g}" cy="{(y1 + y2) / 2:g}" rx="{abs(x2 - x1) / 2:g}" ry="{abs(y2 - y1) / 2:g}" '
+                    f'fill={quoteattr(_color(fill))}{self._stroke(outline, width, dash)}/>\n')
+
+    def create_polygon(self, *coords, fill="black", outline="", width=1, **kw):
+        if len(coords) == 1: coords = coords[0]
+        self._extend(coords)
+        pts = " ".join(f"{x:g},{y:g}" for x, y in zip(coords[0::2], coords[1::2]))
+        self._write(f'<polygon points="{pts}" fill={quoteattr(_color(fill))}{self._stroke(outline, width, None)}/>\n')
+
+    def create_text(self, x, y, text="", fill="black", font=("Arial", 8), anchor="center", **kw):
+        """Tk 文字: 多行置中排列；字型大小為點數，換算成像素"""
+        lines = str(text).split("\n")
+        size = font[1] * 4 / 3
+        lh = size * 1.2
+        h = lh * len(lines)
+        if anchor == "center": anchor = "" # 其餘為 n/s/e/w 組合
+        cy = y + h / 2 if "n" in anchor else y - h / 2 if "s" in anchor else y
+        align = "start" if "w" in anchor else "end" if "e" in anchor else "middle"
+        weight = ' font-weight="bold"' if "bold" in font[2:] else ""
+        self._extend((x - size, cy - h / 2, x + size, cy + h / 2))
+        spans = "".join(f'<tspan x="{x:g}" y="{cy - h / 2 + lh * (i + 0.5):g}">{escape(line)}</tspan>'
+                        for i, line in enumerate(lines))
+        self._write(f'<text font-family={quoteattr(font[0])} font-size="{size:g}"{weight} fill={quoteattr(_color(fill))} '
+                    f'text-anchor="{align}" dominant-baseline="central">{spans}</text>\n')
+
+    # 元件繪圖會呼叫的其他 canvas 方法
+    def delete(self, *args): pass
+    def tag_raise(self, *args): pass
+
+def render_svg(data, path):
+    """
+    逐一建立元件並畫到 SvgCanvas (畫完即丟)，內容先串流到暫存檔，
+    範圍算完後再補上 <svg> 標頭；輸出不會在記憶體中累積
+    """
+    with tempfile.TemporaryFile("w+") as body:
+        canvas = SvgCanvas(body)
+        for item in data["components"]:
+            comp = component_from_dict(canvas, item, counted=False)
+            comp.draw(1.0, 0, 0)
+        for w in data["wires"]: # 與編輯器相同: 電線畫在元件之上
+            canvas.create_line(*w["start"], *w["end"], fill="blue", width=2)
+        x1, y1, x2, y2 = canvas.bounds
+        if x1 > x2: x1 = y1 = x2 = y2 = 0.0 # 空白頁
+        x1, y1, w, h = x1 - MARGIN, y1 - MARGIN, x2 - x1 + 2 * MARGIN, y2 - y1 + 2 * MARGIN
+        body.seek(0)
+        with open(path, "w") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{w:g}" height="{h:g}" viewBox="{x1:g} {y1:g} {w:g} {h:g}">\n')
+            f.write(f'<rect x="{x1:g}" y="{y1:g}" width="{w:g}" height="{h:g}" fill="white"/>\n')
+            shutil.copyfileobj(body, f)
+            f.write("</svg>\n")
+    return canvas.count
+
+def export_data(data, path, fmt=None):
+    """依副檔名 (或 fmt) 輸出 SVG / PDF / PNG；PDF/PNG 需要 cairosvg"""
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".")).lower()
+    if fmt not in FORMATS: raise ValueError(f"unsupported format: {fmt}")
+    if fmt == "svg": return render_svg(data, path)
+    try:
+        import cairosvg
+    except ImportError:
+        raise RuntimeError("PDF/PNG export needs cairosvg (pip install cairosvg)")
+    tmp = path + ".svg.tmp"
+    try:
+        count = render_svg(data, tmp)
+        convert = cairosvg.svg2pdf if fmt == "pdf" else cairosvg.svg2png
+        convert(url=tmp, write_to=path)
+    finally:
+        if os.path.exists(tmp): os.remove(tmp)
+    return count
+
+def export_file(src, out_path, fmt=None):
+    with open(src) as f: data = json.load(f)
+    return export_data(data, out_path, fmt)
+
+def _export_one(job):
+    src, out_path, fmt = job
+    try: return src, out_path, export_file(src, out_path, fmt), None
+    except Exception as e: # 一個壞檔不應中斷整批 (也避免例外在 worker process 內無法 pickle)
+        return src, out_path, 0, f"{type(e).__name__}: {e}"
+
+def collect_inputs(paths):
+    """檔案照列；資料夾展開成其中的 .json (依名稱排序)"""
+    out = []
+    for p in paths:
+        if os.path.isdir(p):
+            out.extend(os.path.join(p, n) for n in sorted(os.listdir(p)) if n.lower().endswith(".json"))
+        else:
+            out.append(p)
+    return out
+
+def export_many(paths, out_dir=None, fmt="svg", workers=None):
+    """批次匯出，回傳 [(來源, 輸出, 元素數, 錯誤訊息或 None)]"""
+    jobs = []
+    for src in collect_inputs(paths):
+        stem = os.path.splitext(os.path.basename(src))[0]
+        jobs.append((src, os.path.join(out_dir or os.path.dirname(src), f"{stem}.{fmt}"), fmt))
+    if out_dir: os.makedirs(out_dir, exist_ok=True)
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    if workers <= 1: return [_export_one(j) for j in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_export_one, jobs))
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog=os.path.basename(argv[0]), description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="schematic .json files or folders")
+    parser.add_argument("-o", dest="out_dir", help="output folder (default: next to each input)")
+    parser.add_argument("--format", default="svg", type=str.lower, choices=FORMATS)
+    parser.add_argument("--workers", type=int, default=0, help="process count (default: one per CPU)")
+    opts = parser.parse_args(argv[1:])
+    if opts.workers < 0: parser.error("--workers must be >= 0")
+    failed = 0
+    for src, out_path, count, error in export_many(opts.paths, opts.out_dir, opts.format, opts.workers or None):
+        if error:
+            failed += 1
+            print(f"FAILED {src}: {error}")
+        else:
+            print(f"{src} -> {out_path} ({count} items)")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,44 @@
+import json
+import os
+import uuid
+
+SESSION_DIR = os.path.join(os.path.expanduser("~"), ".circuit_cad", "session")
+INDEX = "session.json"
+
+def read_json(path):
+    """原理圖檔解析 (在背景 thread 執行)"""
+    with open(path) as f: return json.load(f)
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f: json.dump(data, f)
+    os.replace(tmp, path)
+
+def save_session(tabs, active, root=SESSION_DIR):
+    """
+    tabs: [{"kind": "schematic"/"waveform", "name", ...}]。原理圖的 "data" 各自寫成一個檔案
+    (還原時可平行解析)，尚未載入完成的分頁以 "file" 指向原檔。
+    索引最後才寫入；未被新索引引用的舊分頁檔才刪除
+    """
+    os.makedirs(root, exist_ok=True)
+    entries, keep = [], {INDEX}
+    for tab in tabs:
+        entry = {k: v for k, v in tab.items() if k != "data"}
+        if "data" in tab:
+            name = f"tab_{uuid.uuid4().hex[:12]}.json" # 不覆寫可能仍被引用的舊檔
+            _write_json(os.path.join(root, name), tab["data"])
+            entry["file"] = name
+        if "file" in entry: keep.add(os.path.basename(entry["file"]))
+        entries.append(entry)
+    _write_json(os.path.join(root, INDEX), {"active": active, "tabs": entries})
+    for name in os.listdir(root):
+        if name.startswith("tab_") and name not in keep: os.remove(os.path.join(root, name))
+
+def load_session(root=SESSION_DIR):
+    """回傳 (目前分頁 index, 分頁列表)，"file" 轉成完整路徑；沒有或損壞時回傳 None"""
+    try: index = read_json(os.path.join(root, INDEX))
+    except (OSError, ValueError): return None
+    tabs = index.get("tabs", [])
+    for tab in tabs:
+        if "file" in tab: tab["file"] = os.path.join(root, tab["file"])
+    return index.get("active", 0), tabs
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".circuit_cad", "cache")
+MANIFEST = "manifest.json"
+
+def _canonical_line(raw):
+    """
+    去除 $ / ; 行內註解、壓縮空白並轉大寫；引號內 (.LIB / .INCLUDE 的路徑) 原樣保留。
+    回傳 (整理後的行, [引號內字串])
+    """
+    out, quoted, quote, buf = [], [], None, []
+    for ch in raw:
+        if quote:
+            if ch == quote:
+                quoted.append("".join(buf))
+                out.append(quote + "".join(buf) + quote)
+                quote, buf = None, []
+            else:
+                buf.append(ch)
+        elif ch in "'\"":
+            quote = ch
+        elif ch in "$;":
+            break
+        else:
+            out.append(ch.upper())
+    if quote: out.append(quote + "".join(buf)) # 引號沒有關上
+    return " ".join("".join(out).split()), quoted
+
+def canonical_netlist(text):
+    """
+    去除註解 (* 開頭行、$ / ; 行內註解)、空行與多餘空白，接回 + 續行並轉成大寫
+    (引號內的檔案路徑不轉，大小寫有別的檔案系統上才不會混淆)。
+    平移、改分頁名稱等不影響電路的操作得到相同結果
+    """
+    lines = []
+    for raw in text.splitlines():
+        line = _canonical_line(raw)[0]
+        if not line or line.startswith("*"): continue
+        if line.startswith("+") and lines: lines[-1] += " " + line[1:].strip()
+        else: lines.append(line)
+    return "\n".join(lines)
+
+def referenced_files(text):
+    """deck 直接引用的檔案: .LIB 'path' section 與 .INCLUDE / .INC 'path' (不展開巢狀引用)"""
+    paths = []
+    for raw in text.splitlines():
+        line, quoted = _canonical_line(raw)
+        words = line.split()
+        if not words: continue
+        if words[0] == ".LIB" and len(words) >= 3 or words[0] in (".INCLUDE", ".INC") and len(words) >= 2:
+            paths.append(quoted[0] if quoted else raw.split()[1])
+    return paths
+
+def file_stamp(path, base_dir=None):
+    """路徑|大小|修改時間；找不到的檔案也給固定字串，檔案出現後 key 即改變"""
+    full = os.path.join(base_dir, path) if base_dir and not os.path.isabs(path) else path
+    try: st = os.stat(full)
+    except OSError: return f"{path}|missing"
+    return f"{path}|{st.st_size}|{st.st_mtime_ns}"
+
+def netlist_key(text, options="", base_dir=None):
+    """
+    內容位址: canonical netlist + 模擬器選項 (指令樣板) + 引用的 .LIB / .INCLUDE 檔案
+    大小與修改時間的 SHA-256；相對路徑以 base_dir (deck 所在目錄) 為準
+    """
+    h = hashlib.sha256(canonical_netlist(text).encode())
+    h.update(b"\0" + options.encode())
+    for path in referenced_files(text):
+        h.update(b"\0" + file_stamp(path, base_dir).encode())
+    return h.hexdigest()
+
+class ResultCache:
+    """
+    模擬結果的磁碟快取: <root>/<key[:2]>/<key>/ 存放輸出檔與 manifest。
+    manifest 的 mtime 即最近使用時間，超過 max_bytes 時從最舊的項目開始刪除
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=500 * 2**20):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def entry_dir(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key):
+        """命中時回傳 manifest {"stem", "files", "size"} 並更新使用時間"""
+        path = os.path.join(self.entry_dir(key), MANIFEST)
+        try:
+            with open(path) as f: manifest = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return manifest
+
+    def restore(self, key, workdir, stem):
+        """把快取的輸出複製到 workdir，檔名換成這次 deck 的名稱"""
+        manifest = self.get(key)
+        if manifest is None: return None
+        src = self.entry_dir(key)
+        out = []
+        for name in manifest["files"]:
+            target = stem + name[len(manifest["stem"]):]
+            shutil.copy2(os.path.join(src, name), os.path.join(workdir, target))
+            out.append(target)
+        return out
+
+    def put(self, key, workdir, deck_name):
+        """
+        收錄以 deck 名稱為主檔名的輸出 ({out}.lis, {out}.tr0, {out}.csv ...)；
+        掃描的多個 deck 共用工作目錄時彼此不會混入。
+        先寫暫存目錄再整個換名，避免留下半套項目
+        """
+        stem = os.path.splitext(deck_name)[0]
+        files = [n for n in sorted(os.listdir(workdir))
+                 if n != deck_name and n.startswith(stem + ".") and os.path.isfile(os.path.join(workdir, n))]
+        os.makedirs(self.root, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=self.root, prefix=".tmp_")
+        size = 0
+        for name in files:
+            shutil.copy2(os.path.join(workdir, name), os.path.join(tmp, name))
+            size += os.path.getsize(os.path.join(tmp, name))
+        with open(os.path.join(tmp, MANIFEST), "w") as f:
+            json.dump({"stem": stem, "files": files, "size": size, "created": time.time()}, f)
+        dest = self.entry_dir(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        try:
+            os.replace(tmp, dest)
+        except OSError: # 另一個工作已收錄同一內容
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+
+    def entries(self):
+        """[(最近使用時間, 大小, 目錄)]"""
+        out = []
+        if not os.path.isdir(self.root): return out
+        for prefix in os.listdir(self.root):
+            pdir = os.path.join(self.root, prefix)
+            if prefix.startswith(".") or not os.path.isdir(pdir): continue
+            for key in os.listdir(pdir):
+                path = os.path.join(pdir, key, MANIFEST)
+                try:
+                    with open(path) as f: size = json.load(f)["size"]
+                    out.append((os.path.getmtime(path), size, os.path.join(pdir, key)))
+                except (OSError, ValueError, KeyError):
+                    continue
+        return out
+
+    def evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes: break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
@@ -0,0 +1,199 @@
+import itertools
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sim_cache import ResultCache, netlist_key
+
+RUNS_DIR = os.path.join(tempfile.gettempdir(), "circuit_cad_runs")
+STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sim_stub.py")
+
+class SimJob:
+    """一次模擬: deck 檔 + 工作目錄 + 指令 (argv list)；log 由 worker thread 逐行附加"""
+
+    def __init__(self, job_id, name, deck_path, workdir, command):
+        self.id = job_id
+        self.name = name
+        self.deck_path = deck_path
+        self.workdir = workdir
+        self.command = command
+        self.status = "queued"   # queued / running / done / failed / cancelled / cached
+        self.key = None          # 結果快取的 key (netlist 內容 + 指令樣板)
+        self.returncode = None
+        self.log = []
+        self.started = None
+        self.finished = None
+        self.proc = None
+        self.future = None
+        self.cancel_requested = False
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def elapsed(self):
+        if self.started is None: return 0.0
+        return (self.finished or time.time()) - self.started
+
+def split_template(template, posix=None):
+    """指令樣板切成參數；Windows 依 cmd 的慣例 (反斜線不是跳脫字元，只認雙引號)"""
+    posix = os.name != "nt" if posix is None else posix
+    if posix: return shlex.split(template)
+    out = []
+    for token in shlex.split(template, posix=False):
+        if len(token) >= 2 and token[0] == token[-1] == '"': token = token[1:-1]
+        out.append(token)
+    return out
+
+def format_command(template, deck_path, workdir, posix=None):
+    """
+    {deck} / {out} / {dir} 代入指令樣板 (例如 'hspice -i {deck} -o {out}')，回傳 argv list；
+    {stub} 為內附的測試用模擬器 sim_stub.py。
+    樣板先切成參數再代入路徑，路徑含空白、反斜線時不需要 (也不會被加上) 引號
+    """
+    out = os.path.join(workdir, os.path.splitext(os.path.basename(deck_path))[0])
+    values = {"deck": deck_path, "out": out, "dir": workdir, "stub": f"{sys.executable} {STUB}"}
+    argv = []
+    for token in split_template(template, posix):
+        if token == "{stub}": argv.extend([sys.executable, STUB])
+        else: argv.append(token.format(**values))
+    return argv
+
+def command_text(argv):
+    """顯示用 (log) 的指令列"""
+    return subprocess.list2cmdline(argv) if os.name == "nt" else shlex.join(argv)
+
+class SimJobRunner:
+    """
+    以 thread pool 啟動模擬器子行程，不阻塞 Tk 主迴圈。
+    每個 thread 只負責等待一個子行程並轉送輸出；並行數即 pool 大小。
+    工作狀態與 log 只由 worker 寫入，UI 端以 after() 定期讀取
+    """
+
+    def __init__(self, max_workers=2, cache=None):
+        self.jobs = {}
+        self.cache = cache
+        self._ids = itertools.count(1)
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._running = 0 # 新舊 pool 合計執行中的數量
+        self._slots = threading.Condition()
+
+    def set_max_workers(self, n):
+        """
+        變更並行上限。還在排隊的工作從舊 pool 取消、依送出順序改排到新 pool，
+        舊 pool 只留下執行中的工作 (跑完即結束)；調小上限時新 pool 的工作會在 _run 等到
+        舊工作結束、總執行數低於上限才啟動
+        """
+        n = max(1, int(n))
+        if n == self.max_workers: return
+        old = self._pool
+        self.max_workers = n
+        self._pool = ThreadPoolExecutor(max_workers=n)
+        for job_id in sorted(self.jobs):
+            job = self.jobs[job_id]
+            if job.status == "queued" and job.future is not None and job.future.cancel():
+                job.future = self._pool.submit(self._run, job)
+        old.shutdown(wait=False)
+        with self._slots: self._slots.notify_all()
+
+    def new_workdir(self, name):
+        os.makedirs(RUNS_DIR, exist_ok=True)
+        return tempfile.mkdtemp(prefix=f"{name}_", dir=RUNS_DIR)
+
+    def submit(self, deck_path, command_template, name=None, workdir=None):
+        job_id = next(self._ids)
+        name = name or os.path.splitext(os.path.basename(deck_path))[0]
+        workdir = workdir or os.path.dirname(os.path.abspath(deck_path))
+        job = SimJob(job_id, name, deck_path, workdir, format_command(command_template, deck_path, workdir))
+        self.jobs[job_id] = job
+        if self.cache is not None:
+            with open(deck_path) as f: job.key = netlist_key(f.read(), command_template, workdir)
+            stem = os.path.splitext(os.path.basename(deck_path))[0]
+            files = self.cache.restore(job.key, workdir, stem)
+            if files is not None:
+                job.started = time.time()
+                job.log.append(f"[cache] {job.key[:12]}: restored {', '.join(files) or 'no files'}\n")
+                self._finish(job, "cached")
+                return job
+        job.future = self._pool.submit(self._run, job)
+        return job
+
+    def submit_text(self, netlist_text, command_template, name):
+        """把 netlist 寫進新的工作目錄後送出"""
+        workdir = self.new_workdir(name)
+        deck_path = os.path.join(workdir, f"{name}.sp")
+        with open(deck_path, "w") as f: f.write(netlist_text)
+        return self.submit(deck_path, command_template, name, workdir)
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or not job.active: return
+        job.cancel_requested = True
+        if job.future is not None and job.future.cancel():
+            self._finish(job, "cancelled")
+        elif job.proc is not None and job.proc.poll() is None:
+            job.proc.terminate()
+        else:
+            with self._slots: self._slots.notify_all() # 叫醒在 _run 等名額的工作
+
+    def cancel_all(self):
+        for job_id in list(self.jobs): self.cancel(job_id)
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished = time.time()
+
+    def _run(self, job):
+        with self._slots:
+            while self._running >= self.max_workers and not job.cancel_requested: self._slots.wait()
+            if job.cancel_requested:
+                self._finish(job, "cancelled")
+                return
+            self._running += 1
+        try: self._execute(job)
+        finally:
+            with self._slots:
+                self._running -= 1
+                self._slots.notify()
+
+    def _execute(self, job):
+        job.status = "running"
+        job.started = time.time()
+        job.log.append(f"$ {command_text(job.command)}\n")
+        try:
+            job.proc = subprocess.Popen(job.command, cwd=job.workdir,
+                                        stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                        text=True, errors="replace", bufsize=1)
+        except OSError as e:
+            job.log.append(f"[ERROR] {e}\n")
+            self._finish(job, "failed")
+            return
+        if job.cancel_requested: job.proc.terminate() # 啟動途中被取消
+        for line in job.proc.stdout:
+            job.log.append(line)
+        job.returncode = job.proc.wait()
+        if job.cancel_requested:
+            self._finish(job, "cancelled")
+        elif job.returncode != 0:
+            self._finish(job, "failed")
+        else:
+            if job.key is not None:
+                try: self.cache.put(job.key, job.workdir, os.path.basename(job.deck_path))
+                except OSError as e: job.log.append(f"[cache] not stored: {e}\n")
+            self._finish(job, "done")
+
+    def has_active(self):
+        return any(job.active for job in self.jobs.values())
+
+_default_runner = None
+
+def default_runner():
+    """所有分頁共用同一個 runner (並行上限是整個程式的)"""
+    global _default_runner
+    if _default_runner is None: _default_runner = SimJobRunner(cache=ResultCache())
+    return _default_runner
@@ -0,0 +1,56 @@
+"""
+測試用的假模擬器: 讀入 netlist，依 .TRAN 產生每個節點的正弦波形並輸出 CSV。
+用法: python sim_stub.py deck.sp out_base [--delay 秒] [--points N] [--wfm]
+--points 覆寫點數 (測試大型波形)；--wfm 改輸出原始二進位格式 out_base.wfm
+(Config 中的模擬器指令可填 "{stub} {deck} {out}")
+"""
+import math
+import re
+import sys
+import time
+
+SUFFIX = {"f": 1e-15, "p": 1e-12, "n": 1e-9, "u": 1e-6, "m": 1e-3, "k": 1e3, "meg": 1e6, "g": 1e9, "t": 1e12}
+
+def value(text):
+    m = re.match(r"([-+]?[\d.]+(?:e[-+]?\d+)?)(meg|[fpnumkgt])?", text.lower())
+    if not m: raise ValueError(text)
+    return float(m.group(1)) * SUFFIX.get(m.group(2), 1.0)
+
+def main(argv):
+    deck, out = argv[1], argv[2]
+    delay = float(argv[argv.index("--delay") + 1]) if "--delay" in argv else 0.05
+    points = int(argv[argv.index("--points") + 1]) if "--points" in argv else None
+    nodes, step, stop = [], 1e-9, 100e-9
+    with open(deck) as f:
+        for line in f:
+            tokens = line.split()
+            if not tokens or tokens[0].startswith("*"): continue
+            if tokens[0].upper() == ".TRAN" and len(tokens) >= 3:
+                step, stop = value(tokens[1]), value(tokens[2])
+            elif not tokens[0].startswith(".") and len(tokens) >= 3:
+                for node in tokens[1:3]:
+                    if node != "0" and node not in nodes: nodes.append(node)
+    print(f"stub: {len(nodes)} node(s), tran {step:g} {stop:g}", flush=True)
+    n = points or min(int(stop / step), 100000) + 1
+    if "--wfm" in argv:
+        import numpy as np
+        from waveform_io import write_wfm
+        t = np.linspace(0, stop, n)
+        columns = [t] + [np.sin(2 * np.pi * t / stop * (k + 1)) for k in range(len(nodes))]
+        write_wfm(out + ".wfm", ["time"] + [f"v({node})" for node in nodes], columns)
+        print(f"stub: wrote {out}.wfm ({n} points)", flush=True)
+        return 0
+    with open(out + ".csv", "w") as f:
+        f.write(",".join(["time"] + [f"v({node})" for node in nodes]) + "\n")
+        for i in range(n):
+            t = i * step
+            row = [math.sin(2 * math.pi * t / stop * (k + 1)) for k in range(len(nodes))]
+            f.write(",".join(f"{v:.6g}" for v in [t] + row) + "\n")
+            if i % max(n // 10, 1) == 0:
+                print(f"stub: t={t:g} ({100 * i // n}%)", flush=True)
+                time.sleep(delay)
+    print(f"stub: wrote {out}.csv", flush=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
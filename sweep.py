@@ -0,0 +1,120 @@
+import itertools
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from circuit_utils import netlist_header, sim_lines
+
+def parse_supplies(text):
+    """
+    'VDD=1.62,1.8,1.98 VBIAS=0.6' -> {"VDD": ["1.62", "1.8", "1.98"], "VBIAS": ["0.6"]}
+    (SPICE 名稱不分大小寫: 重複指定同一電源時後者取代前者)
+    """
+    supplies, spelled = {}, {}
+    for token in text.split():
+        if "=" not in token: continue
+        name, values = token.split("=", 1)
+        vals = [v for v in values.split(",") if v]
+        if name and vals: supplies[spelled.setdefault(name.lower(), name)] = vals
+    return supplies
+
+def expand_sweep(spec, settings):
+    """
+    corner x temp x 各電源電壓的笛卡兒積。
+    spec: {"corners": "TT FF SS", "temps": "-40 25 125", "supplies": "VDD=1.62,1.8"}
+    未填的維度沿用全域設定。回傳 [{"name", "corner", "temp", "supplies"}]
+    """
+    corners = spec.get("corners", "").split() or [settings["corner"]]
+    temps = spec.get("temps", "").split() or [settings["temp"]]
+    supplies = parse_supplies(spec.get("supplies", ""))
+    names = list(supplies)
+    variants = []
+    for corner, temp, volts in itertools.product(corners, temps, itertools.product(*supplies.values())):
+        values = dict(zip(names, volts))
+        label = "_".join([corner] + [f"{temp}C"] * bool(temp) + [f"{n}{v}" for n, v in values.items()])
+        variants.append({"name": re.sub(r"[^\w.\-]+", "_", label), "corner": corner, "temp": temp, "supplies": values})
+    return variants
+
+def supply_line(line, value):
+    """把電源元件行改成 DC value (保留名稱與兩個節點)"""
+    tokens = line.split()
+    return f"{tokens[0]} {tokens[1]} {tokens[2]} DC {value}"
+
+def top_level_elements(circuit):
+    """(行號, 元件名稱)，只列主電路的元件行 (.SUBCKT ... .ENDS 內同名的元件不算)"""
+    depth = 0
+    for i, line in enumerate(circuit):
+        word = line.split(None, 1)[0].upper() if line.strip() else ""
+        if word == ".SUBCKT": depth += 1
+        elif word == ".ENDS": depth = max(depth - 1, 0)
+        elif depth == 0 and word and not word.startswith(("*", ".")): yield i, line.split(None, 1)[0]
+
+def apply_supplies(circuit, supplies):
+    """電源名稱與元件名稱不分大小寫比對"""
+    if not supplies: return circuit
+    wanted = {name.lower(): value for name, value in supplies.items()}
+    out = list(circuit)
+    for i, name in top_level_elements(circuit):
+        if name.lower() in wanted: out[i] = supply_line(circuit[i], wanted[name.lower()])
+    return out
+
+def variant_settings(settings, variant):
+    merged = dict(settings)
+    merged["corner"] = variant["corner"]
+    merged["temp"] = variant["temp"]
+    return merged
+
+def render_variant(settings, sim_settings, circuit, variant):
+    lines = netlist_header(variant_settings(settings, variant))
+    lines.insert(1, f"* Sweep variant: {variant['name']}")
+    lines.extend(apply_supplies(circuit, variant["supplies"]))
+    lines.extend(sim_lines(sim_settings))
+    return "\n".join(lines)
+
+def render_alter_deck(settings, sim_settings, circuit, variants):
+    """
+    單一 netlist: 第一個變體為主電路，其餘各自一個 .ALTER 區塊
+    (.ALTER 中重新指定 .LIB 段落、.TEMP 與電源元件行)
+    """
+    first = variants[0]
+    lines = netlist_header(variant_settings(settings, first))
+    lines.extend(apply_supplies(circuit, first["supplies"]))
+    tail = sim_lines(sim_settings)
+    lines.extend(tail[:-1]) # .END 放在所有 .ALTER 之後
+    supply_lines = {name.lower(): circuit[i] for i, name in top_level_elements(circuit)}
+    for variant in variants[1:]:
+        lines.append("")
+        lines.append(f".ALTER {variant['name']}")
+        if settings["lib_path"]: lines.append(f".LIB '{settings['lib_path']}' {variant['corner']}")
+        if variant["temp"]: lines.append(f".TEMP {variant['temp']}") # 溫度未設定時沿用模擬器預設
+        for name, value in variant["supplies"].items():
+            if name.lower() in supply_lines: lines.append(supply_line(supply_lines[name.lower()], value))
+    lines.append(".END")
+    return "\n".join(lines)
+
+# --- 平行輸出 (每個 worker 只接收一次共用的電路內容) ---
+_shared = {}
+
+def _init_worker(settings, sim_settings, circuit):
+    _shared.update(settings=settings, sim_settings=sim_settings, circuit=circuit)
+
+def _write_variant(path, variant):
+    text = render_variant(_shared["settings"], _shared["sim_settings"], _shared["circuit"], variant)
+    with open(path, "w") as f: f.write(text)
+    return path
+
+def deck_path(base, variant):
+    return f"{base}_{variant['name']}.sp"
+
+def write_decks(base, settings, sim_settings, circuit, variants, workers=None):
+    """
+    每個變體各寫一份 deck，以 process pool 平行處理。
+    circuit 為已解好連線的元件行 (所有變體共用同一次 solve_connectivity)
+    """
+    paths = [deck_path(base, v) for v in variants]
+    workers = workers or min(len(variants), os.cpu_count() or 1)
+    if workers <= 1:
+        _init_worker(settings, sim_settings, circuit)
+        return [_write_variant(p, v) for p, v in zip(paths, variants)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(settings, sim_settings, circuit)) as pool:
+        return list(pool.map(_write_variant, paths, variants))
@@ -0,0 +1,181 @@
+"""
+資料驅動的元件符號庫。每個符號是一個 JSON 檔 (檔名即符號名稱):
+    prefix     實例名稱字首 (例如 "D"、"Q"、"E"、"X")
+    hitbox     [w, h]
+    lines      [[x1, y1, x2, y2], ...]   線段 (相對座標)
+    circles    [[cx, cy, r], ...]        圓
+    terminals  [[name, x, y], ...]
+    params     {名稱: 預設值}
+    label      畫在符號下方的文字樣板 (可省略)
+    template   netlist 行樣板，以 {name}、{端點名稱}、{參數名稱} 代入
+啟動時只列出檔名；第一次使用才解析，並把 8 種方向 (旋轉 x 鏡像) 的幾何預先轉換，
+編譯結果存到磁碟快取 (以來源檔的路徑/大小/修改時間為 key)，之後直接讀取
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from circuit_utils import clean_coord, rotate_point
+
+LIBRARY_DIRS = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "symbols"),
+                os.path.join(os.path.expanduser("~"), ".circuit_cad", "symbols")] # 後者同名時覆蓋前者
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".circuit_cad", "symcache")
+COMPILED_VERSION = 1 # 編譯格式變更時遞增，舊快取即失效
+
+_FIELD_RE = re.compile(r"\{([^{}]+)\}")
+
+def orient_key(rotation, mirror):
+    return f"{rotation % 360}{'m' if mirror else ''}"
+
+def _transform(x, y, rotation, mirror):
+    """與 transform_coords 相同的順序: 先鏡像再旋轉"""
+    if mirror: x = -x
+    x, y = rotate_point(x, y, rotation)
+    return clean_coord(x), clean_coord(y)
+
+def compile_symbol(name, src):
+    """來源 dict -> 編譯後的 dict (各方向幾何已轉換)；格式錯誤時 ValueError"""
+    try:
+        terminals = [(str(t), float(x), float(y)) for t, x, y in src["terminals"]]
+        lines = [tuple(float(v) for v in seg) for seg in src.get("lines", [])]
+        circles = [tuple(float(v) for v in c) for c in src.get("circles", [])]
+        w, h = src.get("hitbox", (40, 40))
+        params = {str(k): str(v) for k, v in src.get("params", {}).items()}
+        prefix = str(src["prefix"])
+        template = str(src.get("template", "{name} " + " ".join(f"{{{t[0]}}}" for t in terminals)))
+        label = str(src.get("label", ""))
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"symbol {name}: bad definition ({e})") from None
+    if any(len(seg) != 4 for seg in lines) or any(len(c) != 3 for c in circles):
+        raise ValueError(f"symbol {name}: lines need 4 numbers, circles 3")
+    fields = {"name"} | {t[0] for t in terminals} | set(params)
+    for text in (template, label):
+        unknown = set(_FIELD_RE.findall(text)) - fields
+        if unknown: raise ValueError(f"symbol {name}: unknown field(s) {', '.join(sorted(unknown))}")
+
+    orients = {}
+    for rotation in (0, 90, 180, 270):
+        for mirror in (False, True):
+            tf = lambda x, y: _transform(x, y, rotation, mirror)
+            orients[orient_key(rotation, mirror)] = {
+                "lines": [tf(x1, y1) + tf(x2, y2) for x1, y1, x2, y2 in lines],
+                "circles": [tf(cx, cy) + (r,) for cx, cy, r in circles],
+                "terms": [tf(x, y) for _, x, y in terminals]
+            }
+    return {"version": COMPILED_VERSION, "prefix": prefix, "hitbox": [w, h],
+            "terminals": terminals, "params": params, "template": template, "label": label,
+            "orients": orients}
+
+class Symbol:
+    """編譯後的符號 (唯讀，所有實例共用)"""
+    __slots__ = ("name", "prefix", "hitbox", "terminals", "params", "template", "label", "orients")
+
+    def __init__(self, name, compiled):
+        self.name = name
+        self.prefix = compiled["prefix"]
+        self.hitbox = tuple(compiled["hitbox"])
+        self.terminals = [tuple(t) for t in compiled["terminals"]]
+        self.params = compiled["params"]
+        self.template = compiled["template"]
+        self.label = compiled["label"]
+        self.orients = compiled["orients"]
+
+    def orient(self, rotation, mirror):
+        """{"lines": [(x1, y1, x2, y2)], "circles": [(cx, cy, r)], "terms": [(x, y)]} (相對元件中心)"""
+        return self.orients[orient_key(rotation, mirror)]
+
+    @staticmethod
+    def fill(template, values):
+        return _FIELD_RE.sub(lambda m: str(values.get(m.group(1), m.group(0))), template)
+
+    def netlist_line(self, inst_name, node_names, params):
+        values = dict(self.params)
+        values.update(params)
+        values.update(zip((t[0] for t in self.terminals), node_names))
+        values["name"] = inst_name
+        return self.fill(self.template, values)
+
+    def label_text(self, params):
+        values = dict(self.params)
+        values.update(params)
+        return self.fill(self.label, values)
+
+class SymbolLibrary:
+    """
+    符號庫目錄。names() 只列檔名；get() 第一次用到某符號才讀取 (優先讀磁碟上的編譯快取)。
+    背景 thread (匯出快照) 也會呼叫 get()，以 lock 保護
+    """
+
+    def __init__(self, dirs=None, cache_dir=CACHE_DIR):
+        self.dirs = LIBRARY_DIRS if dirs is None else dirs
+        self.cache_dir = cache_dir
+        self._paths = None   # {名稱: 來源路徑}
+        self._loaded = {}    # {名稱: Symbol}
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        if self._paths is None:
+            paths = {}
+            for d in self.dirs:
+                try: files = os.listdir(d)
+                except OSError: continue
+                for f in files:
+                    if f.endswith(".json"): paths[f[:-5]] = os.path.join(d, f)
+            self._paths = paths
+        return self._paths
+
+    def names(self):
+        return sorted(self._scan())
+
+    def __contains__(self, name):
+        return name in self._scan()
+
+    def get(self, name):
+        """已編譯的 Symbol；不在庫中 KeyError，定義錯誤 ValueError"""
+        with self._lock:
+            sym = self._loaded.get(name)
+            if sym is None:
+                path = self._scan()[name]
+                sym = self._loaded[name] = Symbol(name, self._load(name, path))
+            return sym
+
+    def cache_path(self, path):
+        st = os.stat(path)
+        stamp = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}|{COMPILED_VERSION}"
+        return os.path.join(self.cache_dir, hashlib.sha1(stamp.encode()).hexdigest() + ".json")
+
+    def _load(self, name, path):
+        cached = self.cache_path(path)
+        try:
+            with open(cached) as f: compiled = json.load(f)
+            if compiled.get("version") == COMPILED_VERSION: return compiled
+        except (OSError, ValueError):
+            pass
+        try:
+            with open(path) as f: src = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"symbol {name}: {e}") from None
+        compiled = compile_symbol(name, src)
+        try: # 快取寫不進去不影響使用
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = cached + f".{os.getpid()}.tmp"
+            with open(tmp, "w") as f: json.dump(compiled, f)
+            os.replace(tmp, cached)
+        except OSError:
+            pass
+        return json.loads(json.dumps(compiled)) # 與讀取快取時的型別一致 (tuple -> list)
+
+    def reload(self):
+        """重新掃描目錄 (新增/修改符號檔後)；已編譯的符號在下次 get() 時依修改時間重新驗證"""
+        with self._lock:
+            self._paths = None
+            self._loaded = {}
+
+_default_library = None
+
+def default_library():
+    """所有分頁與匯出共用同一份符號庫"""
+    global _default_library
+    if _default_library is None: _default_library = SymbolLibrary()
+    return _default_library
@@ -0,0 +1,26 @@
+from autorouter import RoutingGrid, BLOCKED, route_net, terminal_access
+from circuit_utils import normalize_segments, build_node_map, point_key
+from components import Pin, CMOS
+from netlister import Segment
+
+def pins(*comps):
+    return [(c, tx, ty) for c in comps for term, tx, ty in c.get_abs_terminals()]
+
+def test_off_grid_access_point_is_reserved():
+    m = CMOS(None, 200, 200, name="M1")
+    grid = RoutingGrid([m], [], 0, 0, 400, 400)
+    for term, tx, ty in m.get_abs_terminals():
+        assert grid.occ[grid.cell(*terminal_access(m, tx, ty)[0])] == BLOCKED
+
+def test_route_does_not_short_crossed_net():
+    foreign = [Segment((-200, 0), (400, 0))]
+    a, b, c = Pin(None, 100, -100, name="A"), Pin(None, 100, 100, name="A"), Pin(None, 300, 40, name="A")
+    segs = route_net([a, b, c], foreign, pins(a, b, c))
+    assert segs
+    # 正規化後 (T 接點會被切開) 兩個網路仍互不相連
+    wires = normalize_segments([(w.start_p, w.end_p) for w in foreign] + segs)
+    x, y = Pin(None, -200, 0, name="X"), Pin(None, 400, 0, name="X")
+    terms = [((tx, ty), p.name, "") for p in (a, b, c, x, y) for term, tx, ty in p.get_abs_terminals()]
+    nodes = build_node_map(terms, wires)
+    assert nodes[point_key((100, -100))] == nodes[point_key((300, 40))] == "A"
+    assert nodes[point_key((-200, 0))] == "X"
@@ -0,0 +1,32 @@
+from components import LibraryComponent, PlaceholderComponent, component_from_dict, component_to_dict
+from netlister import CellSnapshot
+
+def item(**kw):
+    base = {"type": "LibraryComponent", "symbol": "no_such_symbol", "name": "U1", "x": 100, "y": 40,
+            "value": "", "rotation": 90, "mirror": True, "terminals": ["a", ""], "params": {"gain": "10"}}
+    base.update(kw)
+    return base
+
+def test_missing_symbol_kept_as_placeholder():
+    comp = component_from_dict(None, item(), counted=False)
+    assert isinstance(comp, PlaceholderComponent) and "no_such_symbol" in comp.reason
+    comp.x, comp.name = 200, "U7"
+    saved = component_to_dict(comp)
+    assert saved == item(x=200, name="U7")
+    assert saved["params"] is not comp.item["params"]
+
+def test_unknown_type_survives_snapshot_and_netlist():
+    data = {"components": [{"type": "Resistor", "name": "R1", "x": 0, "y": 0, "value": "1k", "terminals": []},
+                           item(type="FutureWidget", extra={"k": [1, 2]})],
+            "wires": []}
+    snap = CellSnapshot("top", data)
+    assert [c.name for c in snap.components] == ["R1", "U1"]
+    lines = list(snap.iter_circuit_lines())
+    assert "* WARNING: U1 skipped: unknown component type FutureWidget" in lines
+    assert not any(l.startswith("U1 ") for l in lines)
+    assert component_to_dict(snap.components[1])["extra"] == {"k": [1, 2]}
+
+def test_library_symbol_round_trip():
+    comp = component_from_dict(None, item(symbol="diode", params={}, terminals=[]), counted=False)
+    assert isinstance(comp, LibraryComponent)
+    assert component_to_dict(comp)["symbol"] == "diode"
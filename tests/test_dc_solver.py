@@ -0,0 +1,24 @@
+import pytest
+from dc_solver import solve_op
+
+def test_resistor_divider():
+    result = solve_op([("V", "V1", ("in", "0"), 3.0),
+                       ("R", "R1", ("in", "mid"), 1e3),
+                       ("R", "R2", ("mid", "GND"), 2e3)])
+    assert result.converged
+    assert result.voltage("mid") == pytest.approx(2.0, rel=1e-6)
+    assert result.voltage("gnd") == 0.0
+    assert result.voltage("nowhere") is None
+    assert abs(result.currents["V1"]) == pytest.approx(1e-3, rel=1e-6)
+
+def test_current_source_into_resistor():
+    result = solve_op([("I", "I1", ("0", "a"), 1e-3), ("R", "R1", ("a", "0"), 1e3)])
+    assert abs(result.voltage("a")) == pytest.approx(1.0, rel=1e-6)
+
+def test_nmos_inverter_pulls_low():
+    result = solve_op([("V", "VDD", ("vdd", "0"), 1.8),
+                       ("V", "VIN", ("in", "0"), 1.8),
+                       ("R", "RL", ("vdd", "out"), 100e3),
+                       ("M", "M1", ("out", "in", "0", "0"), ("n", 1e-6, 1e-6))])
+    assert result.converged
+    assert 0 <= result.voltage("out") < 0.2
@@ -0,0 +1,41 @@
+import random
+from design_index import BoundsIndex, NameIndex
+
+def test_name_index_prefix_then_fuzzy():
+    index = NameIndex()
+    index.set("c1", [("M_N1", "inst", (0, 0)), ("vout", "net", (10, 0))])
+    index.set("c2", [("M_N2", "inst", (100, 0))])
+    index.set("p1", [("VOUT", "pin", (200, 0))])
+    assert [h[0] for h in index.search("m_n")] == ["M_N1", "M_N2"]
+    assert sorted(h[1] for h in index.prefix("vout")) == ["net", "pin"]
+    assert {h[0] for h in index.search("vot")} == {"vout", "VOUT"} # 少打字元仍找得到
+    assert index.search("") == []
+
+def test_name_index_update_and_remove():
+    index = NameIndex()
+    index.set("c1", [("R1", "inst", (0, 0))])
+    index.set("c1", [("R9", "inst", (50, 0))])
+    assert index.prefix("r1") == [] and index.prefix("r9")[0][2] == (50, 0)
+    index.remove("c1")
+    assert index.sorted == [] and index.entries == {} and index.grams == {}
+
+def test_bounds_index_matches_brute_force():
+    rng = random.Random(1)
+    index, boxes = BoundsIndex(), {}
+    for step in range(2000):
+        key = rng.randrange(40)
+        if rng.random() < 0.3:
+            index.remove(key)
+            boxes.pop(key, None)
+        else:
+            x, y = rng.randrange(-1000, 1000), rng.randrange(-1000, 1000)
+            box = (x, y, x + rng.randrange(1, 80), y + rng.randrange(1, 80))
+            index.set(key, box)
+            boxes[key] = box
+        expected = None if not boxes else (min(b[0] for b in boxes.values()), min(b[1] for b in boxes.values()),
+                                           max(b[2] for b in boxes.values()), max(b[3] for b in boxes.values()))
+        assert index.bounds() == expected
+    assert len(index.heaps[0]) <= 4 * len(index.boxes) + 64 + 1
+    some = list(boxes)[:3]
+    assert index.union(some) == (min(boxes[k][0] for k in some), min(boxes[k][1] for k in some),
+                                 max(boxes[k][2] for k in some), max(boxes[k][3] for k in some))
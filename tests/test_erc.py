@@ -0,0 +1,65 @@
+from erc import ErcEngine, ErcWorker
+
+class Info:
+    """CompInfo 的替身 (CompInfo 需要真的元件物件)"""
+    def __init__(self, uid, kind, name, x, y, terms=(), pin_name=""):
+        self.uid, self.kind, self.name = uid, kind, name
+        self.bbox = (x - 20, y - 20, x + 20, y + 20)
+        self.terms = [(t, (x + dx, y + dy), "") for t, dx, dy in terms]
+        self.pin_name = pin_name
+
+def resistor(uid, name, x, y):
+    return Info(uid, "Resistor", name, x, y, [("1", 0, -20), ("2", 0, 20)])
+
+def keys(engine, kind):
+    return sorted(k for k in engine.findings if k[0] == kind)
+
+def test_overlap_cleared_when_other_part_moves_away():
+    engine = ErcEngine()
+    engine.update({"c1": resistor("c1", "R1", 0, 0), "c2": resistor("c2", "R2", 5, 0)})
+    assert keys(engine, "overlap") == [("overlap", "c1", "c2")]
+    upserts, removed = engine.update({"c2": resistor("c2", "R2", 2000, 0)})
+    assert keys(engine, "overlap") == []
+    assert ("overlap", "c1", "c2") in removed
+
+def test_duplicate_names_and_delete():
+    engine = ErcEngine()
+    engine.update({"c1": resistor("c1", "R1", 0, 0), "c2": resistor("c2", "r1", 500, 0)})
+    assert ("duplicate", "r1") in engine.findings
+    engine.update({"c2": None})
+    assert ("duplicate", "r1") not in engine.findings
+
+def test_unconnected_and_connected_terminals():
+    engine = ErcEngine()
+    engine.update({"c1": resistor("c1", "R1", 0, 0)})
+    assert keys(engine, "nc") == [("nc", "c1", "1"), ("nc", "c1", "2")]
+    engine.update({"c2": resistor("c2", "R2", 200, 0)}, wires={"w1": ((0, 20), (200, 20))})
+    assert keys(engine, "nc") == [("nc", "c1", "1"), ("nc", "c2", "1")]
+
+def test_removed_wire_splits_net():
+    engine = ErcEngine()
+    engine.update({"c1": resistor("c1", "R1", 0, 0), "c2": resistor("c2", "R2", 200, 0)},
+                  wires={"w1": ((0, 20), (100, 20)), "w2": ((100, 20), (200, 20))})
+    assert ("nc", "c1", "2") not in engine.findings
+    upserts, removed = engine.update({}, wires={"w2": None})
+    assert {f.key for f in upserts} == {("nc", "c1", "2"), ("nc", "c2", "2")}
+    engine.update({}, wires={"w2": ((100, 20), (200, 20))})
+    assert keys(engine, "nc") == [("nc", "c1", "1"), ("nc", "c2", "1")]
+
+def test_shorted_voltage_source():
+    engine = ErcEngine()
+    vs = Info("v1", "VoltageSource", "V1", 0, 0, [("+", 0, -20), ("-", 0, 20)])
+    engine.update({"v1": vs}, wires={"w1": ((0, -20), (0, 20))})
+    assert ("vshort", "v1") in engine.findings
+
+def test_worker_round_trip():
+    worker = ErcWorker()
+    try:
+        worker.submit({"c1": resistor("c1", "R1", 0, 0)})
+        merged, upserts, removed = worker.results.get(timeout=5)
+        assert merged == 1 and {f.key for f in upserts} == {("nc", "c1", "1"), ("nc", "c1", "2")}
+        worker.submit({}, {"w1": ((0, -20), (0, 20))})
+        merged, upserts, removed = worker.results.get(timeout=5)
+        assert set(removed) == {("nc", "c1", "1"), ("nc", "c1", "2")}
+    finally:
+        worker.stop()
@@ -0,0 +1,43 @@
+import random
+from minimap import COMP_COLOR, EMPTY_COLOR, WIRE_COLOR, MinimapRaster
+
+def rebuilt(raster):
+    """同範圍下從頭畫一次的點陣，增量結果應與此相同"""
+    fresh = MinimapRaster(raster.width, raster.height)
+    fresh._set_bounds(raster.bounds)
+    fresh.extent = raster.extent
+    for key, shape in raster.shapes.items():
+        fresh.shapes[key] = shape
+        fresh._add(key)
+    return fresh
+
+def test_incremental_updates_match_rebuild():
+    rng = random.Random(7)
+    raster = MinimapRaster(80, 60)
+    for step in range(500):
+        key = rng.randrange(30)
+        if rng.random() < 0.2:
+            raster.remove(key)
+            continue
+        x, y = rng.randrange(-2000, 2000), rng.randrange(-2000, 2000)
+        if key % 2: raster.set(key, "comp", x - 20, y - 20, x + 20, y + 20)
+        else: raster.set(key, "wire", x, y, x + rng.randrange(-300, 300), y)
+    fresh = rebuilt(raster)
+    assert raster.comp_hits == fresh.comp_hits
+    assert raster.wire_hits == fresh.wire_hits
+
+def test_dirty_pixels_and_colors():
+    raster = MinimapRaster(40, 30)
+    raster.set("c", "comp", 0, 0, 40, 40)
+    assert raster.take_dirty()[0] # 第一次放物件: 建立範圍，整張重畫
+    raster.set("w", "wire", 0, 100, 40, 100)
+    full, dirty = raster.take_dirty()
+    assert not full and dirty
+    assert {raster.color(i) for i in dirty} == {WIRE_COLOR}
+    px, py = raster._clamp(*raster.to_pixel(20, 20))
+    assert raster.color(py * raster.width + px) == COMP_COLOR
+    raster.remove("w")
+    full, dirty = raster.take_dirty()
+    assert {raster.color(i) for i in dirty} == {EMPTY_COLOR}
+    x, y = raster.to_logical(*raster.to_pixel(123, -45))
+    assert abs(x - 123) < 1e-9 and abs(y + 45) < 1e-9
@@ -0,0 +1,72 @@
+import random
+from circuit_utils import build_node_map
+from net_index import Connectivity, NetIndex
+
+class Term:
+    def __init__(self, name, custom=""):
+        self.name, self.custom_net_name = name, custom
+
+class Seg:
+    def __init__(self, p1, p2):
+        self.start_p, self.end_p = p1, p2
+
+def node_map_of(conn):
+    return dict((key, name) for key, name in
+                ((key, conn.name(nid)) for key, nid in conn.net_of.items()) if name is not None)
+
+def test_matches_build_node_map_after_random_edits():
+    rng = random.Random(7)
+    pt = lambda: (rng.randrange(0, 12) * 20, rng.randrange(0, 12) * 20)
+    conn = Connectivity()
+    terms, wires, seq = {}, {}, 0
+    for step in range(600):
+        op = rng.random()
+        if op < 0.3 or not terms:
+            seq += 1
+            pin = f"P{seq}" if rng.random() < 0.1 else ""
+            custom = "vdd" if rng.random() < 0.05 else ""
+            terms[seq] = (pt(), pin, custom)
+            conn.add_terminal(seq, terms[seq][0], seq, pin, custom)
+        elif op < 0.45:
+            tid = rng.choice(list(terms))
+            del terms[tid]
+            conn.remove_terminal(tid)
+        elif op < 0.8 or not wires:
+            wires[step] = (pt(), pt())
+            conn.add_wire(step, *wires[step])
+        else:
+            wid = rng.choice(list(wires))
+            del wires[wid]
+            conn.remove_wire(wid)
+        if step % 20 == 0 or step == 599:
+            expected = build_node_map([terms[t] for t in sorted(terms)], list(wires.values()))
+            assert node_map_of(conn) == expected
+
+def test_wire_removal_splits_net_and_renumbers():
+    conn = Connectivity()
+    conn.add_terminal("a", (0, 0), 1)
+    conn.add_terminal("b", (100, 0), 2)
+    conn.add_terminal("c", (200, 0), 3)
+    conn.add_wire("w1", (0, 0), (100, 0))
+    conn.add_wire("w2", (100, 0), (200, 0))
+    assert {conn.name(conn.net_of[k]) for k in ((0, 0), (200, 0))} == {"N_1"}
+    conn.take_changes()
+    conn.remove_wire("w2")
+    assert conn.take_changes()
+    assert conn.name(conn.net_of[(0, 0)]) == "N_1" and conn.name(conn.net_of[(200, 0)]) == "N_2"
+    assert (150, 0) not in conn.net_of
+
+def test_net_index_tracks_components_and_wires():
+    index = NetIndex()
+    r1, r2 = Term("1", "out"), Term("1")
+    index.build([("c1", [("R1", r1, (0, 0), "")]), ("c2", [("R2", r2, (100, 0), "")])], [])
+    assert index.net_at((100, 0)) == "N_1"
+    wire = Seg((0, 0), (100, 0))
+    index.add_wire(wire)
+    assert index.net_at((50, 0)) == "out"
+    wires, terms = index.members("out")
+    assert wires == [wire] and [t[0] for t in terms] == ["R1", "R2"]
+    index.remove_component("c1")
+    assert index.net_at((50, 0)) == "N_1"
+    index.remove_wire(wire)
+    assert index.net_at((50, 0)) is None and index.members("N_1") == ([], [("R2", r2, (100, 0))])
@@ -0,0 +1,109 @@
+from netlister import CellSnapshot
+
+def comp(type_, name, x, y, **extra):
+    item = {"type": type_, "name": name, "x": x, "y": y, "value": extra.pop("value", "1k"), "terminals": []}
+    item.update(extra)
+    return item
+
+def lines(snapshot):
+    return list(snapshot.iter_circuit_lines())
+
+def test_recursive_and_missing_cells_are_warned():
+    top = {"components": [comp("SubcktInstance", "X1", 0, 0, cell="top", ports=["a"], value="top"),
+                          comp("SubcktInstance", "X2<0:1>", 200, 0, cell="nope", ports=["a"], value="nope")],
+           "wires": []}
+    out = lines(CellSnapshot("top", top, {}))
+    warnings = [l for l in out if l.startswith("* WARNING")]
+    assert len(warnings) == 2
+    assert "X1 references top recursively" in warnings[0]
+    assert "cell nope not found" in warnings[1]
+    assert not any(l.startswith(".SUBCKT") for l in out)
+
+def test_subckt_definition_after_main_circuit():
+    inv = {"components": [comp("Pin", "in", 0, 0, value=""), comp("Resistor", "R1", 100, 0)], "wires": []}
+    top = {"components": [comp("SubcktInstance", "X1", 0, 0, cell="inv", ports=["in"], value="inv")], "wires": []}
+    out = lines(CellSnapshot("top", top, {"inv": inv}))
+    assert out.index(".SUBCKT inv in") > next(i for i, l in enumerate(out) if l.startswith("X1 "))
+    assert ".ENDS inv" in out
+
+def test_bus_ports_are_expanded_per_bit():
+    cell = {"components": [comp("Pin", "D<0:3>", 0, 0, value=""), comp("Pin", "en", 0, 100, value=""),
+                           comp("Resistor", "R<0:3>", 30, 0)], "wires": []}
+    top = {"components": [comp("Pin", "B<3:0>", 0, 0, value=""),
+                          comp("SubcktInstance", "X1", 0, 40, cell="reg", ports=["D<0:3>", "en"], value="reg",
+                               terminals=["B<3:0>", "vdd"])],
+           "wires": []}
+    out = lines(CellSnapshot("top", top, {"reg": cell}))
+    assert ".SUBCKT reg D<0> D<1> D<2> D<3> en" in out
+    assert "X1 B<3> B<2> B<1> B<0> vdd reg" in out
+    assert any(l.startswith("R<0> D<0> ") for l in out)
+
+def test_export_job_writes_files(tmp_path):
+    import json
+    from netlister import ExportJob
+    top = {"components": [comp("Resistor", "R1", 0, 0)], "wires": [],
+           "global_settings": {"options": "", "temp": "", "lib_path": "", "corner": ""},
+           "sim_settings": {".OP": {"active": True, "params": ""}}}
+    sp, js = tmp_path / "top.sp", tmp_path / "top.json"
+    job = ExportJob(("top", top, {}), str(sp), str(js))
+    job.thread.join(5)
+    assert job.status == "done", job.error
+    text = sp.read_text().splitlines()
+    assert any(l.startswith("R1 ") for l in text) and text[-1] == ".END"
+    assert json.loads(js.read_text())["components"][0]["name"] == "R1"
+    assert not list(tmp_path.glob("*.tmp"))
+
+def test_indirect_and_nested_cycles_are_cut():
+    a = {"components": [comp("Pin", "p", 0, 0, value=""),
+                        comp("SubcktInstance", "XB", 100, 0, cell="b", ports=["p"], value="b"),
+                        comp("SubcktInstance", "XA", 300, 0, cell="a", ports=["p"], value="a")], "wires": []}
+    b = {"components": [comp("Pin", "p", 0, 0, value=""),
+                        comp("SubcktInstance", "XA", 100, 0, cell="a", ports=["p"], value="a")], "wires": []}
+    top = {"components": [comp("SubcktInstance", "X1", 0, 0, cell="a", ports=["p"], value="a"),
+                          comp("SubcktInstance", "X2", 200, 0, cell="b", ports=["p"], value="b")], "wires": []}
+    out = lines(CellSnapshot("top", top, {"a": a, "b": b}))
+    warnings = [l for l in out if l.startswith("* WARNING")]
+    assert len(warnings) == 2 # a 內的 XA (自我引用) 與 b 內的 XA (a -> b -> a)
+    assert all("recursively" in w for w in warnings)
+    body = {}
+    for l in out:
+        if l.startswith(".SUBCKT"): current = body.setdefault(l.split()[1], [])
+        elif l.startswith(".ENDS"): current = None
+        elif body and current is not None: current.append(l)
+    assert [l for l in body["a"] if l.startswith("XB")] and not [l for l in body["a"] if l.startswith("XA")]
+    assert not [l for l in body["b"] if l.startswith("XA")]
+    assert any(l.startswith("X1 ") for l in out) and any(l.startswith("X2 ") for l in out)
+
+def test_live_netlist_patches_only_changed_lines():
+    from components import component_from_dict
+    from netlister import LiveNetlist, Segment
+    inv = {"components": [comp("Pin", "in", 0, 0, value=""), comp("Resistor", "R1", 100, 0)], "wires": []}
+    top = {"components": [comp("Resistor", f"R{i}", i * 100, 0) for i in range(1, 6)]
+                         + [comp("SubcktInstance", "X1", 0, 200, cell="inv", ports=["in"], value="inv")],
+           "wires": [], "global_settings": {"options": "", "temp": "", "lib_path": "", "corner": ""},
+           "sim_settings": {".OP": {"active": True, "params": ""}}}
+    cell = CellSnapshot("top", top, {"inv": inv})
+    live, doc = LiveNetlist(cell), []
+    def apply(edits):
+        for start, count, text in edits: doc[start:start + count] = text.splitlines(keepends=True)
+        assert "".join(doc) == cell.generate_netlist_text() + "\n"
+        return edits
+
+    apply(live.update())
+    # R4.2 接到 R5.1: 合併後的網路沿用 R4 那側的 N_k，之後的自動編號前移，只有 R5 與 X1 的行被替換
+    wire = Segment((430, 0), (470, 0))
+    cell.wires.append(wire)
+    cell.net_index.add_wire(wire)
+    edits = apply(live.update())
+    assert sorted(text.split()[0] for _, _, text in edits) == ["R5", "X1"]
+    # 新元件接在最後；刪除元件只移除它的行
+    new = component_from_dict(None, comp("Resistor", "R9", 1000, 0), counted=False)
+    cell.components.append(new)
+    cell.net_index.set_component(new.tags, cell.terminal_entries(new))
+    apply(live.update({new.tags: new}))
+    gone = cell.components.pop(2)
+    cell.net_index.remove_component(gone.tags)
+    apply(live.update({gone.tags: None}))
+    cell.net_index.remove_wire(wire)
+    cell.wires.remove(wire)
+    apply(live.update())
@@ -0,0 +1,38 @@
+import pytest
+from params import ParamTable, compile_expr, evaluate
+
+def test_spice_numbers_and_functions():
+    assert evaluate("2k*2") == 4000.0
+    assert evaluate("'sqrt(4)+pi-pi'") == 2.0
+    assert evaluate("2^3") == 8.0
+    assert isinstance(evaluate("3"), float)
+
+@pytest.mark.parametrize("text", ["sqrt", "1,2", "(-1)**0.5", "max"])
+def test_non_real_results_rejected(text):
+    with pytest.raises(ValueError):
+        evaluate(text)
+
+def test_rejects_unsafe_names():
+    with pytest.raises(ValueError):
+        compile_expr("__import__")
+
+def test_param_table_dependencies():
+    table = ParamTable()
+    table.update({"L": "1u", "W": "'2*L'", "A": "W*L"})
+    assert table.value("w") == pytest.approx(2e-6)
+    assert table.set("L", "2u") == {"l", "w", "a"}
+    assert table.value("A") == pytest.approx(8e-12)
+    assert table.evaluate("W/2") == pytest.approx(2e-6)
+    assert table.netlist_lines() == [".PARAM L=2u", ".PARAM W='2*L'", ".PARAM A='W*L'"]
+
+def test_param_table_errors():
+    table = ParamTable()
+    with pytest.raises(ValueError):
+        table.set("W", "sqrt")
+    assert "w" not in table
+    table.update({"X": "y+1", "Y": "x+1", "Z": "q"})
+    assert table.errors["x"].startswith("circular") and table.errors["z"].startswith("undefined")
+    table.update({"K": "2", "V": "k,1"})
+    assert "not a real number" in table.errors["v"]
+    with pytest.raises(ValueError):
+        table.evaluate("missing*2")
@@ -0,0 +1,20 @@
+from components import Component, Resistor
+from editor import SchematicEditor
+
+class FakeEditor:
+    renamer = SchematicEditor.renamer
+    def __init__(self, components): self.components = components
+
+def test_pasted_names_advance_auto_numbering(monkeypatch):
+    monkeypatch.setattr(Component, "_counts", {})
+    r1 = Resistor(None, 0, 0)
+    assert r1.name == "R1"
+    next_name = FakeEditor([r1]).renamer()
+    assert next_name("R1") == "R2"
+    assert next_name("r1<0:3>") == "r3<0:3>"
+    assert Resistor(None, 100, 0).name == "R4" # 不會再編出貼上用掉的 R2 / R3
+
+def test_reserve_never_lowers_counter(monkeypatch):
+    monkeypatch.setattr(Component, "_counts", {"c": 9})
+    Component.reserve("C", 3)
+    assert Component._counts["c"] == 9
@@ -0,0 +1,84 @@
+import copy
+import json
+import pytest
+from schematic_diff import diff_schematics, main, merge_schematics
+
+def res(name, x, y, value="1k"):
+    return {"type": "Resistor", "name": name, "x": x, "y": y, "rotation": 0, "mirror": False,
+            "value": value, "terminals": ["", ""]}
+
+BASE = {"components": [res("R1", 0, 0), res("R2", 200, 0)],
+        "wires": [{"start": [30, 0], "end": [170, 0]}],
+        "params": {"W": "1u"}}
+
+def kinds(items):
+    return sorted((i.what, i.kind) for i in items)
+
+def test_identical_documents_have_no_diff():
+    assert diff_schematics(BASE, copy.deepcopy(BASE)) == []
+
+def test_component_and_wire_changes():
+    new = copy.deepcopy(BASE)
+    new["components"][0]["value"] = "2k"
+    new["components"][1]["x"] = 400
+    new["components"].append(res("R3", 600, 0))
+    new["wires"] = [{"start": [170, 0], "end": [30, 0]}] # 方向相反仍是同一條線
+    new["params"]["W"] = "2u"
+    got = kinds(diff_schematics(BASE, new, nets=False))
+    assert got == [("comp", "added"), ("comp", "moved"), ("comp", "revalued"), ("setting", "changed")]
+
+def test_net_change_reported_when_wire_removed():
+    new = copy.deepcopy(BASE)
+    new["wires"] = []
+    items = diff_schematics(BASE, new)
+    assert ("wire", "removed") in kinds(items)
+    assert any(i.what == "net" for i in items)
+
+def test_merge_takes_both_sides_and_keeps_ours_on_field_conflict():
+    ours, theirs = copy.deepcopy(BASE), copy.deepcopy(BASE)
+    ours["components"][0]["value"] = "2k"
+    theirs["components"][1]["x"] = 400
+    theirs["components"].append(res("R3", 600, 0))
+    merged, conflicts = merge_schematics(BASE, ours, theirs)
+    assert conflicts == []
+    assert [(c["name"], c["x"], c["value"]) for c in merged["components"]] == \
+        [("R1", 0, "2k"), ("R2", 400, "1k"), ("R3", 600, "1k")]
+    theirs["components"][0]["value"] = "3k"
+    merged, conflicts = merge_schematics(BASE, ours, theirs)
+    assert len(conflicts) == 1 and merged["components"][0]["value"] == "2k"
+
+@pytest.mark.parametrize("delete_in", ["ours", "theirs"])
+def test_delete_modify_conflict_keeps_modified_side(delete_in):
+    ours, theirs = copy.deepcopy(BASE), copy.deepcopy(BASE)
+    deleter, modifier = (ours, theirs) if delete_in == "ours" else (theirs, ours)
+    del deleter["components"][1]
+    modifier["components"][1]["value"] = "5k"
+    merged, conflicts = merge_schematics(BASE, ours, theirs)
+    assert len(conflicts) == 1
+    assert [c["value"] for c in merged["components"] if c["name"] == "R2"] == ["5k"]
+
+def test_merge_wires_as_sets():
+    ours, theirs = copy.deepcopy(BASE), copy.deepcopy(BASE)
+    ours["wires"] = []
+    theirs["wires"].append({"start": [0, -40], "end": [200, -40]})
+    merged, _ = merge_schematics(BASE, ours, theirs)
+    assert [w["start"] for w in merged["wires"]] == [[0, -40]]
+
+def test_cli(tmp_path, capsys):
+    old, new = tmp_path / "old.json", tmp_path / "new.json"
+    old.write_text(json.dumps(BASE))
+    changed = copy.deepcopy(BASE)
+    changed["components"][0]["value"] = "2k"
+    new.write_text(json.dumps(changed))
+    assert main(["x", str(old), str(old)]) == 0
+    assert main(["x", str(old), str(new), "--no-nets"]) == 1
+    assert "REVALUED" in capsys.readouterr().out
+    assert main(["x", "R.json", str(old), "a" * 40, "100644", str(new), "b" * 40, "100644"]) == 0 # git 外部 diff
+    out = tmp_path / "merged.json"
+    assert main(["x", "--merge", str(old), str(old), str(new), "-o", str(out)]) == 0
+    assert json.loads(out.read_text())["components"][0]["value"] == "2k"
+    for argv in (["x", str(old)], ["x", "--merge", str(old), str(new)], ["x", str(old), str(new), "--workers", "n"],
+                 ["x", "--merge", str(old), str(old), str(new), "-o"]):
+        with pytest.raises(SystemExit) as e:
+            main(argv)
+        assert e.value.code == 2
@@ -0,0 +1,27 @@
+import json
+import pytest
+from schematic_export import export_many, main
+
+DESIGN = {"components": [{"type": "Resistor", "name": "R1", "x": 0, "y": 0, "value": "1k", "terminals": []}],
+          "wires": [{"start": [0, 40], "end": [100, 40]}]}
+
+def test_bad_file_does_not_stop_batch(tmp_path):
+    (tmp_path / "a.json").write_text(json.dumps(DESIGN))
+    (tmp_path / "b.json").write_text(json.dumps({"components": "oops"}))
+    results = export_many([str(tmp_path)], str(tmp_path / "out"), "svg", workers=1)
+    assert [r[3] is None for r in results] == [True, False]
+    assert (tmp_path / "out" / "a.svg").read_text().startswith("<")
+
+@pytest.mark.parametrize("argv", [["x", "a.json", "-o"], ["x", "a.json", "--workers", "two"],
+                                  ["x", "a.json", "--format", "gif"], ["x"]])
+def test_cli_rejects_bad_arguments(argv):
+    with pytest.raises(SystemExit) as e:
+        main(argv)
+    assert e.value.code == 2
+
+def test_cli_exit_codes(tmp_path, capsys):
+    good = tmp_path / "a.json"
+    good.write_text(json.dumps(DESIGN))
+    assert main(["x", str(good), "-o", str(tmp_path / "out"), "--format", "SVG", "--workers", "1"]) == 0
+    assert main(["x", str(tmp_path / "missing.json"), "--workers", "1"]) == 1
+    assert "FAILED" in capsys.readouterr().out
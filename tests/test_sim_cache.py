@@ -0,0 +1,39 @@
+import os
+from sim_cache import ResultCache, canonical_netlist, netlist_key, referenced_files
+
+def test_canonical_ignores_comments_and_case():
+    a = "* title\nr1 a b 1k $ note\n+ tc=0\n\n.op"
+    b = "R1  A B 1K\n+TC=0 ; other\n.OP"
+    assert canonical_netlist(a) == canonical_netlist(b)
+
+def test_quoted_paths_keep_case():
+    text = ".LIB '/Models/Tech.lib' tt\n.include \"My$Dir/x.inc\""
+    assert canonical_netlist(text) == ".LIB '/Models/Tech.lib' TT\n.INCLUDE \"My$Dir/x.inc\""
+    assert canonical_netlist(".LIB '/a.lib' tt") != canonical_netlist(".LIB '/A.lib' tt")
+    assert referenced_files(text) == ["/Models/Tech.lib", "My$Dir/x.inc"]
+    assert referenced_files(".LIB tt\n.ENDL") == [] # 模型檔內的段落定義
+
+def test_key_follows_included_file(tmp_path):
+    inc = tmp_path / "m.inc"
+    inc.write_text(".MODEL d1 D\n")
+    text = ".INCLUDE 'm.inc'\nD1 a 0 d1\n.OP\n.END\n"
+    k1 = netlist_key(text, "cmd", str(tmp_path))
+    assert netlist_key(text, "cmd", str(tmp_path)) == k1
+    inc.write_text(".MODEL d1 D IS=1e-15\n")
+    os.utime(inc, ns=(1, 1))
+    assert netlist_key(text, "cmd", str(tmp_path)) != k1
+    assert netlist_key(text, "other", str(tmp_path)) != netlist_key(text, "cmd", str(tmp_path))
+
+def test_put_restore_roundtrip(tmp_path):
+    run = tmp_path / "run"
+    run.mkdir()
+    (run / "deck.sp").write_text("x")
+    (run / "deck.lis").write_text("listing")
+    (run / "other.lis").write_text("not mine")
+    cache = ResultCache(str(tmp_path / "cache"))
+    cache.put("ab" * 32, str(run), "deck.sp")
+    out = tmp_path / "out"
+    out.mkdir()
+    assert cache.restore("ab" * 32, str(out), "v2") == ["v2.lis"]
+    assert (out / "v2.lis").read_text() == "listing"
+    assert cache.restore("cd" * 32, str(out), "v2") is None
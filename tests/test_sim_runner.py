@@ -0,0 +1,65 @@
+import threading
+import time
+from sim_runner import SimJobRunner
+
+def wait_idle(runner):
+    deadline = time.time() + 5
+    while runner.has_active() and time.time() < deadline: time.sleep(0.01)
+
+def test_set_max_workers_keeps_limit(tmp_path):
+    runner = SimJobRunner(max_workers=3)
+    gate = threading.Event()
+    running, peak = [], []
+    lock = threading.Lock()
+
+    def fake_execute(job):
+        with lock:
+            running.append(job.id)
+            peak.append(len(running))
+        gate.wait(5)
+        with lock: running.remove(job.id)
+        runner._finish(job, "done")
+    runner._execute = fake_execute
+
+    deck = tmp_path / "a.sp"
+    deck.write_text("* a\n.END\n")
+    jobs = [runner.submit(str(deck), "true") for _ in range(6)]
+    time.sleep(0.05)
+    runner.set_max_workers(1)
+    assert [j.status for j in jobs[3:]] == ["queued"] * 3
+    gate.set()
+    wait_idle(runner)
+    assert max(peak) <= 3
+    assert [j.status for j in jobs] == ["done"] * 6
+
+def test_queued_job_moves_to_new_pool_and_cancels(tmp_path):
+    runner = SimJobRunner(max_workers=1)
+    gate = threading.Event()
+
+    def fake_execute(job):
+        gate.wait(5)
+        runner._finish(job, "done")
+    runner._execute = fake_execute
+
+    deck = tmp_path / "a.sp"
+    deck.write_text("* a\n.END\n")
+    first, second, third = (runner.submit(str(deck), "true") for _ in range(3))
+    time.sleep(0.05)
+    runner.set_max_workers(2)
+    runner.cancel(third.id)
+    gate.set()
+    wait_idle(runner)
+    assert (first.status, second.status, third.status) == ("done", "done", "cancelled")
+
+def test_format_command_keeps_paths_intact():
+    import sys
+    from sim_runner import STUB, format_command
+    deck = r"C:\Users\Jane Doe\runs\top.sp"
+    workdir = r"C:\Users\Jane Doe\runs"
+    argv = format_command(r'"C:\Program Files\sim\hspice.exe" -i {deck} -o {out}', deck, workdir, posix=False)
+    assert argv[0] == r"C:\Program Files\sim\hspice.exe"
+    assert argv[1:3] == ["-i", deck]
+    assert argv[4].startswith(workdir) and argv[4].endswith("top")
+    assert not any("'" in a or '"' in a for a in argv)
+    assert format_command("{stub} {deck} {out}", "/tmp/a b/x.sp", "/tmp/a b", posix=True) == \
+        [sys.executable, STUB, "/tmp/a b/x.sp", "/tmp/a b/x"]
@@ -0,0 +1,36 @@
+from sweep import apply_supplies, expand_sweep, parse_supplies, render_alter_deck
+
+CIRCUIT = ["VDD vdd 0 DC 1.8", "X1 vdd out inv", "", "* --- Subcircuits ---",
+           ".SUBCKT inv vdd out", "VDD vdd n1 DC 0", "R1 n1 out 1k", ".ENDS inv"]
+
+def test_parse_and_expand():
+    assert parse_supplies("VDD=1.62,1.98 junk VB=") == {"VDD": ["1.62", "1.98"]}
+    variants = expand_sweep({"corners": "TT FF", "temps": "", "supplies": "VDD=1.62,1.98"},
+                            {"corner": "TT", "temp": "25"})
+    assert [v["name"] for v in variants] == ["TT_25C_VDD1.62", "TT_25C_VDD1.98", "FF_25C_VDD1.62", "FF_25C_VDD1.98"]
+
+def test_supplies_only_rewrite_top_level():
+    out = apply_supplies(CIRCUIT, {"VDD": "1.62"})
+    assert out[0] == "VDD vdd 0 DC 1.62"
+    assert out[5] == "VDD vdd n1 DC 0"
+
+def test_alter_blocks_use_top_level_line():
+    variants = [{"name": "a", "corner": "TT", "temp": "25", "supplies": {"VDD": "1.8"}},
+                {"name": "b", "corner": "SS", "temp": "125", "supplies": {"VDD": "1.62"}}]
+    deck = render_alter_deck({"options": "", "lib_path": "", "corner": "TT", "temp": "25", "title": "t", "includes": []},
+                             {}, CIRCUIT, variants).splitlines()
+    alter = deck[deck.index(".ALTER b"):]
+    assert "VDD vdd 0 DC 1.62" in alter
+    assert ".ENDS inv" in deck and deck[-1] == ".END"
+
+def test_supply_names_are_case_insensitive():
+    assert parse_supplies("vdd=1 VDD=2") == {"vdd": ["2"]}
+    assert apply_supplies(CIRCUIT, {"vdd": "1.62"})[0] == "VDD vdd 0 DC 1.62"
+
+def test_blank_temperature_skips_temp_card():
+    settings = {"options": "", "lib_path": "", "corner": "TT", "temp": "", "title": "t", "includes": []}
+    variants = expand_sweep({"supplies": "vdd=1.62,1.98"}, settings)
+    deck = render_alter_deck(settings, {}, CIRCUIT, variants).splitlines()
+    assert not any(l.startswith(".TEMP") for l in deck)
+    assert "VDD vdd 0 DC 1.98" in deck[deck.index(f".ALTER {variants[1]['name']}"):]
+    assert [v["name"] for v in variants] == ["TT_vdd1.62", "TT_vdd1.98"]
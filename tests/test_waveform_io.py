@@ -0,0 +1,19 @@
+import time
+import numpy as np
+from waveform_io import Waveform, write_wfm
+
+def test_pyramid_built_in_background(tmp_path):
+    n = 200000
+    t = np.arange(n, dtype=float)
+    y = np.zeros(n)
+    y[123457] = 5.0 # 間隔取樣看不到的窄脈衝
+    path = str(tmp_path / "a.wfm")
+    write_wfm(path, ["time", "v(a)"], [t, y])
+    wave = Waveform(path)
+    ts, ys = wave.decimate("v(a)", 0, n, 100, wait=False)
+    assert len(ts) == len(ys) <= 2 * 100 + 1
+    deadline = time.time() + 5
+    while wave.pending() and time.time() < deadline: time.sleep(0.01)
+    ts, ys = wave.decimate("v(a)", 0, n, 100, wait=False)
+    assert ys.max() == 5.0
+    assert Waveform(path).decimate("v(a)", 0, n, 100)[1].max() == 5.0
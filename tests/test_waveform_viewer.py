@@ -0,0 +1,52 @@
+import time
+import numpy as np
+from waveform import WaveformViewer
+from waveform_io import Waveform, write_wfm
+
+class FakeCanvas:
+    def __init__(self): self.lines = []
+    def delete(self, tag): self.lines = []
+    def winfo_width(self): return 300
+    def winfo_height(self): return 200
+    def create_rectangle(self, *a, **kw): pass
+    def create_text(self, *a, **kw): pass
+    def create_line(self, *coords, **kw): self.lines.append(coords)
+
+def make_viewer(wave):
+    """不開 Tk 視窗: after / after_idle 改成記錄回呼，由測試逐一執行"""
+    viewer = object.__new__(WaveformViewer)
+    viewer.canvas = FakeCanvas()
+    viewer.wave, viewer.traces = wave, []
+    viewer.t0, viewer.t1 = wave.span()
+    viewer.redraw_pending = viewer.poll_pending = False
+    viewer.callbacks = []
+    viewer.after = lambda ms, fn: viewer.callbacks.append(fn)
+    viewer.after_idle = lambda fn: viewer.callbacks.append(fn)
+    return viewer
+
+def test_first_plot_redraws_after_pyramid_is_built(tmp_path):
+    n = 200000
+    y = np.zeros(n)
+    y[123457] = 5.0
+    path = str(tmp_path / "a.wfm")
+    write_wfm(path, ["time", "v(a)"], [np.arange(n, dtype=float), y])
+    viewer = make_viewer(Waveform(path))
+    viewer.traces = ["v(a)"]
+    viewer.redraw() # 點數遠多於畫面寬度: 先畫近似值並排入輪詢
+    assert viewer.poll_pending and len(viewer.callbacks) == 1
+    deadline = time.time() + 5
+    while viewer.callbacks and time.time() < deadline:
+        time.sleep(0.01)
+        viewer.callbacks.pop(0)()
+    assert not viewer.poll_pending and not viewer.wave.pending()
+    trace = viewer.canvas.lines[-1]
+    ys = trace[1::2]
+    assert min(ys) < 50 # 5V 窄脈衝在金字塔重繪後出現 (畫面上方)
+
+def test_poll_pyramids_is_scheduled_once(tmp_path):
+    path = str(tmp_path / "b.wfm")
+    write_wfm(path, ["time", "v(b)"], [np.arange(10, dtype=float), np.ones(10)])
+    viewer = make_viewer(Waveform(path))
+    viewer.poll_pyramids()
+    viewer.poll_pyramids()
+    assert len(viewer.callbacks) == 1
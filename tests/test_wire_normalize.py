@@ -0,0 +1,30 @@
+from circuit_utils import normalize_segments, seg_key
+from design_index import SpatialIndex
+
+def keys(segments):
+    return sorted(seg_key(p1, p2) for p1, p2 in segments)
+
+def test_merges_collinear_and_drops_zero_length():
+    segs = [((0, 0), (40, 0)), ((40, 0), (100, 0)), ((20, 20), (20, 20))]
+    assert keys(normalize_segments(segs)) == keys([((0, 0), (100, 0))])
+
+def test_splits_at_t_junction_and_terminal():
+    segs = [((0, 0), (100, 0)), ((40, 0), (40, 60))]
+    assert keys(normalize_segments(segs, junctions=[(80, 0)])) == keys(
+        [((0, 0), (40, 0)), ((40, 0), (80, 0)), ((80, 0), (100, 0)), ((40, 0), (40, 60))])
+
+def test_plain_crossing_is_not_split():
+    segs = [((0, 0), (100, 0)), ((50, -50), (50, 50))]
+    assert keys(normalize_segments(segs)) == keys(segs)
+
+def test_spatial_index_query_and_move():
+    idx = SpatialIndex(cell=50)
+    idx.set("a", (0, 0, 300, 0))
+    idx.set("b", (400, 400, 420, 420))
+    assert idx.query((290, -10, 310, 10)) == {"a"}
+    assert idx.query((300, 0, 300, 0)) == {"a"} # 相接也算
+    idx.set("a", (1000, 1000, 1010, 1000))
+    assert idx.query((0, 0, 300, 10)) == set()
+    idx.remove("b")
+    assert idx.query((0, 0, 2000, 2000)) == {"a"}
+    assert set(idx.buckets) == {(20, 20)}
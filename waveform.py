@@ -0,0 +1,168 @@
+import os
+import tkinter as tk
+from tkinter import filedialog, messagebox
+import numpy as np
+from waveform_io import open_waveform
+
+class WaveformViewer(tk.Frame):
+    """波形分頁: 左側訊號清單，右側畫布 (滾輪縮放時間軸、左鍵拖曳平移、雙擊顯示全部)"""
+    COLORS = ["#1f77b4", "#d62728", "#2ca02c", "#ff7f0e", "#9467bd", "#8c564b", "#e377c2", "#17becf"]
+    MARGIN_L, MARGIN_R, MARGIN_T, MARGIN_B = 60, 10, 10, 25
+
+    def __init__(self, parent, path=None):
+        super().__init__(parent)
+        self.wave = None
+        self.traces = []      # 目前顯示的訊號名稱
+        self.t0, self.t1 = 0.0, 1.0
+        self.drag_x = None
+        self.redraw_pending = False
+        self.poll_pending = False  # 等背景金字塔建好的 after() 輪詢已排入
+
+        side = tk.Frame(self)
+        side.pack(side=tk.LEFT, fill=tk.Y)
+        btns = tk.Frame(side)
+        btns.pack(fill=tk.X)
+        tk.Button(btns, text="Open...", command=self.open_dialog).pack(side=tk.LEFT, padx=2, pady=2)
+        tk.Button(btns, text="Fit", command=self.fit).pack(side=tk.LEFT, padx=2)
+        tk.Button(btns, text="Clear", command=self.clear_traces).pack(side=tk.LEFT, padx=2)
+        self.listbox = tk.Listbox(side, selectmode=tk.EXTENDED, width=24, exportselection=False)
+        self.listbox.pack(fill=tk.BOTH, expand=True)
+        self.listbox.bind("<<ListboxSelect>>", self.on_list_select)
+        self.info_label = tk.Label(side, text="", anchor="w", fg="gray", font=("Arial", 8))
+        self.info_label.pack(fill=tk.X)
+
+        self.canvas = tk.Canvas(self, bg="white")
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.canvas.bind("<Configure>", lambda e: self.request_redraw())
+        self.canvas.bind("<ButtonPress-1>", self.on_press)
+        self.canvas.bind("<B1-Motion>", self.on_drag)
+        self.canvas.bind("<Double-Button-1>", lambda e: self.fit())
+        self.canvas.bind("<MouseWheel>", self.on_wheel)
+        self.canvas.bind("<Button-4>", self.on_wheel)
+        self.canvas.bind("<Button-5>", self.on_wheel)
+        if path: self.load(path)
+
+    # --- 資料 ---
+    def load(self, path):
+        self.wave = open_waveform(path)
+        self.listbox.delete(0, tk.END)
+        for name in self.wave.signals: self.listbox.insert(tk.END, name)
+        self.traces = []
+        self.info_label.config(text=f"{os.path.basename(path)}  {len(self.wave.time)} pts")
+        self.fit()
+
+    def open_dialog(self):
+        path = filedialog.askopenfilename(filetypes=[("Waveforms", "*.wfm *.csv"), ("All Files", "*.*")])
+        if not path: return
+        try: self.load(path)
+        except (OSError, ValueError) as e: messagebox.showerror("Waveform", str(e))
+
+    def plot_node(self, net):
+        """加入 net 的節點電壓；檔案中沒有此節點時回傳 False"""
+        if self.wave is None: return False
+        name = self.wave.find_node(net)
+        if name is None: return False
+        if name not in self.traces: self.traces.append(name)
+        self.sync_listbox()
+        self.request_redraw()
+        return True
+
+    def clear_traces(self):
+        self.traces = []
+        self.sync_listbox()
+        self.request_redraw()
+
+    def sync_listbox(self):
+        self.listbox.selection_clear(0, tk.END)
+        for i, name in enumerate(self.wave.signals if self.wave else []):
+            if name in self.traces: self.listbox.selection_set(i)
+
+    def on_list_select(self, event):
+        if self.wave is None: return
+        self.traces = [self.wave.signals[i] for i in self.listbox.curselection()]
+        self.request_redraw()
+
+    # --- 視圖 ---
+    def fit(self):
+        if self.wave is not None: self.t0, self.t1 = self.wave.span()
+        if self.t1 <= self.t0: self.t1 = self.t0 + 1.0
+        self.request_redraw()
+
+    def plot_width(self):
+        return max(self.canvas.winfo_width() - self.MARGIN_L - self.MARGIN_R, 10)
+
+    def on_press(self, event):
+        self.drag_x = event.x
+
+    def on_drag(self, event):
+        if self.drag_x is None: return
+        dt = (event.x - self.drag_x) / self.plot_width() * (self.t1 - self.t0)
+        self.t0 -= dt; self.t1 -= dt
+        self.drag_x = event.x
+        self.request_redraw()
+
+    def on_wheel(self, event):
+        factor = 0.8 if (event.num == 4 or event.delta > 0) else 1.25
+        frac = min(max((event.x - self.MARGIN_L) / self.plot_width(), 0.0), 1.0)
+        tc = self.t0 + frac * (self.t1 - self.t0)
+        self.t0 = tc - (tc - self.t0) * factor
+        self.t1 = tc + (self.t1 - tc) * factor
+        self.request_redraw()
+
+    def request_redraw(self):
+        """拖曳/滾輪事件合併成閒置時的一次重繪"""
+        if self.redraw_pending: return
+        self.redraw_pending = True
+        self.after_idle(self.redraw)
+
+    def poll_pyramids(self):
+        if self.poll_pending: return
+        self.poll_pending = True
+        def poll():
+            self.poll_pending = False
+            if self.wave is None: return
+            if self.wave.pending(): self.poll_pyramids()
+            else: self.request_redraw()
+        self.after(100, poll)
+
+    def redraw(self):
+        self.redraw_pending = False
+        c = self.canvas
+        c.delete("all")
+        w, h = c.winfo_width(), c.winfo_height()
+        pw = self.plot_width()
+        ph = max(h - self.MARGIN_T - self.MARGIN_B, 10)
+        x0, y0 = self.MARGIN_L, self.MARGIN_T
+        c.create_rectangle(x0, y0, x0 + pw, y0 + ph, outline="gray")
+        if self.wave is None or not self.traces: return
+
+        # 每個像素欄一組 min/max，資料量與檔案大小無關；金字塔在背景建立，建好後再重繪一次
+        series = [(name, *self.wave.decimate(name, self.t0, self.t1, pw, wait=False)) for name in self.traces]
+        if self.wave.pending(): self.poll_pyramids()
+        ys_all = [ys for _, _, ys in series if len(ys)]
+        if not ys_all: return
+        vmin = min(float(ys.min()) for ys in ys_all)
+        vmax = max(float(ys.max()) for ys in ys_all)
+        if vmax - vmin < 1e-12: vmin, vmax = vmin - 0.5, vmax + 0.5
+        pad = (vmax - vmin) * 0.05
+        vmin, vmax = vmin - pad, vmax + pad
+
+        for i in range(6):
+            frac = i / 5
+            gx = x0 + frac * pw
+            gy = y0 + ph - frac * ph
+            c.create_line(gx, y0, gx, y0 + ph, fill="#eeeeee")
+            c.create_line(x0, gy, x0 + pw, gy, fill="#eeeeee")
+            c.create_text(gx, y0 + ph + 3, text=f"{self.t0 + frac * (self.t1 - self.t0):.4g}", anchor="n", font=("Arial", 8))
+            c.create_text(x0 - 3, gy, text=f"{vmin + frac * (vmax - vmin):.4g}", anchor="e", font=("Arial", 8))
+
+        sx = pw / (self.t1 - self.t0)
+        sy = ph / (vmax - vmin)
+        for k, (name, ts, ys) in enumerate(series):
+            color = self.COLORS[k % len(self.COLORS)]
+            if len(ts) >= 2:
+                pts = np.empty(2 * len(ts))
+                pts[0::2] = x0 + (ts - self.t0) * sx
+                pts[1::2] = y0 + ph - (ys - vmin) * sy
+                c.create_line(*pts.tolist(), fill=color)
+            c.create_text(x0 + pw - 5, y0 + 5 + 14 * k, text=name, fill=color, anchor="ne", font=("Arial", 9, "bold"))
@@ -0,0 +1,193 @@
+import itertools
+import json
+import os
+import threading
+import numpy as np
+
+# .wfm 原始二進位格式:
+#   8 bytes magic | uint64 標頭長度 | JSON 標頭 (補空白到 8 的倍數) |
+#   float64 資料 shape (訊號數, 點數)，每個訊號連續存放，第 0 個為時間軸
+MAGIC = b"CCWF0001"
+DTYPE = np.dtype("<f8")
+
+def _header_bytes(names, points):
+    header = json.dumps({"signals": list(names), "points": int(points), "dtype": DTYPE.str}).encode()
+    return header + b" " * (-len(header) % 8)
+
+def create_wfm(path, names, points):
+    """建立空的 .wfm 並回傳可寫入的 memmap (訊號數, 點數)"""
+    header = _header_bytes(names, points)
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header)).tobytes())
+        f.write(header)
+    offset = len(MAGIC) + 8 + len(header)
+    return np.memmap(path, dtype=DTYPE, mode="r+", offset=offset, shape=(len(names), points))
+
+def write_wfm(path, names, columns):
+    columns = [np.asarray(c, dtype=DTYPE) for c in columns]
+    data = create_wfm(path, names, len(columns[0]))
+    for i, col in enumerate(columns): data[i] = col
+    data.flush()
+
+def read_wfm(path):
+    """回傳 (訊號名稱, 唯讀 memmap)；資料不會整份載入記憶體"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC: raise ValueError(f"{path}: not a waveform file")
+        hlen = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+        header = json.loads(f.read(hlen))
+    offset = len(MAGIC) + 8 + hlen
+    names = header["signals"]
+    data = np.memmap(path, dtype=np.dtype(header["dtype"]), mode="r", offset=offset,
+                     shape=(len(names), header["points"]))
+    return names, data
+
+def csv_to_wfm(csv_path, wfm_path, chunk_rows=200000):
+    """
+    CSV (首列為訊號名稱) 分塊轉成 .wfm:
+    先以列為主存成暫存檔，再逐塊轉置成每個訊號連續的排列
+    """
+    tmp = wfm_path + ".rows"
+    points = 0
+    with open(csv_path) as f:
+        names = [n.strip() for n in f.readline().split(",")]
+        with open(tmp, "wb") as out:
+            while True:
+                lines = list(itertools.islice(f, chunk_rows))
+                if not lines: break
+                block = np.loadtxt(lines, delimiter=",", dtype=DTYPE, ndmin=2)
+                block.tofile(out)
+                points += len(block)
+    try:
+        data = create_wfm(wfm_path, names, points)
+        if points:
+            rows = np.memmap(tmp, dtype=DTYPE, mode="r", shape=(points, len(names)))
+            for start in range(0, points, chunk_rows):
+                data[:, start:start + chunk_rows] = rows[start:start + chunk_rows].T
+            del rows
+        data.flush()
+        del data
+    finally:
+        os.remove(tmp)
+
+def open_waveform(path):
+    """開啟 .wfm，或把 CSV 轉成同名 .wfm (已是最新則直接沿用)"""
+    if path.lower().endswith(".csv"):
+        wfm = os.path.splitext(path)[0] + ".wfm"
+        if not os.path.exists(wfm) or os.path.getmtime(wfm) < os.path.getmtime(path):
+            csv_to_wfm(path, wfm)
+        path = wfm
+    return Waveform(path)
+
+class MinMaxPyramid:
+    """
+    每層把上一層每 FACTOR 個區塊的 min / max 合併；
+    縮小檢視時從夠粗的層取值，重繪只需處理約 (畫面寬度 x FACTOR) 個數值
+    """
+    FACTOR = 16
+
+    def __init__(self, y, chunk=1 << 20):
+        self.y = y
+        self.levels = [] # [(區塊大小, mins, maxs)]
+        n = len(y)
+        size = self.FACTOR
+        mins = np.empty((n + size - 1) // size, dtype=DTYPE)
+        maxs = np.empty_like(mins)
+        for start in range(0, n, chunk): # chunk 為 FACTOR 的倍數，逐塊讀 memmap
+            seg = y[start:start + chunk]
+            idx = np.arange(0, len(seg), size)
+            mins[start // size:start // size + len(idx)] = np.minimum.reduceat(seg, idx)
+            maxs[start // size:start // size + len(idx)] = np.maximum.reduceat(seg, idx)
+        while len(mins) > 1:
+            self.levels.append((size, mins, maxs))
+            idx = np.arange(0, len(mins), self.FACTOR)
+            mins, maxs = np.minimum.reduceat(mins, idx), np.maximum.reduceat(maxs, idx)
+            size *= self.FACTOR
+        self.levels.append((size, mins, maxs))
+
+    def query(self, edges):
+        """edges: 各像素欄的原始資料 index 邊界 (遞增)；回傳每欄 (min, max, 有資料)"""
+        per = (edges[-1] - edges[0]) / max(len(edges) - 1, 1)
+        size, mins, maxs = 1, self.y, self.y
+        for lsize, lmins, lmaxs in self.levels:
+            if lsize * 2 > per: break
+            size, mins, maxs = lsize, lmins, lmaxs
+        bidx = edges // size
+        b0, b1 = bidx[0], min(-(-edges[-1] // size), len(mins))
+        starts = bidx[:-1] - b0
+        valid = np.diff(bidx) > 0
+        seg_min, seg_max = np.asarray(mins[b0:b1]), np.asarray(maxs[b0:b1])
+        starts = np.minimum(starts, len(seg_min) - 1)
+        return np.minimum.reduceat(seg_min, starts), np.maximum.reduceat(seg_max, starts), valid
+
+class Waveform:
+    """
+    一份模擬結果: 時間軸 + 各訊號 (memmap)。每個訊號的 min/max 金字塔第一次用到時
+    在背景 thread 建立 (大檔要讀完整個訊號)，建好前 decimate 先以間隔取樣近似
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.names, self.data = read_wfm(path)
+        self.time = self.data[0]
+        self._pyramids = {}
+        self._building = {} # {名稱: threading.Event}，建好 (或失敗) 時 set
+        self._lock = threading.Lock()
+
+    @property
+    def signals(self):
+        return self.names[1:]
+
+    def span(self):
+        if len(self.time) == 0: return 0.0, 1.0
+        return float(self.time[0]), float(self.time[-1])
+
+    def find_node(self, net):
+        """net 名稱 -> 訊號名稱 (v(net) 或 net，不分大小寫)；找不到回傳 None"""
+        wanted = {f"v({net})".lower(), net.lower()}
+        for name in self.signals:
+            if name.lower() in wanted: return name
+        return None
+
+    def _build_pyramid(self, name, done):
+        try: self._pyramids[name] = MinMaxPyramid(self.data[self.names.index(name)])
+        finally: done.set()
+
+    def pyramid(self, name, wait=True):
+        """name 的金字塔；wait=False 時若背景 thread 還在建立則回傳 None"""
+        with self._lock:
+            done = self._building.get(name)
+            if done is None:
+                done = self._building[name] = threading.Event()
+                threading.Thread(target=self._build_pyramid, args=(name, done), daemon=True).start()
+        if wait: done.wait()
+        return self._pyramids.get(name)
+
+    def pending(self):
+        """還有金字塔在背景建立中"""
+        return any(not done.is_set() for done in list(self._building.values()))
+
+    def decimate(self, name, t0, t1, ncols, wait=True):
+        """
+        回傳 [t0, t1] 內可直接畫成折線的 (ts, ys)。
+        點數少時為原始點；否則每個像素欄一組 min/max (折線在欄內上下往返)。
+        wait=False 且金字塔還沒建好時，改回傳間隔取樣的近似值 (可能漏掉窄脈衝)
+        """
+        y = self.data[self.names.index(name)]
+        i0 = max(int(np.searchsorted(self.time, t0, "left")) - 1, 0)
+        i1 = min(int(np.searchsorted(self.time, t1, "right")) + 1, len(self.time))
+        if i1 - i0 <= 2 * ncols:
+            return np.asarray(self.time[i0:i1]), np.asarray(y[i0:i1])
+        pyramid = self.pyramid(name, wait)
+        if pyramid is None:
+            step = -(-(i1 - i0) // (2 * ncols))
+            return np.asarray(self.time[i0:i1:step]), np.asarray(y[i0:i1:step])
+        cols = np.linspace(t0, t1, ncols + 1)
+        edges = np.clip(np.searchsorted(self.time, cols), i0, i1)
+        cmin, cmax, valid = pyramid.query(edges)
+        tc = ((cols[:-1] + cols[1:]) / 2)[valid]
+        ts = np.repeat(tc, 2)
+        ys = np.empty(len(ts), dtype=DTYPE)
+        ys[0::2] = cmin[valid]
+        ys[1::2] = cmax[valid]
+        return ts, ys